@@ -14,20 +14,69 @@ CREATE INDEX IF NOT EXISTS idx_assets_ticker ON assets (ticker, ts DESC);
 
 
 -- 2. market (Datos - High Volume)
+-- Registro de instrumentos: (ticker, provider, interval) -> id entero compacto
+CREATE TABLE IF NOT EXISTS instruments (
+    id SERIAL PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    provider TEXT NOT NULL,  -- Tiingo, Binance
+    interval TEXT NOT NULL,  -- 1d, 1m, tick
+    UNIQUE (ticker, provider, interval)
+);
+
 CREATE TABLE IF NOT EXISTS market (
     ts TIMESTAMPTZ NOT NULL,
-    ticker TEXT NOT NULL,
+    instrument_id INTEGER NOT NULL,  -- Referencia a instruments.id
     open DOUBLE PRECISION,
     high DOUBLE PRECISION,
     low DOUBLE PRECISION,
     close DOUBLE PRECISION,
     volume DOUBLE PRECISION,
-    adjusted DOUBLE PRECISION,       -- Precio ajustado
-    provider TEXT,       -- Tiingo, Yahoo
-    interval TEXT        -- 1d, 1m
+    adjusted DOUBLE PRECISION        -- Precio ajustado (conservado del esquema anterior)
 );
 SELECT create_hypertable('market', 'ts', if_not_exists => TRUE, chunk_time_interval => INTERVAL '1 month');
-CREATE INDEX IF NOT EXISTS idx_market_ticker ON market (ticker, ts DESC);
+CREATE INDEX IF NOT EXISTS idx_market_instrument ON market (instrument_id, ts DESC);
+
+-- Vista con nombres legibles (Grafana, consultas ad-hoc)
+CREATE OR REPLACE VIEW market_view AS
+SELECT m.ts, i.ticker, i.provider, i.interval, m.open, m.high, m.low, m.close, m.volume, m.adjusted
+FROM market m
+JOIN instruments i ON i.id = m.instrument_id;
+
+-- Rollups OHLCV (continuous aggregates) para consultas de largo plazo y Grafana
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_5m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '5 minutes', ts) AS ts, instrument_id,
+       first(open, ts) AS open, max(high) AS high, min(low) AS low, last(close, ts) AS close, sum(volume) AS volume
+FROM market
+GROUP BY time_bucket(INTERVAL '5 minutes', ts), instrument_id
+WITH NO DATA;
+SELECT add_continuous_aggregate_policy('market_5m', start_offset => INTERVAL '1 day', end_offset => INTERVAL '5 minutes', schedule_interval => INTERVAL '5 minutes', if_not_exists => TRUE);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', ts) AS ts, instrument_id,
+       first(open, ts) AS open, max(high) AS high, min(low) AS low, last(close, ts) AS close, sum(volume) AS volume
+FROM market
+GROUP BY time_bucket(INTERVAL '1 hour', ts), instrument_id
+WITH NO DATA;
+SELECT add_continuous_aggregate_policy('market_1h', start_offset => INTERVAL '7 days', end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes', if_not_exists => TRUE);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', ts) AS ts, instrument_id,
+       first(open, ts) AS open, max(high) AS high, min(low) AS low, last(close, ts) AS close, sum(volume) AS volume
+FROM market
+GROUP BY time_bucket(INTERVAL '1 day', ts), instrument_id
+WITH NO DATA;
+SELECT add_continuous_aggregate_policy('market_1d', start_offset => INTERVAL '30 days', end_offset => INTERVAL '1 day', schedule_interval => INTERVAL '1 hour', if_not_exists => TRUE);
+
+-- Compresion nativa: chunks de mas de 7 dias (MARKET_COMPRESS_AFTER_DAYS); la retencion es opcional y la gestiona TimescaleHandler
+ALTER TABLE market SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'instrument_id',
+    timescaledb.compress_orderby = 'ts DESC'
+);
+SELECT add_compression_policy('market', compress_after => INTERVAL '7 days', if_not_exists => TRUE);
 
 
 -- 3. models (Versiones)
@@ -107,3 +156,67 @@ CREATE TABLE IF NOT EXISTS fills (
 SELECT create_hypertable('fills', 'ts', if_not_exists => TRUE, chunk_time_interval => INTERVAL '1 month');
 CREATE INDEX IF NOT EXISTS idx_fills_order_id ON fills (order_id, ts DESC);
 CREATE INDEX IF NOT EXISTS idx_fills_ticker ON fills (ticker, ts DESC);
+
+
+-- 8. metrics (Observabilidad)
+-- Metricas internas de Prism volcadas por MetricsWriter cada METRICS_FLUSH_INTERVAL segundos.
+-- Contadores y gauges usan 'value'; los histogramas de latencia (ms) rellenan count/p50/p95/p99/max del intervalo.
+CREATE TABLE IF NOT EXISTS metrics (
+    ts TIMESTAMPTZ NOT NULL,
+    process TEXT NOT NULL,       -- Proceso/worker que reporta
+    name TEXT NOT NULL,          -- p.ej. db.insert_ms, write_buffer.queue_depth
+    kind TEXT NOT NULL,          -- counter, gauge, histogram
+    value DOUBLE PRECISION,      -- Valor (histogramas: media del intervalo)
+    count BIGINT,
+    p50 DOUBLE PRECISION,
+    p95 DOUBLE PRECISION,
+    p99 DOUBLE PRECISION,
+    max DOUBLE PRECISION
+);
+SELECT create_hypertable('metrics', 'ts', if_not_exists => TRUE, chunk_time_interval => INTERVAL '1 day');
+CREATE INDEX IF NOT EXISTS idx_metrics_name ON metrics (name, ts DESC);
+SELECT add_retention_policy('metrics', drop_after => INTERVAL '14 days', if_not_exists => TRUE);
+
+
+-- 9. backfill_checked (Ingesta)
+-- Rangos ya descargados de un proveedor: las barras que sigan faltando ahi no existen en origen
+-- (antes del listado, caidas del exchange) y el planificador no las vuelve a pedir.
+CREATE TABLE IF NOT EXISTS backfill_checked (
+    instrument_id INTEGER NOT NULL,  -- Referencia a instruments.id (ticker, proveedor, intervalo)
+    start_ts TIMESTAMPTZ NOT NULL,
+    end_ts TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (instrument_id, start_ts)
+);
+
+
+-- 10. market_repairs (Ingesta)
+-- Rangos escritos por el backfill detras del borde vivo, en orden de escritura: HistoryCache solo
+-- vuelve a verificar estos rangos en lugar de recontar todo el historico.
+CREATE TABLE IF NOT EXISTS market_repairs (
+    id BIGSERIAL PRIMARY KEY,
+    instrument_id INTEGER NOT NULL,  -- Referencia a instruments.id
+    start_ts TIMESTAMPTZ NOT NULL,
+    end_ts TIMESTAMPTZ NOT NULL
+);
+
+
+-- 11. Eventos de ordenes (Riesgo)
+-- Cada cambio de estado de una orden y cada fill se anuncian en el canal 'order_events'
+-- (LISTEN/NOTIFY), asi RiskEngine actualiza posiciones y ordenes abiertas sin reiniciar.
+CREATE OR REPLACE FUNCTION notify_order_event() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'fills' THEN
+        PERFORM pg_notify('order_events', json_build_object(
+            'type', 'fill', 'order_id', NEW.order_id, 'ticker', NEW.ticker,
+            'side', NEW.side, 'quantity', NEW.quantity)::text);
+    ELSE
+        PERFORM pg_notify('order_events', json_build_object(
+            'type', 'order', 'id', NEW.id, 'status', NEW.status)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS orders_notify ON orders;
+CREATE TRIGGER orders_notify AFTER INSERT ON orders FOR EACH ROW EXECUTE FUNCTION notify_order_event();
+DROP TRIGGER IF EXISTS fills_notify ON fills;
+CREATE TRIGGER fills_notify AFTER INSERT ON fills FOR EACH ROW EXECUTE FUNCTION notify_order_event();
@@ -0,0 +1,491 @@
+"""
+Streaming technical indicators with O(1) updates.
+
+Every indicator exposes the same small interface:
+    update(x)         -> latest value (None until enough data)
+    update_many(xs)   -> NumPy array of values, one per input (NaN until ready)
+    value / ready     -> current state
+
+`update` and `update_many` can be mixed freely; the batch path leaves the
+indicator in exactly the state a sequence of `update` calls would.
+"""
+from collections import deque
+
+import numpy as np
+
+# Running sums are rebuilt from the buffer once per `RESYNC_FACTOR * window`
+# updates to stop floating-point drift (amortized O(1)).
+RESYNC_FACTOR = 64
+
+
+class RingBuffer:
+    """
+    Fixed-capacity circular buffer backed by a NumPy array.
+    """
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = capacity
+        self.data = np.zeros(capacity)
+        self.head = 0  # Next write position
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count == self.capacity
+
+    def append(self, x: float):
+        """
+        Stores `x` and returns the value it evicted (None while filling up).
+        """
+        evicted = self.data[self.head] if self.full else None
+        self.data[self.head] = x
+        self.head = (self.head + 1) % self.capacity
+        if not self.full:
+            self.count += 1
+        return evicted
+
+    def extend(self, xs):
+        """
+        Appends many values at once (only the last `capacity` are kept).
+        """
+        xs = np.asarray(xs, dtype=np.float64)[-self.capacity:]
+        k = len(xs)
+        if k == 0:
+            return
+        idx = (self.head + np.arange(k)) % self.capacity
+        self.data[idx] = xs
+        self.head = (self.head + k) % self.capacity
+        self.count = min(self.capacity, self.count + k)
+
+    def values(self):
+        """
+        Returns the stored values in chronological order (a copy).
+        """
+        if not self.full:
+            return self.data[:self.count].copy()
+        return np.concatenate((self.data[self.head:], self.data[:self.head]))
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+
+class SMA:
+    """
+    Rolling simple moving average.
+    """
+    def __init__(self, window: int):
+        self.window = window
+        self.buffer = RingBuffer(window)
+        self.total = 0.0
+        self.updates = 0
+
+    @property
+    def ready(self):
+        return self.buffer.full
+
+    @property
+    def value(self):
+        return self.total / self.window if self.ready else None
+
+    def update(self, x: float):
+        evicted = self.buffer.append(x)
+        self.total += x - (evicted or 0.0)
+        self.updates += 1
+        if self.updates % (RESYNC_FACTOR * self.window) == 0:
+            self.total = float(self.buffer.values().sum())
+        return self.value
+
+    def update_many(self, xs):
+        xs = np.asarray(xs, dtype=np.float64)
+        history = np.concatenate((self.buffer.values(), xs))
+        out = np.full(len(xs), np.nan)
+
+        if len(history) >= self.window:
+            # Center on the first value so cumulative sums stay well conditioned
+            shift = history[0]
+            csum = np.concatenate(([0.0], np.cumsum(history - shift)))
+            means = (csum[self.window:] - csum[:-self.window]) / self.window + shift
+            # means[j] covers history[j : j + window]; output i ends at history[len(buffer) + i]
+            first = self.window - 1 - (len(history) - len(xs))
+            out[max(first, 0):] = means[max(-first, 0):]
+
+        self.buffer.extend(xs)
+        self.total = float(self.buffer.values().sum())
+        self.updates += len(xs)
+        return out
+
+    def reset(self):
+        self.buffer.clear()
+        self.total = 0.0
+        self.updates = 0
+
+
+class EMA:
+    """
+    Exponential moving average, seeded with the first observation
+    (same as pandas `ewm(adjust=False)`).
+    """
+    def __init__(self, span: int = None, alpha: float = None):
+        if alpha is None:
+            if not span:
+                raise ValueError("span or alpha is required")
+            alpha = 2.0 / (span + 1.0)
+        self.alpha = alpha
+        self.value = None
+        # Block length keeping (1 - alpha)^k >= 1e-6 for the closed-form batch update
+        decay = 1.0 - alpha
+        self.block = max(1, int(np.log(1e-6) / np.log(decay))) if 0.0 < decay < 1.0 else 1
+
+    @property
+    def ready(self):
+        return self.value is not None
+
+    def update(self, x: float):
+        if self.value is None:
+            self.value = float(x)
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def update_many(self, xs):
+        xs = np.asarray(xs, dtype=np.float64)
+        out = np.empty(len(xs))
+        if len(xs) == 0:
+            return out
+
+        start = 0
+        if self.value is None:
+            self.value = float(xs[0])
+            out[0] = self.value
+            start = 1
+
+        decay = 1.0 - self.alpha
+        if decay == 0.0:
+            # alpha == 1 (span=1): the average is the latest value
+            out[start:] = xs[start:]
+            self.value = float(xs[-1])
+            return out
+
+        prev = self.value
+        for lo in range(start, len(xs), self.block):
+            chunk = xs[lo:lo + self.block]
+            # y_t = d^t * y_0 + alpha * sum_j d^(t-j) * x_j, computed within a short block
+            powers = decay ** np.arange(1, len(chunk) + 1)
+            weighted = np.cumsum(chunk / powers)
+            block = powers * (prev + self.alpha * weighted)
+            out[lo:lo + len(chunk)] = block
+            prev = block[-1]
+
+        self.value = float(prev)
+        return out
+
+    def reset(self):
+        self.value = None
+
+
+class RollingVariance:
+    """
+    Rolling variance / standard deviation (sample variance by default, ddof=1).
+    """
+    def __init__(self, window: int, ddof: int = 1):
+        if window <= ddof:
+            raise ValueError("window must be larger than ddof")
+        self.window = window
+        self.ddof = ddof
+        self.buffer = RingBuffer(window)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+
+    @property
+    def ready(self):
+        return self.buffer.full
+
+    @property
+    def value(self):
+        if not self.ready:
+            return None
+        var = (self.total_sq - self.total * self.total / self.window) / (self.window - self.ddof)
+        return max(var, 0.0)
+
+    @property
+    def std(self):
+        var = self.value
+        return None if var is None else var ** 0.5
+
+    def update(self, x: float):
+        evicted = self.buffer.append(x)
+        if evicted is not None:
+            self.total -= evicted
+            self.total_sq -= evicted * evicted
+        self.total += x
+        self.total_sq += x * x
+        self.updates += 1
+        if self.updates % (RESYNC_FACTOR * self.window) == 0:
+            self._resync()
+        return self.value
+
+    def update_many(self, xs):
+        xs = np.asarray(xs, dtype=np.float64)
+        history = np.concatenate((self.buffer.values(), xs))
+        out = np.full(len(xs), np.nan)
+
+        if len(history) >= self.window:
+            variances = self._rolling(history)
+            first = self.window - 1 - (len(history) - len(xs))
+            out[max(first, 0):] = variances[max(-first, 0):]
+
+        self.buffer.extend(xs)
+        self.updates += len(xs)
+        self._resync()
+        return out
+
+    def update_many_std(self, xs):
+        return np.sqrt(self.update_many(xs))
+
+    def _rolling(self, history):
+        """
+        Variance of every full window of `history` from cumulative sums of x
+        and x^2 (O(n)). Sums are taken over blocks of RESYNC_FACTOR * window
+        outputs, each centered on its own mean, so they stay well conditioned
+        on long, trending series.
+        """
+        w = self.window
+        n = len(history) - w + 1
+        out = np.empty(n)
+        block = RESYNC_FACTOR * w
+        for lo in range(0, n, block):
+            segment = history[lo:lo + block + w - 1]
+            centered = segment - segment.mean()
+            csum = np.concatenate(([0.0], np.cumsum(centered)))
+            csq = np.concatenate(([0.0], np.cumsum(centered * centered)))
+            total = csum[w:] - csum[:-w]
+            total_sq = csq[w:] - csq[:-w]
+            out[lo:lo + len(total)] = (total_sq - total * total / w) / (w - self.ddof)
+        return np.maximum(out, 0.0)
+
+    def _resync(self):
+        values = self.buffer.values()
+        self.total = float(values.sum())
+        self.total_sq = float((values * values).sum())
+
+    def reset(self):
+        self.buffer.clear()
+        self.total = self.total_sq = 0.0
+        self.updates = 0
+
+
+class _RollingExtreme:
+    """
+    Rolling max/min with a monotonic deque: amortized O(1) per update.
+    """
+    def __init__(self, window: int, is_max: bool):
+        self.window = window
+        self.is_max = is_max
+        self.deque = deque()  # (index, value), values monotonic
+        self.index = 0
+
+    @property
+    def ready(self):
+        return self.index >= self.window
+
+    @property
+    def value(self):
+        return self.deque[0][1] if self.ready else None
+
+    def _dominates(self, new, old):
+        return new >= old if self.is_max else new <= old
+
+    def update(self, x: float):
+        while self.deque and self._dominates(x, self.deque[-1][1]):
+            self.deque.pop()
+        self.deque.append((self.index, x))
+        if self.deque[0][0] <= self.index - self.window:
+            self.deque.popleft()
+        self.index += 1
+        return self.value
+
+    def update_many(self, xs):
+        xs = np.asarray(xs, dtype=np.float64)
+        out = np.full(len(xs), np.nan)
+        # One pass of the same deque updates as update(), with locals bound for speed
+        window, index, is_max = self.window, self.index, self.is_max
+        queue = self.deque
+        for i, x in enumerate(xs.tolist()):
+            if is_max:
+                while queue and x >= queue[-1][1]:
+                    queue.pop()
+            else:
+                while queue and x <= queue[-1][1]:
+                    queue.pop()
+            queue.append((index, x))
+            if queue[0][0] <= index - window:
+                queue.popleft()
+            index += 1
+            if index >= window:
+                out[i] = queue[0][1]
+        self.index = index
+        return out
+
+    def reset(self):
+        self.deque.clear()
+        self.index = 0
+
+
+class RollingMax(_RollingExtreme):
+    def __init__(self, window: int):
+        super().__init__(window, is_max=True)
+
+
+class RollingMin(_RollingExtreme):
+    def __init__(self, window: int):
+        super().__init__(window, is_max=False)
+
+
+class VWAP:
+    """
+    Volume-weighted average price, rolling over `window` bars
+    (or cumulative when window is None, e.g. per session).
+    """
+    def __init__(self, window: int = None):
+        self.window = window
+        self.pv = RingBuffer(window) if window else None
+        self.vol = RingBuffer(window) if window else None
+        self.total_pv = 0.0
+        self.total_vol = 0.0
+        self.count = 0
+
+    @property
+    def ready(self):
+        return self.count >= (self.window or 1) and self.total_vol > 0
+
+    @property
+    def value(self):
+        return self.total_pv / self.total_vol if self.ready else None
+
+    def update(self, price: float, volume: float):
+        pv = price * volume
+        if self.window:
+            self.total_pv -= self.pv.append(pv) or 0.0
+            self.total_vol -= self.vol.append(volume) or 0.0
+        self.total_pv += pv
+        self.total_vol += volume
+        self.count += 1
+        if self.window and self.count % (RESYNC_FACTOR * self.window) == 0:
+            self._resync()
+        return self.value
+
+    def update_many(self, prices, volumes):
+        prices = np.asarray(prices, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        pv = prices * volumes
+
+        if not self.window:
+            cum_pv = self.total_pv + np.cumsum(pv)
+            cum_vol = self.total_vol + np.cumsum(volumes)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out = np.where(cum_vol > 0, cum_pv / cum_vol, np.nan)
+            if len(pv):
+                self.total_pv, self.total_vol = float(cum_pv[-1]), float(cum_vol[-1])
+            self.count += len(pv)
+            return out
+
+        sum_pv = SMA(self.window)
+        sum_vol = SMA(self.window)
+        sum_pv.buffer.extend(self.pv.values())
+        sum_vol.buffer.extend(self.vol.values())
+        mean_pv = sum_pv.update_many(pv)
+        mean_vol = sum_vol.update_many(volumes)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = np.where(mean_vol > 0, mean_pv / mean_vol, np.nan)
+
+        self.pv.extend(pv)
+        self.vol.extend(volumes)
+        self.count += len(pv)
+        self._resync()
+        return out
+
+    def _resync(self):
+        self.total_pv = float(self.pv.values().sum())
+        self.total_vol = float(self.vol.values().sum())
+
+    def reset(self):
+        if self.window:
+            self.pv.clear()
+            self.vol.clear()
+        self.total_pv = self.total_vol = 0.0
+        self.count = 0
+
+
+class ATR:
+    """
+    Average True Range with Wilder smoothing, seeded by the mean of the
+    first `window` true ranges.
+    """
+    def __init__(self, window: int = 14):
+        self.window = window
+        self.prev_close = None
+        self.seed = SMA(window)
+        self.smoother = EMA(alpha=1.0 / window)
+
+    @property
+    def ready(self):
+        return self.smoother.ready
+
+    @property
+    def value(self):
+        return self.smoother.value
+
+    def _true_range(self, high, low):
+        if self.prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def update(self, high: float, low: float, close: float):
+        tr = self._true_range(high, low)
+        self.prev_close = close
+        if self.smoother.ready:
+            return self.smoother.update(tr)
+        seeded = self.seed.update(tr)
+        if seeded is not None:
+            self.smoother.value = seeded
+        return self.smoother.value
+
+    def update_many(self, highs, lows, closes):
+        highs = np.asarray(highs, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        closes = np.asarray(closes, dtype=np.float64)
+        n = len(closes)
+        out = np.full(n, np.nan)
+        if n == 0:
+            return out
+
+        prev = np.empty(n)
+        prev[0] = np.nan if self.prev_close is None else self.prev_close
+        prev[1:] = closes[:-1]
+        tr = np.fmax(highs - lows, np.fmax(np.abs(highs - prev), np.abs(lows - prev)))
+        self.prev_close = float(closes[-1])
+
+        i = 0
+        if not self.smoother.ready:
+            # Seed phase: plain average of the first `window` true ranges
+            need = self.window - len(self.seed.buffer)
+            seeds = self.seed.update_many(tr[:need])
+            i = len(seeds)
+            if self.seed.ready:
+                self.smoother.value = float(seeds[-1])
+                out[i - 1] = self.smoother.value
+
+        if i < n:
+            out[i:] = self.smoother.update_many(tr[i:])
+        return out
+
+    def reset(self):
+        self.prev_close = None
+        self.seed.reset()
+        self.smoother.reset()
@@ -0,0 +1,79 @@
+"""
+Compares two benchmark runs stored by benchmarks.suite and flags regressions.
+
+Each benchmark's headline value is compared; a change in the wrong direction
+(slower latency, fewer rows/s) larger than --threshold percent is reported as
+a regression, and the exit status is 1 if there is any.
+
+Usage (from prism/):
+    python -m benchmarks.compare                      # the two latest runs
+    python -m benchmarks.compare base.json head.json --threshold 5
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+from benchmarks.suite import RESULTS_DIR
+
+
+def latest_runs(directory: str, count: int = 2):
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")), key=os.path.getmtime)
+    return paths[-count:]
+
+
+def compare(base: dict, head: dict, threshold: float):
+    """
+    Returns (name, base value, head value, change %, regressed) for every
+    benchmark present in both runs.
+    """
+    rows = []
+    for name, stats in head["results"].items():
+        if name not in base["results"]:
+            continue
+        before, after = base["results"][name]["value"], stats["value"]
+        change = (after - before) / before * 100 if before else 0.0
+        worse = -change if stats.get("better") == "higher" else change
+        rows.append((name, before, after, change, worse > threshold))
+    return rows
+
+
+def run(base_path: str, head_path: str, threshold: float):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+
+    print(f"base: {base['commit'][:8]}{' (dirty)' if base.get('dirty') else ''}  {os.path.basename(base_path)}")
+    print(f"head: {head['commit'][:8]}{' (dirty)' if head.get('dirty') else ''}  {os.path.basename(head_path)}")
+    if base.get("config") != head.get("config"):
+        print("warning: runs used different settings, deltas may not be comparable")
+
+    rows = compare(base, head, threshold)
+    print(f"\n{'benchmark':<32}{'base':>14}{'head':>14}{'change':>10}")
+    for name, before, after, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<32}{before:>14,.3f}{after:>14,.3f}{change:>+9.1f}%{flag}")
+
+    regressions = [row[0] for row in rows if row[4]]
+    print(f"\n{len(regressions)} regression(s) above {threshold}%.")
+    return not regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("base", nargs="?")
+    parser.add_argument("head", nargs="?")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Tolerated slowdown, in percent")
+    parser.add_argument("--results", default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    if args.base and args.head:
+        base_path, head_path = args.base, args.head
+    else:
+        runs = latest_runs(args.results)
+        if len(runs) < 2:
+            parser.error(f"need two runs in {args.results} (or pass both files)")
+        base_path, head_path = runs
+    sys.exit(0 if run(base_path, head_path, args.threshold) else 1)
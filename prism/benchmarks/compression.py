@@ -0,0 +1,128 @@
+"""
+Compares on-disk size and scan time of `market` data before and after
+TimescaleDB native compression.
+
+A ticker's rows are copied into a scratch hypertable (`market_bench`), the
+typical read queries are timed, every chunk is compressed with the same
+settings init_db applies to `market`, and the queries are timed again.
+The scratch table is dropped at the end; `market` itself is never modified.
+
+Usage (from prism/):
+    python -m benchmarks.compression --ticker BTCUSDT --repeat 20
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from storage.timescale_handler import TimescaleHandler
+from utils.config import Config
+
+BENCH_TABLE = "market_bench"
+
+# Read patterns of get_history / get_range / dashboards
+QUERIES = {
+    "history_100": f"""
+        SELECT ts, instrument_id, open, high, low, close, volume
+        FROM {BENCH_TABLE} WHERE instrument_id = ANY(%(ids)s) ORDER BY ts DESC LIMIT 100
+    """,
+    "history_10000": f"""
+        SELECT ts, instrument_id, open, high, low, close, volume
+        FROM {BENCH_TABLE} WHERE instrument_id = ANY(%(ids)s) ORDER BY ts DESC LIMIT 10000
+    """,
+    "range_30d": f"""
+        SELECT ts, open, high, low, close, volume
+        FROM {BENCH_TABLE}
+        WHERE instrument_id = ANY(%(ids)s) AND ts >= %(last)s - INTERVAL '30 days'
+        ORDER BY ts
+    """,
+    "full_scan_daily": f"""
+        SELECT time_bucket(INTERVAL '1 day', ts), last(close, ts)
+        FROM {BENCH_TABLE} WHERE instrument_id = ANY(%(ids)s) GROUP BY 1 ORDER BY 1
+    """,
+}
+
+
+def _time_queries(cur, params, repeat):
+    timings = {}
+    for name, query in QUERIES.items():
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cur.execute(query, params)
+            cur.fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        timings[name] = statistics.median(samples)
+    return timings
+
+
+def _table_size(cur):
+    cur.execute(f"SELECT hypertable_size('{BENCH_TABLE}'), hypertable_index_size('{BENCH_TABLE}')")
+    return cur.fetchone()
+
+
+def run(ticker: str, repeat: int):
+    db = TimescaleHandler(
+        host=Config.DB_HOST,
+        port=Config.DB_PORT,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        dbname=Config.DB_NAME
+    )
+    ids = db.instrument_ids(ticker)
+    try:
+        with db.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            cur.execute(f"CREATE TABLE {BENCH_TABLE} (LIKE market INCLUDING DEFAULTS)")
+            cur.execute(f"SELECT create_hypertable('{BENCH_TABLE}', 'ts', chunk_time_interval => INTERVAL '7 days')")
+            cur.execute(f"CREATE INDEX ON {BENCH_TABLE} (instrument_id, ts DESC)")
+            cur.execute(f"INSERT INTO {BENCH_TABLE} SELECT * FROM market WHERE instrument_id = ANY(%s)", (ids,))
+            rows = cur.rowcount
+            cur.execute(f"SELECT max(ts) FROM {BENCH_TABLE}")
+            last = cur.fetchone()[0]
+            if not rows:
+                print(f"[{datetime.now()}] No rows for {ticker}; nothing to benchmark.")
+                return
+            cur.execute(f"ANALYZE {BENCH_TABLE}")
+
+            params = {"ids": ids, "last": last}
+            before_size = _table_size(cur)
+            before = _time_queries(cur, params, repeat)
+
+            cur.execute(f"""
+                ALTER TABLE {BENCH_TABLE} SET (
+                    timescaledb.compress,
+                    timescaledb.compress_segmentby = 'instrument_id',
+                    timescaledb.compress_orderby = 'ts DESC'
+                )
+            """)
+            started = time.perf_counter()
+            cur.execute(f"SELECT compress_chunk(c) FROM show_chunks('{BENCH_TABLE}') c")
+            compress_s = time.perf_counter() - started
+            cur.execute(f"ANALYZE {BENCH_TABLE}")
+
+            after_size = _table_size(cur)
+            after = _time_queries(cur, params, repeat)
+    finally:
+        try:
+            with db.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        finally:
+            db.close()
+
+    print(f"\nCompression benchmark: {ticker}, {rows} rows, compressed in {compress_s:.2f}s")
+    print(f"{'':<18}{'uncompressed':>16}{'compressed':>16}{'ratio':>10}")
+    labels = ("total bytes", "index bytes")
+    for label, b, a in zip(labels, before_size, after_size):
+        print(f"{label:<18}{b:>16,}{a:>16,}{(b / a if a else 0):>9.1f}x")
+    for name in QUERIES:
+        b, a = before[name], after[name]
+        print(f"{name + ' (ms)':<18}{b:>16.2f}{a:>16.2f}{(b / a if a else 0):>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ticker", default=Config.TARGET_TICKER)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    run(args.ticker, args.repeat)
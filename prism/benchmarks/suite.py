@@ -0,0 +1,372 @@
+"""
+Benchmark suite for the ingestion, storage and engine hot paths.
+
+Benchmarks:
+    parse           Binance kline page -> dict rows vs BarBatch (+ COPY encoding)
+    on_tick         TrendFollowing.on_tick cost per tick
+    bus             TickBus publish -> engine thread -> on_tick (no database)
+    risk            RiskEngine.check_signal cost per signal (sizing + limits)
+    insert          insert_bulk_data rows/s per method, and insert_batch
+    history         get_history / get_range latency vs window size
+    tick_to_signal  WriteBuffer -> TimescaleDB -> NOTIFY -> get_latest -> on_tick
+
+Providers are faked; the DB benchmarks need a local TimescaleDB (the platform
+container) and are skipped when it is unreachable. They write a scratch
+instrument with timestamps in 2100, so no real chunk, rollup window or policy
+is touched, and delete it afterwards.
+
+Each run is stored as JSON in benchmarks/results/ (tagged with the git
+commit) so runs can be compared with `python -m benchmarks.compare`.
+
+Usage (from prism/):
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only parse,on_tick --repeat 50
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from engine.risk import RiskEngine
+from ingestion.binance_ingestor import BinanceProcessor
+from ingestion.response_cache import ResponseCache
+from processors.bar_batch import BarBatch
+from storage.timescale_handler import TimescaleHandler, build_market_row, _encode_binary_batch
+from storage.write_buffer import WriteBuffer
+from strategies.signals import Signal
+from strategies.trend_following import TrendFollowing
+from utils.config import Config
+from utils.tick_bus import TickBus
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BENCHMARKS = ("parse", "on_tick", "bus", "risk", "insert", "history", "tick_to_signal")
+
+BENCH_TICKER = "BENCHUSDT"
+BENCH_PROVIDER = "bench"
+# Far in the future: never compressed, dropped or refreshed by the policies
+BENCH_START = datetime(2100, 1, 1, tzinfo=timezone.utc)
+
+
+def summarize(samples: list, unit: str, value: float = None, better: str = "lower"):
+    """
+    Summary statistics of a list of samples. `value` is the headline number
+    compared between runs (defaults to the median).
+    """
+    arr = np.asarray(samples, dtype=np.float64)
+    return {
+        "unit": unit,
+        "better": better,
+        "value": float(np.median(arr)) if value is None else float(value),
+        "n": int(arr.size),
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "min": float(arr.min()),
+        "max": float(arr.max()),
+    }
+
+
+def fake_klines(n: int, start: datetime = BENCH_START, step_ms: int = 60_000, seed: int = 0):
+    """Deterministic Binance-style klines (prices as decimal strings, like the API)."""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.1, n))
+    start_ms = int(start.timestamp() * 1000)
+    return [
+        [start_ms + i * step_ms, f"{c:.8f}", f"{c + 0.05:.8f}", f"{c - 0.05:.8f}", f"{c:.8f}",
+         f"{v:.8f}", start_ms + (i + 1) * step_ms - 1, "0", 10, "0", "0", "0"]
+        for i, (c, v) in enumerate(zip(close, rng.random(n) * 10))
+    ]
+
+
+class FakeBinanceClient:
+    """Serves a fixed kline page in place of python-binance's Client."""
+    def __init__(self, klines: list):
+        self.klines = klines
+
+    def get_historical_klines(self, symbol, interval, start_str, end_str=None):
+        return self.klines
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Sends stdout and Prism's log handlers to /dev/null: enabled messages are
+    still formatted, but no terminal I/O is timed.
+    """
+    handlers = [h for h in logging.getLogger("prism").handlers if isinstance(h, logging.StreamHandler)]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        previous = [h.setStream(devnull) for h in handlers]
+        try:
+            yield
+        finally:
+            for handler, stream in zip(handlers, previous):
+                if stream is not None:
+                    handler.setStream(stream)
+
+
+def bench_parse(args):
+    klines = fake_klines(1000)
+    processor = BinanceProcessor(cache=ResponseCache(mode="off"), client=FakeBinanceClient(klines))
+
+    def dict_path():
+        records = processor.get_historical_data(BENCH_TICKER, "1m", 0, 1)
+        return [build_market_row(BENCH_TICKER, r, BENCH_PROVIDER, "1m") for r in records]
+
+    def batch_path():
+        return _encode_binary_batch(processor.get_historical_batch(BENCH_TICKER, "1m", 0, 1), 1)
+
+    results = {}
+    for name, fn in (("parse_klines_dicts", dict_path), ("parse_klines_batch", batch_path)):
+        samples = []
+        with quiet():
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - started) * 1000)
+        results[name] = summarize(samples, "ms/1000 candles")
+    return results
+
+
+def bench_on_tick(args):
+    rng = np.random.default_rng(1)
+    prices = (100 + np.cumsum(rng.normal(0, 0.1, args.ticks))).tolist()
+    now = datetime.now(timezone.utc)
+
+    with quiet():
+        strategy = TrendFollowing(BENCH_TICKER, window=20)
+        strategy.on_start([{"close": p} for p in prices[:100]])
+        samples = []
+        for price in prices:
+            started = time.perf_counter_ns()
+            strategy.on_tick(price, now)
+            samples.append((time.perf_counter_ns() - started) / 1000)
+    return {"on_tick_trend_following": summarize(samples, "us/tick")}
+
+
+def bench_bus(args):
+    bus = TickBus()
+    subscription = bus.subscribe("bench", tickers=[BENCH_TICKER], policy="block")
+    samples = []
+    done = threading.Event()
+
+    with quiet():
+        strategy = TrendFollowing(BENCH_TICKER, window=5)
+
+        def consume():
+            while len(samples) < args.signals:
+                for row in subscription.drain(timeout=1.0):
+                    strategy.on_tick(row[7], row[0])
+                    samples.append((time.perf_counter() - row[-1]) * 1000)
+                    done.set()
+
+        consumer = threading.Thread(target=consume, daemon=True)
+        consumer.start()
+        ts = datetime.now(timezone.utc)
+        for i in range(args.signals):
+            done.clear()
+            # Extra trailing field carries the publish time
+            bus.publish((ts, BENCH_TICKER, BENCH_PROVIDER, "1m", 0.0, 0.0, 0.0, 100.0 + (i % 7), 0.0,
+                         time.perf_counter()))
+            done.wait(1.0)
+        consumer.join(5.0)
+    return {"tick_to_signal_bus": summarize(samples, "ms")}
+
+
+def bench_risk(args):
+    # Alternating sides so every signal sizes and checks a new order; no rate limit
+    risk = RiskEngine(order_notional=1000, max_notional=1e12, max_position=0, max_order_rate=0)
+    now = datetime.now(timezone.utc)
+    signals = [Signal(now, "bench", BENCH_TICKER, "LONG" if i % 2 else "SHORT", price=100.0 + (i % 7))
+               for i in range(args.ticks)]
+
+    samples = []
+    for signal in signals:
+        started = time.perf_counter_ns()
+        risk.check_signal(signal)
+        samples.append((time.perf_counter_ns() - started) / 1000)
+    return {"risk_check_signal": summarize(samples, "us/signal")}
+
+
+def open_db():
+    """Handler on the configured database, or None when it is unreachable."""
+    Config.DB_CONNECT_RETRIES = 1
+    with quiet():
+        db = TimescaleHandler(
+            host=Config.DB_HOST,
+            port=Config.DB_PORT,
+            user=Config.DB_USER,
+            password=Config.DB_PASSWORD,
+            dbname=Config.DB_NAME
+        )
+    if not db.connect():
+        db.close()
+        return None
+    return db
+
+
+def cleanup(db):
+    """Removes every bench row and instrument."""
+    with db.cursor() as cur:
+        cur.execute("""
+            DELETE FROM market
+            WHERE instrument_id IN (SELECT id FROM instruments WHERE ticker = %s) AND ts >= %s
+        """, (BENCH_TICKER, BENCH_START))
+        cur.execute("DELETE FROM instruments WHERE ticker = %s", (BENCH_TICKER,))
+    pool = db.pool
+    for key in [k for k in pool.instruments if k[0] == BENCH_TICKER]:
+        pool.instrument_names.pop(pool.instruments.pop(key), None)
+    pool.ticker_instruments.pop(BENCH_TICKER, None)
+    pool.loaded_tickers.pop(BENCH_TICKER, None)
+
+
+def bench_insert(db, args):
+    methods = (("values", "values", None), ("copy_text", "copy", "text"), ("copy_binary", "copy", "binary"))
+    results = {}
+    offset = 0
+    copy_format = Config.COPY_FORMAT
+    for name, method, fmt in methods + (("batch_binary", "batch", None),):
+        klines = fake_klines(args.rows, start=BENCH_START + timedelta(minutes=offset))
+        offset += args.rows
+        batch = BarBatch.from_klines(BENCH_TICKER, klines, "1m", provider=BENCH_PROVIDER)
+        records = batch.to_records()
+
+        Config.COPY_FORMAT = fmt or copy_format
+        started = time.perf_counter()
+        with quiet():
+            if method == "batch":
+                written = db.insert_batch(batch)
+            else:
+                written = db.insert_bulk_data(BENCH_TICKER, records, BENCH_PROVIDER, "1m", method=method)
+        elapsed = time.perf_counter() - started
+        Config.COPY_FORMAT = copy_format
+        rate = written / elapsed if elapsed > 0 else 0.0
+        results[f"insert_{name}"] = summarize([rate], "rows/s", better="higher")
+    return results
+
+
+def bench_history(db, args):
+    results = {}
+    end = BENCH_START + timedelta(minutes=4 * args.rows)
+    for window in args.windows:
+        history, ranges = [], []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            db.get_history(BENCH_TICKER, limit=window)
+            history.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            db.get_range(BENCH_TICKER, start=end - timedelta(minutes=window), end=end, interval="1m")
+            ranges.append((time.perf_counter() - started) * 1000)
+        results[f"get_history_{window}"] = summarize(history, "ms")
+        results[f"get_range_{window}"] = summarize(ranges, "ms")
+    return results
+
+
+def bench_tick_to_signal(db, args):
+    listener = db.listen()
+    writer = WriteBuffer(db).start()
+    samples = []
+    try:
+        with quiet():
+            strategy = TrendFollowing(BENCH_TICKER, window=5)
+            strategy.on_start(db.get_history(BENCH_TICKER, limit=50))
+            base = BENCH_START + timedelta(days=3650)
+            for i in range(args.signals):
+                price = 100.0 + (i % 7)
+                started = time.perf_counter()
+                writer.put_tick(BENCH_TICKER, price, base + timedelta(seconds=i), source=BENCH_PROVIDER,
+                                interval="1m")
+                while not listener.wait(timeout=5.0, ticker=BENCH_TICKER):
+                    pass
+                latest = db.get_latest(BENCH_TICKER)
+                strategy.on_tick(latest["close"], latest["ts"])
+                samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        writer.close()
+        listener.close()
+    return {"tick_to_signal": summarize(samples, "ms")}
+
+
+def git_commit():
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain"], text=True,
+                                             stderr=subprocess.DEVNULL).strip())
+        return sha, dirty
+    except Exception:
+        return "unknown", False
+
+
+def run(args):
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    results = {}
+    for name in ("parse", "on_tick", "bus", "risk"):
+        if name in selected:
+            print(f"[{datetime.now()}] Benchmark: {name}...")
+            results.update(globals()[f"bench_{name}"](args))
+
+    db_benchmarks = [name for name in ("insert", "history", "tick_to_signal") if name in selected]
+    db = open_db() if db_benchmarks else None
+    if db_benchmarks and db is None:
+        print(f"[{datetime.now()}] TimescaleDB unreachable: skipping {', '.join(db_benchmarks)}.")
+    elif db is not None:
+        try:
+            cleanup(db)
+            if "history" in db_benchmarks and "insert" not in db_benchmarks:
+                db_benchmarks.insert(0, "insert")  # history reads the rows insert writes
+            for name in db_benchmarks:
+                print(f"[{datetime.now()}] Benchmark: {name}...")
+                results.update(globals()[f"bench_{name}"](db, args))
+        finally:
+            cleanup(db)
+            db.close()
+
+    sha, dirty = git_commit()
+    report = {
+        "commit": sha,
+        "dirty": dirty,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "config": {
+            "rows": args.rows, "repeat": args.repeat, "ticks": args.ticks, "signals": args.signals,
+            "bulk_batch_size": Config.BULK_BATCH_SIZE,
+            "write_buffer_max_delay": Config.WRITE_BUFFER_MAX_DELAY,
+            "log_level": Config.LOG_LEVEL,
+        },
+        "results": results,
+    }
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{datetime.now():%Y%m%d-%H%M%S}_{sha[:8]}{'-dirty' if dirty else ''}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'benchmark':<32}{'value':>14}  unit")
+    for name, stats in results.items():
+        print(f"{name:<32}{stats['value']:>14,.3f}  {stats['unit']}")
+    print(f"\nResults saved to {path}")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions of timed calls")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows per insert method")
+    parser.add_argument("--ticks", type=int, default=100_000, help="Ticks fed to on_tick")
+    parser.add_argument("--signals", type=int, default=200, help="Round trips for tick_to_signal")
+    parser.add_argument("--windows", type=lambda s: [int(w) for w in s.split(",")],
+                        default=[10, 100, 1000, 10_000, 100_000], help="get_history window sizes")
+    parser.add_argument("--output", default=RESULTS_DIR)
+    run(parser.parse_args())
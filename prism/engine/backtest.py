@@ -0,0 +1,149 @@
+import time
+from datetime import datetime
+import numpy as np
+from storage.timescale_handler import TimescaleHandler
+from utils.config import Config
+
+# Seconds per year, used to annualize the Sharpe ratio from the bar spacing
+YEAR_SECONDS = 365 * 24 * 3600
+
+
+class BacktestResult:
+    """
+    Per-bar arrays and summary statistics of a backtest run.
+    """
+    def __init__(self, ts, close, positions, returns, pnl, equity, trades, fees, elapsed):
+        self.ts = ts
+        self.close = close
+        self.positions = positions
+        self.returns = returns
+        self.pnl = pnl
+        self.equity = equity
+        self.trades = trades
+        self.fees = fees
+        self.elapsed = elapsed
+        self.stats = self._compute_stats()
+
+    def _compute_stats(self):
+        n = len(self.close)
+        if n < 2:
+            return {"bars": n, "fills": 0}
+
+        fills = int(np.count_nonzero(self.trades))
+        peak = np.maximum.accumulate(self.equity)
+        drawdown = self.equity / peak - 1.0
+
+        bar_seconds = float(np.median(np.diff(self.ts).astype("timedelta64[us]").astype(np.int64))) / 1e6
+        std = self.pnl.std()
+        sharpe = 0.0
+        if std > 0 and bar_seconds > 0:
+            sharpe = self.pnl.mean() / std * np.sqrt(YEAR_SECONDS / bar_seconds)
+
+        held = self.positions[:-1] != 0
+        wins = (self.pnl[1:] > 0) & held
+        return {
+            "bars": n,
+            "total_return": float(self.equity[-1] / self.equity[0] - 1.0),
+            "sharpe": float(sharpe),
+            "max_drawdown": float(drawdown.min()),
+            "fills": fills,
+            "turnover": float(np.abs(self.trades).sum()),
+            "fees": float(self.fees.sum()),
+            "exposure": float(held.mean()),
+            "win_rate": float(wins.sum() / held.sum()) if held.any() else 0.0,
+            "elapsed_s": self.elapsed,
+        }
+
+    def __str__(self):
+        return " | ".join(f"{k}: {v:.4f}" if isinstance(v, float) else f"{k}: {v}" for k, v in self.stats.items())
+
+
+class Backtester:
+    """
+    Runs a Strategy over stored market history.
+
+    Strategies implementing the vectorized `on_bars` hook are evaluated in one
+    pass over NumPy arrays; the rest are replayed through `on_tick` in a tight
+    loop, reading `strategy.position` after every bar. Positions are decided at
+    a bar's close and earn the next bar's return.
+    """
+    def __init__(self, strategy, fee_bps: float = None, initial_capital: float = None):
+        self.strategy = strategy
+        self.fee_rate = (Config.BACKTEST_FEE_BPS if fee_bps is None else fee_bps) / 10000.0
+        self.initial_capital = initial_capital or Config.BACKTEST_INITIAL_CAPITAL
+
+    @staticmethod
+    def load(ticker: str, start: datetime = None, end: datetime = None, interval: str = None, db=None,
+             resolution=None):
+        """
+        Loads a ticker's history from TimescaleDB as NumPy arrays.
+        `resolution` (e.g. '1h') reads pre-aggregated bars from the rollups.
+        """
+        owned = db is None
+        if owned:
+            db = TimescaleHandler(
+                host=Config.DB_HOST,
+                port=Config.DB_PORT,
+                user=Config.DB_USER,
+                password=Config.DB_PASSWORD,
+                dbname=Config.DB_NAME
+            )
+        try:
+            return db.get_range(ticker, start, end, interval=interval or Config.KLINE_INTERVAL, resolution=resolution)
+        finally:
+            if owned:
+                db.close()
+
+    def run(self, bars: dict):
+        """
+        :param bars: dict of NumPy arrays as returned by `load`
+        """
+        started = time.perf_counter()
+        positions = self.strategy.on_bars(bars)
+        if positions is None:
+            positions = self._replay(bars)
+        positions = np.nan_to_num(np.asarray(positions, dtype=np.float64))
+        return self._evaluate(bars, positions, time.perf_counter() - started)
+
+    def _replay(self, bars: dict):
+        """
+        Event-loop fallback for strategies that only implement on_tick.
+        """
+        on_tick = self.strategy.on_tick
+        strategy = self.strategy
+        closes = bars['close'].tolist()
+        timestamps = bars['ts'].astype(object).tolist()
+
+        positions = np.empty(len(closes))
+        for i, (price, ts) in enumerate(zip(closes, timestamps)):
+            on_tick(price, ts)
+            positions[i] = strategy.position
+        return positions
+
+    def _evaluate(self, bars: dict, positions, elapsed):
+        close = bars['close']
+        n = len(close)
+
+        returns = np.zeros(n)
+        if n > 1:
+            returns[1:] = close[1:] / close[:-1] - 1.0
+
+        trades = np.diff(positions, prepend=0.0)
+        fees = np.abs(trades) * self.fee_rate
+
+        pnl = np.zeros(n)
+        if n > 1:
+            pnl[1:] = positions[:-1] * returns[1:]
+        pnl -= fees
+
+        equity = self.initial_capital * np.cumprod(1.0 + pnl)
+        return BacktestResult(bars['ts'], close, positions, returns, pnl, equity, trades, fees, elapsed)
+
+
+if __name__ == "__main__":
+    # Example usage
+    from strategies.trend_following import TrendFollowing
+
+    bars = Backtester.load(Config.TARGET_TICKER)
+    result = Backtester(TrendFollowing(Config.TARGET_TICKER, window=20)).run(bars)
+    print(result)
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from engine.risk import RiskEngine
+from storage.signal_writer import SignalWriter
+from storage.timescale_handler import TimescaleHandler
+from utils import metrics
+from utils.config import Config
+from utils.logger import get_logger
+
+log = get_logger("engine")
+
+class MultiStrategyEngine:
+    """
+    Hosts many Strategy instances across many tickers on one connection pool.
+
+    Every cycle issues a single query for all bars newer than each ticker's
+    last seen timestamp and dispatches them to the strategies of that ticker,
+    so per-cycle cost stays roughly constant as the universe grows.
+
+    Given a TickBus (ingestion in the same process), rows are taken from the
+    bus as soon as they are published instead, with no database round-trip.
+    """
+    def __init__(self, strategies: list, bus=None):
+        self.strategies = defaultdict(list)
+        for strategy in strategies:
+            self.strategies[strategy.symbol].append(strategy)
+        self.tickers = list(self.strategies.keys())
+
+        self.db = TimescaleHandler(
+            host=Config.DB_HOST,
+            port=Config.DB_PORT,
+            user=Config.DB_USER,
+            password=Config.DB_PASSWORD,
+            dbname=Config.DB_NAME
+        )
+
+        self.watermarks = {}
+        self.tick_latency = metrics.histogram("engine.tick_to_on_tick_ms")
+        self.stop_event = threading.Event()
+        # Subscribed up front so nothing published before run() is missed
+        self.subscription = bus.subscribe("engine", tickers=self.tickers) if bus is not None else None
+
+        # Emitted signals are persisted in batches off the engine thread
+        self.signal_writer = SignalWriter(self.db) if Config.SIGNAL_WRITER_ENABLED else None
+        # With risk enabled every signal also goes through the pre-trade checks
+        self.risk = RiskEngine(self.db, self.signal_writer) if Config.RISK_ENABLED else None
+        sink = self.risk.on_signal if self.risk else (self.signal_writer.put if self.signal_writer else None)
+        for strategy in strategies:
+            strategy.sink = sink
+
+    def stop(self):
+        """Makes run() return after the current cycle (safe from a signal handler)."""
+        self.stop_event.set()
+
+    def warm_up(self, limit=50):
+        """
+        Loads recent history for every ticker in one query and starts the strategies.
+        """
+        history = self.db.get_history_many(self.tickers, limit=limit)
+        # Tickers without data start from "now minus max age": older rows would be skipped anyway
+        floor = datetime.now(timezone.utc) - timedelta(seconds=Config.ENGINE_MAX_TICK_AGE)
+
+        for ticker, rows in history.items():
+            for strategy in self.strategies[ticker]:
+                strategy.on_start(rows)
+            self.watermarks[ticker] = rows[-1]['ts'] if rows else floor
+
+        loaded = sum(len(rows) for rows in history.values())
+        print(f"[{datetime.now()}] MultiEngine: warmed up {len(self.tickers)} tickers with {loaded} records.")
+
+    def run(self):
+        print(f"--- Starting Multi-Strategy Engine ({len(self.tickers)} tickers, "
+              f"{sum(len(s) for s in self.strategies.values())} strategies) ---")
+
+        # 1. Warm-up
+        self.warm_up(limit=50)
+
+        if self.risk:
+            self.risk.start()
+        if self.signal_writer:
+            self.signal_writer.start()
+        try:
+            if self.subscription is not None:
+                self._run_bus()
+            else:
+                self._run_db()
+        finally:
+            if self.risk:
+                self.risk.close()
+            # Flushes pending signals
+            if self.signal_writer:
+                self.signal_writer.close()
+
+    def _run_bus(self):
+        print(f"[{datetime.now()}] MultiEngine: running on the tick bus.")
+        while not self.stop_event.is_set():
+            rows = self.subscription.drain(Config.ENGINE_MAX_BARS_PER_CYCLE, timeout=Config.ENGINE_POLL_INTERVAL)
+            # Market tuples: (ts, ticker, provider, interval, open, high, low, close, volume).
+            # Trade rows are skipped, as on the DB path (instrument_ids leaves tick series out)
+            self.dispatch((row[0], row[1], row[7]) for row in rows if row[3] != 'tick')
+
+    def _run_db(self):
+        listener = None
+        if Config.ENGINE_MODE == 'notify':
+            listener = self.db.listen()
+
+        # 2. Main Loop
+        try:
+            while not self.stop_event.is_set():
+                if listener:
+                    # Any ticker wakes us; one query then serves all of them
+                    listener.wait(Config.ENGINE_POLL_INTERVAL)
+                else:
+                    self.stop_event.wait(Config.ENGINE_POLL_INTERVAL) # Poll frequency
+
+                self.run_cycle()
+        finally:
+            if listener:
+                listener.close()
+
+    def run_cycle(self):
+        """
+        Fetches all new bars with one query and dispatches them in time order.
+        Returns the number of bars dispatched.
+        """
+        bars = self.db.get_bars_since(self.watermarks, limit=Config.ENGINE_MAX_BARS_PER_CYCLE)
+        if not bars:
+            return 0
+        return self.dispatch((bar['ts'], bar['ticker'], bar['close']) for bar in bars)
+
+    def dispatch(self, ticks):
+        """
+        Sends (ts, ticker, price) ticks, in time order, to the strategies of
+        each ticker. Returns the number of ticks dispatched.
+        """
+        now = datetime.now(timezone.utc)
+        dispatched = 0
+        stale = 0
+        for ts, ticker, price in ticks:
+            if ts.tzinfo is None:
+                # Assume UTC if naive
+                ts = ts.replace(tzinfo=timezone.utc)
+            self.watermarks[ticker] = ts
+
+            # Rows older than the max age mean backfill is still catching up
+            if (now - ts).total_seconds() > Config.ENGINE_MAX_TICK_AGE:
+                stale += 1
+                continue
+
+            for strategy in self.strategies[ticker]:
+                strategy.on_tick(price, ts)
+            self.tick_latency.observe((time.time() - ts.timestamp()) * 1000)
+            dispatched += 1
+
+        if stale:
+            log.debug("MultiEngine: Syncing... skipped %d historical rows.", stale)
+        if dispatched:
+            log.debug("MultiEngine: dispatched %d bars | %s", dispatched, self.tick_latency)
+        return dispatched
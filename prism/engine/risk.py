@@ -0,0 +1,265 @@
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime
+
+from storage.timescale_handler import ORDER_CHANNEL
+from strategies.signals import Order, RiskCheck
+from utils import metrics
+from utils.config import Config
+
+# Signed position -> order side
+ORDER_SIDES = {1: "BUY", -1: "SELL"}
+# Order statuses whose unfilled quantity still counts as exposure
+OPEN_STATUSES = ["NEW", "PARTIAL"]
+
+# Positions and open orders per (strategy, ticker) in one pass over orders/fills:
+# latest status of every order, signed filled quantity per order, and the
+# remaining signed quantity of the orders that are still open.
+REBUILD_SQL = """
+    WITH latest AS (
+        SELECT DISTINCT ON (id) id, ticker, side, quantity, status, strategy
+        FROM orders
+        ORDER BY id, ts DESC
+    ), filled AS (
+        SELECT order_id, ticker, sum(CASE WHEN side = 'BUY' THEN quantity ELSE -quantity END) AS qty
+        FROM fills
+        GROUP BY order_id, ticker
+    ), joined AS (
+        SELECT coalesce(o.strategy, '') AS strategy, coalesce(f.ticker, o.ticker) AS ticker, o.id,
+               coalesce(f.qty, 0) AS filled,
+               CASE WHEN o.status = ANY(%s)
+                    THEN (CASE WHEN o.side = 'BUY' THEN 1 ELSE -1 END) * o.quantity - coalesce(f.qty, 0)
+               END AS remaining
+        FROM latest o
+        FULL JOIN filled f ON f.order_id = o.id
+    )
+    SELECT strategy, ticker, sum(filled),
+           array_agg(id) FILTER (WHERE remaining IS NOT NULL),
+           array_agg(remaining) FILTER (WHERE remaining IS NOT NULL)
+    FROM joined
+    GROUP BY strategy, ticker
+"""
+
+
+class RiskEngine:
+    """
+    In-memory pre-trade risk checks.
+
+    Keeps signed positions (from fills) and open order quantities (from order
+    events) per (strategy, ticker), plus their running total per ticker, all
+    updated incrementally, so a decision is a few dict lookups instead of a
+    query over orders/fills. start() rebuilds the state with one aggregate
+    query (rebuild()) and then follows ORDER_CHANNEL, where triggers on
+    orders/fills announce every status change and fill (on_event()).
+
+    on_signal() is meant to be a Strategy sink: it sizes the order that moves
+    the strategy to the signalled position (RISK_ORDER_NOTIONAL per unit of
+    position), checks it against the limits and, through the SignalWriter,
+    records the signal, one `risk` row with the decision and the approved order,
+    in the same batch.
+
+    Limits (0 disables one):
+        max_notional  - |projected ticker position| * price, across strategies
+        max_position  - |target quantity| of one strategy on one ticker
+        max_order_rate - orders per strategy and ticker in the last 60 seconds
+
+    The notional and position limits only stop orders that increase exposure,
+    so a strategy can always reduce or close a position that breached a limit
+    (e.g. after a price move).
+    """
+    def __init__(self, db=None, writer=None, order_notional: float = None, max_notional: float = None,
+                 max_position: float = None, max_order_rate: int = None):
+        self.db = db
+        self.writer = writer
+        self.order_notional = order_notional or Config.RISK_ORDER_NOTIONAL
+        self.max_notional = Config.RISK_MAX_NOTIONAL if max_notional is None else max_notional
+        self.max_position = Config.RISK_MAX_POSITION if max_position is None else max_position
+        self.max_order_rate = Config.RISK_MAX_ORDERS_PER_MINUTE if max_order_rate is None else max_order_rate
+
+        self.lock = threading.Lock()
+        self.positions = defaultdict(float)  # (strategy, ticker) -> filled quantity (signed)
+        self.pending = defaultdict(float)    # (strategy, ticker) -> open order quantity (signed)
+        self.exposure = defaultdict(float)   # ticker -> positions + pending over all strategies
+        self.orders = {}                     # open order id -> [(strategy, ticker), remaining signed quantity]
+        self.order_times = defaultdict(deque)  # (strategy, ticker) -> monotonic times of recent orders
+
+        self.listener = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        self.check_ms = metrics.histogram("risk.check_ms")
+        self.rejected = metrics.counter("risk.rejected")
+
+    def rebuild(self):
+        """
+        Loads positions and open orders from the database. Returns False on error.
+        """
+        try:
+            with self.db.cursor() as cur:
+                cur.execute(REBUILD_SQL, (OPEN_STATUSES,))
+                rows = cur.fetchall()
+        except Exception as e:
+            print(f"[{datetime.now()}] RiskEngine: could not rebuild state: {e}")
+            return False
+
+        with self.lock:
+            self.positions.clear()
+            self.pending.clear()
+            self.exposure.clear()
+            self.orders.clear()
+            for strategy, ticker, filled, order_ids, remaining in rows:
+                key = (strategy, ticker)
+                self.positions[key] = float(filled or 0.0)
+                self.exposure[ticker] += self.positions[key]
+                for order_id, quantity in zip(order_ids or [], remaining or []):
+                    self._add_pending(order_id, key, float(quantity))
+        print(f"[{datetime.now()}] RiskEngine: rebuilt {len(rows)} positions, {len(self.orders)} open orders.")
+        return True
+
+    def start(self):
+        """
+        Rebuilds the state and applies order/fill events from ORDER_CHANNEL on a daemon thread.
+        """
+        # LISTEN before the rebuild, so no event committed after the query is missed
+        # (one committed while the query runs may be counted twice until the next rebuild)
+        self.listener = self.db.listen(ORDER_CHANNEL)
+        self.rebuild()
+        self.thread = threading.Thread(target=self._follow, name="risk-events", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=Config.ENGINE_POLL_INTERVAL + 1)
+        if self.listener:
+            self.listener.close()
+
+    def _follow(self):
+        connection = self.listener.conn
+        while not self.stop_event.is_set():
+            events = self.listener.wait(Config.ENGINE_POLL_INTERVAL)
+            if self.listener.conn is not connection:
+                # (Re)connected: events sent while it was down are lost, reload them from orders/fills.
+                # This batch arrived before the rebuild query, so it is already part of it.
+                connection = self.listener.conn
+                if connection is not None:
+                    self.rebuild()
+                continue
+            for event in events:
+                self.on_event(event)
+
+    def on_event(self, event: dict):
+        """
+        Applies one ORDER_CHANNEL payload (see ORDER_EVENTS_SQL).
+        """
+        try:
+            if event.get("type") == "fill":
+                self.on_fill(event["order_id"], event["ticker"], event["side"], float(event["quantity"] or 0.0))
+            elif event.get("type") == "order":
+                self.on_order_status(event["id"], event["status"])
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"[{datetime.now()}] RiskEngine: ignoring malformed order event {event}: {e}")
+
+    def _add_pending(self, order_id: str, key: tuple, quantity: float):
+        self.orders[order_id] = [key, quantity]
+        self.pending[key] += quantity
+        self.exposure[key[1]] += quantity
+
+    def on_signal(self, signal):
+        """
+        Persists a Signal and turns it into a checked order. Returns the
+        approved Order, or None if nothing is traded or the order is rejected.
+        """
+        if self.writer:
+            self.writer.put(signal)
+        order, check = self.check_signal(signal)
+        if self.writer:
+            if check:
+                self.writer.put(check)
+            if order:
+                self.writer.put(order)
+        return order
+
+    def check_signal(self, signal):
+        """
+        Sizes and checks the order for a Signal; approved orders are registered
+        as open. Returns (Order or None, RiskCheck or None).
+        """
+        started = time.perf_counter()
+        strategy, ticker, price = signal.model, signal.ticker, signal.price
+        key = (strategy, ticker)
+
+        with self.lock:
+            if not price or price <= 0:
+                return None, self._decision(signal, "price", "REJECT", None, "signal without a valid price", started)
+
+            target = signal.position * self.order_notional / price
+            current = self.positions[key] + self.pending[key]
+            quantity = target - current
+            if abs(quantity) * price < 1e-9:
+                return None, None
+            exposure = self.exposure[ticker]
+            projected = abs(exposure + quantity) * price
+
+            if self.max_position and abs(target) > self.max_position and abs(target) > abs(current):
+                return None, self._decision(signal, "max_position", "REJECT", projected,
+                                            f"target {abs(target):.6g} > {self.max_position:g}", started)
+            if self.max_notional and projected > self.max_notional and abs(exposure + quantity) > abs(exposure):
+                return None, self._decision(signal, "max_notional", "REJECT", projected,
+                                            f"notional {projected:,.2f} > {self.max_notional:,.2f}", started)
+
+            now = time.monotonic()
+            times = self.order_times[key]
+            while times and now - times[0] > 60:
+                times.popleft()
+            if self.max_order_rate and len(times) >= self.max_order_rate:
+                return None, self._decision(signal, "order_rate", "REJECT", projected,
+                                            f"{len(times)} orders in the last minute", started)
+
+            times.append(now)
+            order = Order(signal.ts, uuid.uuid4().hex, ticker, ORDER_SIDES[1 if quantity > 0 else -1],
+                          abs(quantity), strategy=strategy)
+            self._add_pending(order.id, key, quantity)
+            return order, self._decision(signal, "pre_trade", "PASS", projected, None, started)
+
+    def _decision(self, signal, check_name: str, result: str, exposure, reason, started):
+        if result != "PASS":
+            self.rejected.inc()
+        self.check_ms.observe((time.perf_counter() - started) * 1000)
+        return RiskCheck(signal.ts, signal.model, signal.ticker, check_name, result, exposure, reason)
+
+    def on_order_status(self, order_id: str, status: str):
+        """
+        Order event: once an order is no longer open its unfilled quantity stops counting.
+        """
+        if status in OPEN_STATUSES:
+            return
+        with self.lock:
+            entry = self.orders.pop(order_id, None)
+            if entry:
+                key, remaining = entry
+                self.pending[key] -= remaining
+                self.exposure[key[1]] -= remaining
+
+    def on_fill(self, order_id: str, ticker: str, side: str, quantity: float):
+        """
+        Fill event: moves the filled quantity from the open order to the position.
+        Fills of unknown orders are booked under strategy ''.
+        """
+        signed = quantity if side == "BUY" else -quantity
+        with self.lock:
+            entry = self.orders.get(order_id)
+            key = entry[0] if entry else ("", ticker)
+            self.positions[key] += signed
+            self.exposure[ticker] += signed
+            if entry:
+                # Never release more than the order still had open
+                released = max(min(signed, entry[1]), 0.0) if entry[1] > 0 else min(max(signed, entry[1]), 0.0)
+                entry[1] -= released
+                self.pending[key] -= released
+                self.exposure[ticker] -= released
+                if abs(entry[1]) < 1e-12:
+                    del self.orders[order_id]
@@ -1,7 +1,14 @@
+import threading
 import time
 from datetime import datetime, timezone
+from engine.risk import RiskEngine
+from storage.signal_writer import SignalWriter
 from storage.timescale_handler import TimescaleHandler
+from utils import metrics
 from utils.config import Config
+from utils.logger import get_logger
+
+log = get_logger("engine")
 
 class StrategyEngine:
     def __init__(self, strategy):
@@ -16,15 +23,27 @@ class StrategyEngine:
             dbname=Config.DB_NAME
         )
 
+        # Row timestamp (exchange/ingest time) -> on_tick, and DB commit (NOTIFY) -> on_tick
+        self.tick_latency = metrics.histogram("engine.tick_to_on_tick_ms")
+        self.notify_latency = metrics.histogram("engine.notify_to_on_tick_ms")
+        self.stop_event = threading.Event()
+
+        # Emitted signals are persisted in batches off the engine thread
+        self.signal_writer = SignalWriter(self.db) if Config.SIGNAL_WRITER_ENABLED else None
+        # With risk enabled every signal also goes through the pre-trade checks
+        self.risk = RiskEngine(self.db, self.signal_writer) if Config.RISK_ENABLED else None
+        self.strategy.sink = self.risk.on_signal if self.risk else (self.signal_writer.put if self.signal_writer else None)
+
+    def stop(self):
+        """Makes run() return after the current tick (safe from a signal handler)."""
+        self.stop_event.set()
+
     def get_history(self, limit=100):
         """
         Selects recent history from DB.
         """
-        results = self.db.get_history(self.symbol, limit=limit)
-        # Runner expects chronological order for warm-up?
-        # Original: "dataset is ordered DESC... so we should reverse it"
-        # Handler returns DESC. So we reverse it here.
-        return results[::-1]
+        # Handler returns chronological order, ready for warm-up
+        return self.db.get_history(self.symbol, limit=limit)
 
     def get_latest(self):
         """
@@ -37,14 +56,16 @@ class StrategyEngine:
         
         # 1. Wait for DB and Warm-up
         history = []
-        while True:
+        while not self.stop_event.is_set():
             history = self.get_history(limit=50)
             if history:
                 print(f"[{datetime.now()}] Engine: DB connection established using {len(history)} records.")
                 break
             else:
                 print(f"[{datetime.now()}] Engine: Waiting for market data to act available...")
-                time.sleep(10)
+                self.stop_event.wait(10)
+        if self.stop_event.is_set():
+            return
         
         self.strategy.on_start(history)
         
@@ -53,8 +74,31 @@ class StrategyEngine:
             # We assume 'ts' column exists
             last_timestamp = history[-1].get('ts')
 
+        # Event-driven mode: block on LISTEN, keep polling only as a fallback
+        listener = None
+        if Config.ENGINE_MODE == 'notify':
+            listener = self.db.listen()
+        print(f"[{datetime.now()}] Engine: running in {'notify' if listener else 'poll'} mode.")
+
         # 2. Main Loop
-        while True:
+        if self.risk:
+            self.risk.start()
+        if self.signal_writer:
+            self.signal_writer.start()
+        try:
+            self._loop(listener, last_timestamp)
+        finally:
+            if listener:
+                listener.close()
+            if self.risk:
+                self.risk.close()
+            # Flushes pending signals
+            if self.signal_writer:
+                self.signal_writer.close()
+
+    def _loop(self, listener, last_timestamp):
+        while not self.stop_event.is_set():
+            notified = self.wait_for_tick(listener)
             latest = self.get_latest()
             
             if latest:
@@ -79,18 +123,44 @@ class StrategyEngine:
                 
                 # If data is older than 1 hour, we assume backfill is still running or system is catching up
                 if diff.total_seconds() > 3600:
-                    print(f"[{datetime.now()}] Engine: Syncing... Current DB Head: {ts}")
-                    time.sleep(5)
+                    log.debug("Engine: Syncing... Current DB Head: %s", ts)
                     continue
                     
                 # Process tick if new
                 if ts != last_timestamp:
-                    print(f"Engine: processing {latest.get('close')}")
+                    log.debug("Engine: processing %s", latest.get('close'))
                     price = latest.get('close')
                     self.strategy.on_tick(price, ts)
                     last_timestamp = ts
+                    self.record_latency(ts, notified)
             else:
                # No data returned
                pass
-            
-            time.sleep(5) # Poll frequency
+
+    def wait_for_tick(self, listener):
+        """
+        Blocks until the next tick for this symbol is announced, or the poll
+        interval elapses. Returns the write-path send time (epoch seconds) when
+        woken by a notification, None otherwise.
+        """
+        if listener is None:
+            self.stop_event.wait(Config.ENGINE_POLL_INTERVAL) # Poll frequency
+            return None
+
+        events = listener.wait(Config.ENGINE_POLL_INTERVAL, ticker=self.symbol)
+        if events:
+            return events[-1].get('sent')
+        return None
+
+    def record_latency(self, ts, notified):
+        """
+        Tracks tick-to-on_tick latency: age of the row when it reached the strategy
+        (comparable across modes) and, in notify mode, commit-to-wake time.
+        """
+        now = time.time()
+        self.tick_latency.observe((now - ts.timestamp()) * 1000)
+        if notified:
+            self.notify_latency.observe((now - notified) * 1000)
+
+        if self.tick_latency.count % Config.ENGINE_LATENCY_REPORT_EVERY == 0:
+            log.info("Engine latency -> %s | %s", self.tick_latency, self.notify_latency)
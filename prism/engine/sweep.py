@@ -0,0 +1,133 @@
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from engine.backtest import Backtester
+from utils.config import Config
+
+# Bars attached by each worker process: {ticker: {column: np.memmap}}
+_WORKER_BARS = {}
+
+
+class SharedBars:
+    """
+    Price arrays written once to memory-mapped files (in /dev/shm when available)
+    and attached read-only by every worker, so no process copies the history.
+    """
+    def __init__(self, directory: str = None):
+        base = directory or (Config.SWEEP_SHM_DIR if os.path.isdir(Config.SWEEP_SHM_DIR) else None)
+        self.directory = tempfile.mkdtemp(prefix="prism-sweep-", dir=base)
+        self.spec = {}  # {ticker: {column: (path, dtype, length)}}
+
+    def add(self, ticker: str, bars: dict):
+        columns = {}
+        for i, (name, values) in enumerate(bars.items()):
+            values = np.ascontiguousarray(values)
+            dtype = values.dtype.str
+            if values.dtype.kind == 'M':
+                # Store datetimes as int64 and restore the unit on attach
+                values = values.view(np.int64)
+            path = os.path.join(self.directory, f"{len(self.spec)}_{i}.bin")
+            mm = np.memmap(path, dtype=values.dtype, mode='w+', shape=values.shape)
+            mm[:] = values
+            mm.flush()
+            columns[name] = (path, dtype, len(values))
+        self.spec[ticker] = columns
+
+    @staticmethod
+    def attach(spec: dict):
+        bars = {}
+        for ticker, columns in spec.items():
+            bars[ticker] = {}
+            for name, (path, dtype, length) in columns.items():
+                storage = np.int64 if np.dtype(dtype).kind == 'M' else dtype
+                mm = np.memmap(path, dtype=storage, mode='r', shape=(length,)) if length else np.empty(0, storage)
+                bars[ticker][name] = mm.view(dtype) if np.dtype(dtype).kind == 'M' else mm
+        return bars
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _init_worker(spec):
+    global _WORKER_BARS
+    _WORKER_BARS = SharedBars.attach(spec)
+
+
+def _run_combination(strategy_cls, ticker, params, fee_bps):
+    strategy = strategy_cls(ticker, **params)
+    result = Backtester(strategy, fee_bps=fee_bps).run(_WORKER_BARS[ticker])
+    return {"ticker": ticker, **params, **result.stats}
+
+
+class ParameterSweep:
+    """
+    Grid search of a Strategy's parameters over one or more tickers.
+
+    Each ticker's history is loaded once and shared with a process pool through
+    memory-mapped arrays; every (ticker, parameter combination) is backtested in
+    a worker and the metrics are gathered into one results table.
+    """
+    def __init__(self, strategy_cls, grid: dict, workers: int = None, fee_bps: float = None):
+        self.strategy_cls = strategy_cls
+        self.grid = grid
+        self.workers = workers or Config.SWEEP_WORKERS or os.cpu_count()
+        self.fee_bps = fee_bps
+
+    def combinations(self):
+        keys = list(self.grid.keys())
+        return [dict(zip(keys, values)) for values in itertools.product(*self.grid.values())]
+
+    def run(self, tickers: list, start: datetime = None, end: datetime = None, bars: dict = None,
+            sort_by: str = "sharpe"):
+        """
+        :param bars: Optional preloaded {ticker: arrays}; otherwise loaded from TimescaleDB
+        :return: pandas DataFrame with one row per (ticker, combination)
+        """
+        if bars is None:
+            bars = {ticker: Backtester.load(ticker, start, end) for ticker in tickers}
+
+        shared = SharedBars()
+        try:
+            for ticker in tickers:
+                shared.add(ticker, bars[ticker])
+
+            combos = self.combinations()
+            tasks = [(ticker, params) for ticker in tickers for params in combos]
+            print(f"[{datetime.now()}] Sweep: {len(tasks)} backtests "
+                  f"({len(tickers)} tickers x {len(combos)} combinations) on {self.workers} workers.")
+
+            started = time.perf_counter()
+            rows = []
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(shared.spec,)) as pool:
+                futures = [pool.submit(_run_combination, self.strategy_cls, ticker, params, self.fee_bps)
+                           for ticker, params in tasks]
+                for future in as_completed(futures):
+                    try:
+                        rows.append(future.result())
+                    except Exception as e:
+                        print(f"[{datetime.now()}] Sweep: combination failed: {e}")
+
+            elapsed = time.perf_counter() - started
+            print(f"[{datetime.now()}] Sweep: done in {elapsed:.2f}s ({len(tasks) / elapsed:.1f} backtests/s).")
+        finally:
+            shared.close()
+
+        results = pd.DataFrame(rows)
+        if sort_by in results:
+            results = results.sort_values(sort_by, ascending=False).reset_index(drop=True)
+        return results
+
+
+if __name__ == "__main__":
+    # Example usage
+    from strategies.trend_following import TrendFollowing
+
+    sweep = ParameterSweep(TrendFollowing, {"window": [5, 10, 20, 50, 100, 200]})
+    print(sweep.run([Config.TARGET_TICKER]).to_string())
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+
+# Binance-style interval suffixes ('1m', '4h', '1d', '1w')
+INTERVAL_UNITS = {
+    "s": timedelta(seconds=1),
+    "m": timedelta(minutes=1),
+    "h": timedelta(hours=1),
+    "d": timedelta(days=1),
+    "w": timedelta(weeks=1),
+}
+
+# A downloaded range is only recorded as checked once it is this old: providers
+# may still publish the latest bars with some delay
+CHECKED_SETTLE = timedelta(hours=1)
+
+
+def interval_to_timedelta(interval: str) -> timedelta:
+    """
+    Converts an interval string such as '1m', '15m', '4h' or '1d' to a timedelta.
+    """
+    unit = interval[-1]
+    if unit not in INTERVAL_UNITS:
+        raise ValueError(f"Unsupported interval: {interval}")
+    return int(interval[:-1] or 1) * INTERVAL_UNITS[unit]
+
+
+def floor_time(ts: datetime, step: timedelta) -> datetime:
+    """
+    Floors a timestamp to the start of its interval (UTC epoch aligned).
+    """
+    epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return ts - ((ts - epoch) % step)
+
+
+def is_settled(end: datetime, now: datetime = None) -> bool:
+    """
+    True if a range ending at `end` is old enough to be recorded as checked.
+    """
+    return end <= (now or datetime.now(timezone.utc)) - CHECKED_SETTLE
+
+
+class BackfillPlanner:
+    """
+    Turns the holes of a stored series into a minimal list of provider requests.
+
+    Instead of resuming from max(ts), the planner asks the database for every
+    missing range (head, interior holes left by failed chunks, and tail) and
+    only those ranges are downloaded. On a mostly-complete dataset the work is
+    proportional to the missing data, not to the total history.
+
+    Given the provider, ranges already downloaded from it (backfill_checked) are
+    left out too: bars missing there do not exist upstream (before the listing
+    date, exchange outages), so they are not requested on every run.
+    """
+    def __init__(self, db, chunk_size: timedelta = timedelta(days=15)):
+        self.db = db
+        self.chunk_size = chunk_size
+
+    def plan(self, ticker: str, interval: str, start: datetime, end: datetime = None, tolerance: timedelta = None,
+             provider: str = None):
+        """
+        Returns half-open [start, end) request ranges, each at most `chunk_size` long.
+
+        :param interval: Stored interval of the series (e.g. '1m', '1d')
+        :param end: Defaults to the start of the current (still open) interval
+        :param tolerance: Spacing above which a hole is reported (e.g. 3 days for
+                          daily equity data, so weekends are not treated as holes)
+        :param provider: Provider the ranges will be requested from; enables skipping checked ranges
+        """
+        step = interval_to_timedelta(interval)
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if end is None:
+            end = floor_time(datetime.now(timezone.utc), step)
+        if start >= end:
+            return []
+
+        gaps = self.db.get_missing_ranges(ticker, interval, start, end, step, tolerance)
+        if gaps is None:
+            print(f"[{datetime.now()}] Planner: could not inspect {ticker} ({interval}). Skipping this run.")
+            return []
+
+        if provider:
+            checked = self.db.get_checked_ranges(ticker, provider, interval, start, end)
+            if checked:
+                gaps = self._subtract(self._merge(gaps), self._merge(checked))
+
+        requests = []
+        for gap_start, gap_end in self._merge(gaps):
+            current = gap_start
+            while current < gap_end:
+                chunk_end = min(current + self.chunk_size, gap_end)
+                requests.append((current, chunk_end))
+                current = chunk_end
+
+        missing = sum(((e - s) for s, e in gaps), timedelta())
+        print(f"[{datetime.now()}] Planner: {ticker} ({interval}) has {len(gaps)} gap(s) "
+              f"totalling {missing} -> {len(requests)} request(s).")
+        return requests
+
+    @staticmethod
+    def _merge(ranges):
+        """
+        Coalesces overlapping or touching ranges. Ranges separated by stored
+        data are kept apart so existing rows are never downloaded again.
+        """
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    @staticmethod
+    def _subtract(ranges, removed):
+        """
+        Parts of `ranges` not covered by `removed` (both sorted and merged).
+        """
+        result = []
+        for start, end in ranges:
+            for cut_start, cut_end in removed:
+                if cut_end <= start or cut_start >= end:
+                    continue
+                if cut_start > start:
+                    result.append((start, cut_start))
+                start = max(start, cut_end)
+                if start >= end:
+                    break
+            if start < end:
+                result.append((start, end))
+        return result
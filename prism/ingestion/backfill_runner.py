@@ -0,0 +1,194 @@
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ingestion.backfill_planner import interval_to_timedelta, is_settled
+from utils.config import Config
+from utils.rate_limiter import RateLimiter
+
+# Binance serves at most 1000 klines per request; each request costs 2 weight
+BINANCE_KLINES_PER_REQUEST = 1000
+BINANCE_KLINES_WEIGHT = 2
+
+
+class TickerProgress:
+    """
+    Per-ticker counters used for progress and throughput reporting.
+    """
+    def __init__(self, ticker: str, chunks_total: int):
+        self.ticker = ticker
+        self.chunks_total = chunks_total
+        self.chunks_done = 0
+        self.errors = 0
+        self.rows = 0
+        self.started = None
+        self.finished = None
+
+    def throughput(self):
+        if not self.started:
+            return 0.0
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.ticker}: {self.chunks_done}/{self.chunks_total} chunks, {self.rows} rows, "
+                f"{self.errors} errors, {self.throughput():,.0f} rows/s")
+
+
+class ConcurrentBackfill:
+    """
+    Fetches planned backfill chunks for many tickers in parallel.
+
+    A pool of fetch workers shares one provider-aware rate limiter. Downloaded
+    chunks go through a bounded queue to a single writer thread, so DB inserts
+    overlap with network fetches. A failing chunk is logged and skipped; if the
+    writer thread itself dies, fetchers stop waiting on the queue and run()
+    raises.
+    """
+    def __init__(self, service, workers: int = None, queue_size: int = None, limiter: RateLimiter = None,
+                 stop_event: threading.Event = None):
+        self.service = service
+        # Once set, pending chunks are skipped; chunks already downloaded are still written
+        self.stop_event = stop_event or threading.Event()
+        self.workers = workers or Config.BACKFILL_WORKERS
+        self.queue = queue.Queue(maxsize=queue_size or Config.BACKFILL_QUEUE_SIZE)
+        self.limiter = limiter or RateLimiter.for_provider(service.source)
+        self.progress = {}
+        self.lock = threading.Lock()
+        self.writer_done = threading.Event()
+        self.writer_error = None
+
+    def run(self, plans: dict, interval: str):
+        """
+        :param plans: {ticker: [(start, end), ...]} as produced by BackfillPlanner
+        :param interval: Interval of the series being backfilled
+        """
+        tasks = [(ticker, start, end) for ticker, ranges in plans.items() for start, end in ranges]
+        self.progress = {ticker: TickerProgress(ticker, len(ranges)) for ticker, ranges in plans.items() if ranges}
+        if not tasks:
+            print(f"[{datetime.now()}] Backfill: nothing to download.")
+            return self.progress
+
+        print(f"[{datetime.now()}] Backfill: {len(tasks)} chunks for {len(self.progress)} tickers "
+              f"on {self.workers} workers.")
+
+        started = time.monotonic()
+        self.writer_done.clear()
+        self.writer_error = None
+        writer = threading.Thread(target=self._write_loop, name="backfill-writer", daemon=True)
+        writer.start()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as pool:
+            futures = {pool.submit(self._fetch, ticker, interval, start, end): (ticker, start, end)
+                       for ticker, start, end in tasks}
+
+        for future, (ticker, start, end) in futures.items():
+            error = future.exception()
+            if error is not None:
+                print(f"   -> Fetch worker failed for {ticker} {start} -> {end}: {error!r}")
+                with self.lock:
+                    self.progress[ticker].errors += 1
+
+        # All fetches are done; let the writer drain the queue and stop
+        self._enqueue(None)
+        writer.join()
+        if self.writer_error is not None:
+            raise RuntimeError(f"Backfill writer stopped unexpectedly: {self.writer_error!r}")
+
+        if self.stop_event.is_set():
+            print(f"[{datetime.now()}] Backfill: stopped, remaining chunks are left for the next run.")
+
+        elapsed = time.monotonic() - started
+        total_rows = sum(p.rows for p in self.progress.values())
+        print(f"[{datetime.now()}] Backfill: {total_rows} rows in {elapsed:.1f}s "
+              f"({total_rows / elapsed if elapsed > 0 else 0:,.0f} rows/s).")
+        return self.progress
+
+    def _request_weight(self, interval: str, start, end):
+        """
+        Estimates the provider budget a chunk consumes.
+        """
+        if self.service.source != 'binance':
+            return 1
+        candles = (end - start) / interval_to_timedelta(interval)
+        # +1 request: python-binance looks up the earliest valid timestamp first
+        return (math.ceil(candles / BINANCE_KLINES_PER_REQUEST) + 1) * BINANCE_KLINES_WEIGHT
+
+    def _fetch(self, ticker: str, interval: str, start, end):
+        if self.stop_event.is_set():
+            return
+        progress = self.progress[ticker]
+        with self.lock:
+            if progress.started is None:
+                progress.started = time.monotonic()
+
+        try:
+            # Cached ranges cost no provider budget
+            if not self.service.is_cached(ticker, interval, start, end):
+                self.limiter.acquire(self._request_weight(interval, start, end))
+            history = self.service.fetch_range(ticker, interval, start, end)
+        except Exception as e:
+            # The range stays missing in the DB; the next run's plan picks it up again.
+            print(f"   -> Error in chunk {ticker} {start} -> {end}: {e}")
+            history = None
+            with self.lock:
+                progress.errors += 1
+
+        # Blocks when the writer falls behind (backpressure)
+        self._enqueue((ticker, interval, start, end, history))
+
+    def _enqueue(self, item):
+        """
+        Puts an item on the bounded queue, giving up if the writer is gone
+        (nobody would ever make room).
+        """
+        while True:
+            try:
+                self.queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                if self.writer_done.is_set():
+                    return
+
+    def _write_loop(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    # Keep draining: one bad chunk must not stall the fetchers
+                    print(f"   -> Error writing chunk for {item[0]}: {e}")
+        except BaseException as e:
+            self.writer_error = e
+            raise
+        finally:
+            self.writer_done.set()
+
+    def _write(self, ticker: str, interval: str, start, end, history):
+        written = 0
+        if history:
+            try:
+                written = self.service.store(ticker, interval, history) or 0
+            except Exception as e:
+                print(f"   -> Error storing chunk for {ticker}: {e}")
+        if written:
+            # Rows landed behind data that may already be cached (see HistoryCache.sync)
+            self.service.mark_repaired(ticker, interval, start, end)
+        # Whatever is still missing in a fully stored (even empty) closed chunk does not exist upstream
+        if history is not None and written == len(history) and is_settled(end):
+            self.service.mark_checked(ticker, interval, start, end)
+
+        progress = self.progress[ticker]
+        with self.lock:
+            progress.rows += written
+            progress.chunks_done += 1
+            done = progress.chunks_done == progress.chunks_total
+            if done:
+                progress.finished = time.monotonic()
+        print(f"[{datetime.now()}] Backfill {'done' if done else 'progress'} -> {progress}")
@@ -2,21 +2,29 @@ import os
 import requests
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
+import time
 from datetime import datetime
 import pandas as pd
+from ingestion.backfill_planner import interval_to_timedelta
+from ingestion.response_cache import ResponseCache
+from processors.bar_batch import BarBatch
 
 class BinanceProcessor:
     """
     Processor to interact with Binance API using python-binance library.
     """
-    def __init__(self, api_key: str = None, api_secret: str = None):
+    def __init__(self, api_key: str = None, api_secret: str = None, cache: ResponseCache = None, client=None):
         self.api_key = api_key or os.getenv("BINANCE_API_KEY")
         self.api_secret = api_secret or os.getenv("BINANCE_SECRET_KEY")
-        
+        # Historical responses for closed ranges are served from disk when cached
+        self.cache = cache or ResponseCache()
+
         # Initialize the Client
         # If no keys are provided, it will work in public mode (some endpoints only)
         # but for full functionality (trading, user data), keys are required.
-        self.client = Client(self.api_key, self.api_secret)
+        # Replay mode must not touch the network, not even for the initial ping.
+        # A pre-built (or fake) client can be injected, e.g. by the benchmarks.
+        self.client = client or Client(self.api_key, self.api_secret, ping=self.cache.mode != 'replay')
         
         print(f"[{datetime.now()}] BinanceProcessor Initialized.")
 
@@ -43,26 +51,48 @@ class BinanceProcessor:
         :param start_str: Start date string in UTC format or timestamp
         :param end_str: Optional end date string
         """
+        batch = self.get_historical_batch(symbol, interval, start_str, end_str)
+        records = batch.to_records()
+        interval_ms = int(interval_to_timedelta(interval).total_seconds() * 1000)
+        for record in records:
+            record["close_time"] = record["timestamp"] + interval_ms - 1
+        return records
+
+    def get_historical_batch(self, symbol: str, interval: str, start_str, end_str=None):
+        """
+        Fetches historical klines as a columnar BarBatch (no per-candle dicts).
+        Same arguments as get_historical_data.
+        """
+        key = self._cache_key(symbol, interval, start_str, end_str)
+        klines = self.cache.fetch(key, lambda: self._download_klines(symbol, interval, start_str, end_str))
+        return BarBatch.from_klines(symbol, klines, interval)
+
+    def is_cached(self, symbol: str, interval: str, start_str, end_str=None):
+        """True if get_historical_data would be answered without a request."""
+        return self.cache.mode == 'replay' or self.cache.contains(self._cache_key(symbol, interval, start_str, end_str))
+
+    def _cache_key(self, symbol: str, interval: str, start_str, end_str):
+        """
+        Cache key of a request, or None if the range is not closed yet.
+        Only millisecond bounds are cacheable (date strings are relative).
+        """
+        if not isinstance(start_str, int) or not isinstance(end_str, int):
+            return None
+        # end_str is inclusive: the last candle must have closed already
+        interval_ms = int(interval_to_timedelta(interval).total_seconds() * 1000)
+        if end_str + interval_ms > time.time() * 1000:
+            return None
+        return ResponseCache.key('binance/klines', symbol, interval, start_str, end_str)
+
+    def _download_klines(self, symbol: str, interval: str, start_str, end_str):
+        """
+        Raw klines as returned by Binance: [Open time, Open, High, Low, Close, Volume, Close time, ...]
+        """
         try:
             print(f"[{datetime.now()}] Fetching historical data for {symbol} from {start_str}...")
             klines = self.client.get_historical_klines(symbol, interval, start_str, end_str)
-            
-            # Format: [Open time, Open, High, Low, Close, Volume, Close time, ...]
-            # convert to dataframe or list of dicts as needed
-            processed_data = []
-            for k in klines:
-                processed_data.append({
-                    "timestamp": k[0],
-                    "open": float(k[1]),
-                    "high": float(k[2]),
-                    "low": float(k[3]),
-                    "close": float(k[4]),
-                    "volume": float(k[5]),
-                    "close_time": k[6]
-                })
-                
-            print(f"[{datetime.now()}] Retrieved {len(processed_data)} historical records.")
-            return processed_data
+            print(f"[{datetime.now()}] Retrieved {len(klines)} historical records.")
+            return klines
 
         except BinanceAPIException as e:
             print(f"Binance API Exception: {e}")
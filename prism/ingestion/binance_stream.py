@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import websocket
+
+from utils.config import Config
+
+# Binance accepts at most 5 incoming messages per second per connection,
+# so large universes are subscribed in paced batches.
+SUBSCRIBE_BATCH = 200
+SUBSCRIBE_PAUSE = 0.25
+# First reconnect delay in seconds (doubles up to BINANCE_WS_MAX_BACKOFF)
+RECONNECT_BACKOFF = 1.0
+
+
+def parse_kline(data: dict):
+    """
+    Converts a kline event into the same dict shape as BinanceProcessor.get_historical_data.
+    """
+    k = data['k']
+    return {
+        "timestamp": k['t'],
+        "open": float(k['o']),
+        "high": float(k['h']),
+        "low": float(k['l']),
+        "close": float(k['c']),
+        "volume": float(k['v']),
+        "close_time": k['T'],
+        "closed": k['x'],
+    }
+
+
+class BinanceStream:
+    """
+    Streams kline/trade events for many symbols over one multiplexed WebSocket.
+
+    Connects to the combined-stream endpoint, subscribes every symbol, and keeps
+    the connection alive: server pings are answered, silent connections are
+    probed with a client ping, and any failure triggers a reconnect with
+    exponential backoff followed by a full resubscribe.
+    The endpoint is configurable, so it can be pointed at a local fake server.
+
+    After every (re)connect, on_connect(down_since, connected_at) is called with
+    the time the previous connection was lost (None on the first connect), so
+    the caller can backfill the bars the stream missed.
+    """
+    def __init__(self, tickers: list, on_kline=None, on_trade=None, interval: str = None,
+                 streams: list = None, url: str = None, heartbeat: float = None, on_connect=None):
+        self.tickers = tickers
+        self.on_kline = on_kline
+        self.on_trade = on_trade
+        self.on_connect = on_connect
+        self.interval = interval or Config.KLINE_INTERVAL
+        self.streams = streams or Config.BINANCE_WS_STREAMS
+        self.url = url or Config.BINANCE_WS_URL
+        self.heartbeat = heartbeat or Config.BINANCE_WS_HEARTBEAT
+
+        self.ws = None
+        self.request_id = 0
+        self.reconnects = 0
+        self.down_since = None
+        self.stop_event = threading.Event()
+
+    def stream_names(self):
+        names = []
+        for ticker in self.tickers:
+            symbol = ticker.lower()
+            if 'kline' in self.streams:
+                names.append(f"{symbol}@kline_{self.interval}")
+            if 'trade' in self.streams:
+                names.append(f"{symbol}@trade")
+        return names
+
+    def stop(self):
+        self.stop_event.set()
+        if self.ws:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+
+    def run(self):
+        """
+        Blocks until stop() is called, reconnecting whenever the connection drops.
+        """
+        backoff = RECONNECT_BACKOFF
+        while not self.stop_event.is_set():
+            connected_at = None
+            try:
+                self._connect()
+                backoff = RECONNECT_BACKOFF
+                connected_at = datetime.now(timezone.utc)
+                if self.on_connect:
+                    self.on_connect(self.down_since, connected_at)
+                self.down_since = None
+                self._read_loop()
+            except Exception as e:
+                if self.stop_event.is_set():
+                    break
+                print(f"[{datetime.now()}] BinanceStream: connection lost ({e}). Reconnecting in {backoff:.1f}s...")
+            finally:
+                self._close()
+                # Failed attempts keep the time of the first drop
+                if connected_at and self.down_since is None:
+                    self.down_since = datetime.now(timezone.utc)
+
+            if self.stop_event.wait(backoff):
+                break
+            backoff = min(backoff * 2, Config.BINANCE_WS_MAX_BACKOFF)
+            self.reconnects += 1
+
+    def _connect(self):
+        self.ws = websocket.create_connection(self.url, timeout=self.heartbeat)
+        names = self.stream_names()
+        for i in range(0, len(names), SUBSCRIBE_BATCH):
+            self.request_id += 1
+            self.ws.send(json.dumps({
+                "method": "SUBSCRIBE",
+                "params": names[i:i + SUBSCRIBE_BATCH],
+                "id": self.request_id,
+            }))
+            if i + SUBSCRIBE_BATCH < len(names):
+                time.sleep(SUBSCRIBE_PAUSE)
+        print(f"[{datetime.now()}] BinanceStream: subscribed to {len(names)} streams on {self.url}.")
+
+    def _close(self):
+        if self.ws:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+
+    def _read_loop(self):
+        awaiting_pong = False
+        while not self.stop_event.is_set():
+            try:
+                opcode, frame = self.ws.recv_data_frame(control_frame=True)
+            except websocket.WebSocketTimeoutException:
+                # Nothing received within the heartbeat window
+                if awaiting_pong:
+                    raise ConnectionError(f"no heartbeat for {2 * self.heartbeat:.0f}s")
+                self.ws.ping()
+                awaiting_pong = True
+                continue
+
+            # Any frame (data, ping or pong) proves the connection is alive
+            awaiting_pong = False
+            if opcode == websocket.ABNF.OPCODE_CLOSE:
+                raise ConnectionError("closed by server")
+            if opcode == websocket.ABNF.OPCODE_TEXT:
+                self._dispatch(json.loads(frame.data))
+
+    def _dispatch(self, message: dict):
+        # Combined streams wrap the payload: {"stream": ..., "data": {...}}
+        data = message.get('data', message)
+        event = data.get('e')
+        if event == 'kline' and self.on_kline:
+            self.on_kline(data['s'], parse_kline(data), data['E'])
+        elif event == 'trade' and self.on_trade:
+            self.on_trade(data['s'], float(data['p']), float(data['q']), data['T'], data['E'])
+        elif 'error' in message:
+            print(f"[{datetime.now()}] BinanceStream: subscription error {message['error']}")
@@ -0,0 +1,138 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from utils.config import Config
+
+CACHE_MODES = ("on", "off", "replay")
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of provider historical responses.
+
+    Entries are keyed by sha256(provider, symbol, interval, start, end) and
+    only written for closed ranges (data that can no longer change), so a
+    backfill re-run never downloads the same range twice. The cache is bounded
+    to `max_bytes`; least recently used entries are evicted first.
+
+    Modes:
+        'on'     - serve hits, download and store misses
+        'off'    - pass-through
+        'replay' - serve from the cache only; misses return an empty result and
+                   nothing touches the network (offline pipeline benchmarks)
+    """
+    def __init__(self, directory: str = None, max_bytes: int = None, mode: str = None):
+        self.directory = directory or Config.PROVIDER_CACHE_DIR
+        self.max_bytes = max_bytes or Config.PROVIDER_CACHE_MAX_MB * 1024 * 1024
+        self.mode = (mode or Config.PROVIDER_CACHE_MODE).lower()
+        if self.mode not in CACHE_MODES:
+            raise ValueError(f"Unsupported cache mode: {self.mode}")
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # {key: size in bytes}, least recently used first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        if self.mode != "off":
+            self._scan()
+
+    @staticmethod
+    def key(provider: str, symbol: str, interval: str, start, end):
+        raw = json.dumps([provider, symbol.upper(), interval, str(start), str(end)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def _scan(self):
+        """Indexes existing entries, oldest access first."""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    stat = os.stat(os.path.join(root, name))
+                    found.append((stat.st_mtime, name[:-len(".json.gz")], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.size += size
+
+    def contains(self, key: str):
+        return key is not None and key in self.entries
+
+    def get(self, key: str):
+        """Returns the cached records, or None on a miss."""
+        if key is None:
+            return None
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                records = json.load(f)
+        except (FileNotFoundError, OSError, ValueError):
+            with self.lock:
+                self.size -= self.entries.pop(key, 0)
+            return None
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        # The mtime doubles as the access time for LRU order across runs
+        os.utime(path)
+        return records
+
+    def put(self, key: str, records: list):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=1) as f:
+            json.dump(records, f)
+        os.replace(tmp, path)
+
+        size = os.path.getsize(path)
+        with self.lock:
+            self.size += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def fetch(self, key: str, download):
+        """
+        Returns the records for `key`, calling `download()` on a miss.
+        `key` is None for ranges that are still open; those are never cached.
+        Empty downloads are not stored either (providers also answer errors with []).
+        """
+        if self.mode == "off":
+            return download()
+
+        records = self.get(key)
+        if records is not None:
+            self.hits += 1
+            return records
+
+        self.misses += 1
+        if self.mode == "replay":
+            print(f"[{datetime.now()}] ResponseCache: replay miss, returning no data.")
+            return []
+
+        records = download()
+        if key is not None and records:
+            try:
+                self.put(key, records)
+            except Exception as e:
+                print(f"[{datetime.now()}] ResponseCache: could not store response: {e}")
+        return records
+
+    def __str__(self):
+        return (f"ResponseCache[{self.mode}] {len(self.entries)} entries, {self.size / 1e6:.1f} MB, "
+                f"{self.hits} hits, {self.misses} misses")
@@ -1,14 +1,27 @@
+import threading
 import time
 import os
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from ingestion.backfill_planner import BackfillPlanner, floor_time, interval_to_timedelta
+from ingestion.backfill_runner import ConcurrentBackfill
 from ingestion.tiingo_ingestor import TiingoProcessor
 from ingestion.binance_ingestor import BinanceProcessor
+from ingestion.binance_stream import BinanceStream
 from storage.timescale_handler import TimescaleHandler
+from storage.write_buffer import WriteBuffer
 
+from utils import metrics
 from utils.config import Config
+from utils.logger import get_logger
+
+log = get_logger("ingestion")
+FETCH_MS = metrics.histogram("provider.fetch_ms")
+QUOTE_MS = metrics.histogram("provider.quote_ms")
+# Exchange event time -> received by the stream client
+EXCHANGE_LAG_MS = metrics.histogram("ingest.exchange_lag_ms")
 
 class IngestionService:
-    def __init__(self, tickers: list, source: str):
+    def __init__(self, tickers: list, source: str, bus=None):
         self.tickers = tickers
         self.source = source.lower()
         
@@ -24,123 +37,257 @@ class IngestionService:
             self.processor = BinanceProcessor()
         else:
             self.processor = TiingoProcessor()
+
+        # Live rows are written in micro-batches off the ingestion thread; with a
+        # TickBus they are published there first and the buffer is one more subscriber
+        self.writer = WriteBuffer(self.db, bus=bus)
+        self.stream = None
+        # End of the last backfill plan; the stream fills [backfilled_until, connect) when it connects
+        self.backfilled_until = None
+        self.gap_lock = threading.Lock()
+        # Set by stop(): backfill skips pending chunks and the live loops return
+        self.stop_event = threading.Event()
             
         print(f"[{datetime.now()}] Ingestion Service Initialized for {len(tickers)} tickers using {self.source}.")
 
+    def stop(self):
+        """
+        Asks backfill and live ingestion to return. Rows already downloaded or
+        buffered are still written (close() flushes the write buffer).
+        Safe to call from a signal handler.
+        """
+        self.stop_event.set()
+        if self.stream:
+            self.stream.stop()
+
     def close(self):
         """Cleanup resources."""
+        self.writer.close()
+        if self.source != 'binance':
+            self.processor.close()
         if self.db:
             self.db.close()
             print(f"[{datetime.now()}] Ingestion Service closed.")
 
     def run_backfill(self, start_date: str):
         """
-        Backfills historical data. Checks latest DB timestamp to avoid re-downloading everything.
-        Uses chunking to handle large datasets robustly.
+        Backfills historical data. Asks the DB for every missing range (not only
+        what comes after max(ts)) and downloads just those ranges, so holes left
+        by failed chunks are repaired on the next run.
         """
         import pandas as pd
-        from datetime import timedelta
-        
+
         print(f"--- Starting Backfill ({self.source}) ---")
-        
-        for ticker in self.tickers:
-            # 1. Determine Start Date
-            last_ts = None
-            try:
-                last_ts = self.db.get_latest_timestamp(ticker)
-            except Exception as e:
-                print(f"[{datetime.now()}] Warning: DB Query failed for {ticker}: {e}")
-
-            if last_ts:
-                # Add 1 min to avoid overlap
-                # Ensure last_ts is timestamp-aware or handle gracefully
-                if last_ts.tzinfo is None:
-                    last_ts = last_ts.replace(tzinfo=timezone.utc)
-                    
-                start_dt = last_ts + timedelta(minutes=1)
-                print(f"[{datetime.now()}] Found existing data for {ticker}. Resuming form: {start_dt}")
-            else:
-                # Parse config start string
-                try:
-                    start_dt = pd.to_datetime(start_date).to_pydatetime()
-                except:
-                    # Fallback
-                    start_dt = datetime.strptime(start_date, "%d %b, %Y")
-                
-                print(f"[{datetime.now()}] No existing data for {ticker}. Starting full download from {start_dt}.")
-
-            # 2. Loop in Chunks (e.g. 15 days)
-            # Ensure start_dt has timezone info if it doesn't, assuming UTC
-            if start_dt.tzinfo is None:
-                start_dt = start_dt.replace(tzinfo=timezone.utc)
-            
-            # Use current UTC time for 'now'
-            now = datetime.now(timezone.utc)
-            
-            chunk_size = timedelta(days=15)
-            
-            current_start = start_dt
-            
-            while current_start < now:
-                current_end = min(current_start + chunk_size, now)
-                
-                # Format for Binance (safe string format)
-                s_str = current_start.strftime("%d %b, %Y %H:%M:%S")
-                e_str = current_end.strftime("%d %b, %Y %H:%M:%S")
-                
-                if self.source == 'binance':
-                    interval = Config.KLINE_INTERVAL
-                    print(f"[{datetime.now()}] Downloading chunk {s_str} -> {e_str}...")
-                    try:
-                        history = self.processor.get_historical_data(ticker, interval=interval, start_str=s_str, end_str=e_str)
-                        if history:
-                            self.db.insert_bulk_data(ticker, history, source=self.source, interval=interval)
-                            # print(f"   -> Inserted {len(history)} records.") # Handler already prints
-                        else:
-                            print("   -> No data in this chunk (gap?).")
-                    except Exception as e:
-                         print(f"   -> Error in chunk: {e}")
-                else:
-                    # Tiingo
-                    history = self.processor.get_historical_data(ticker, start_date=s_str)
-                    if history:
-                        self.db.insert_bulk_data(ticker, history, source=self.source)
-                        
-                # Move forward
-                current_start = current_end
-                time.sleep(0.5) # Rate limit politeness
-        
+
+        # Parse config start string
+        try:
+            start_dt = pd.to_datetime(start_date).to_pydatetime()
+        except:
+            # Fallback
+            start_dt = datetime.strptime(start_date, "%d %b, %Y")
+
+        # Ensure start_dt has timezone info if it doesn't, assuming UTC
+        if start_dt.tzinfo is None:
+            start_dt = start_dt.replace(tzinfo=timezone.utc)
+
+        # Raw bars older than the retention window would just be dropped again
+        retention = self.db.retention_window()
+        if retention:
+            start_dt = max(start_dt, datetime.now(timezone.utc) - retention)
+
+        if self.source == 'binance':
+            interval = Config.KLINE_INTERVAL
+            tolerance = None
+        else:
+            # Tiingo serves daily bars; weekends are not holes
+            interval = '1d'
+            tolerance = timedelta(days=3)
+
+        self.backfilled_until = datetime.now(timezone.utc)
+        planner = BackfillPlanner(self.db, chunk_size=timedelta(days=15))
+        plans = {ticker: planner.plan(ticker, interval, start_dt, tolerance=tolerance, provider=self.source)
+                 for ticker in self.tickers}
+
+        ConcurrentBackfill(self, stop_event=self.stop_event).run(plans, interval)
+        log.debug("%s", self.processor.cache)
+
+        # History older than the rollups' refresh window is only materialized on demand
+        ranges = [r for ranges in plans.values() for r in ranges]
+        if ranges:
+            self.db.refresh_rollups(min(r[0] for r in ranges), max(r[1] for r in ranges))
+
         print("--- Backfill Complete ---")
 
+    def fetch_range(self, ticker: str, interval: str, start: datetime, end: datetime):
+        """
+        Downloads the half-open range [start, end) for one ticker.
+        Safe to call from several worker threads.
+        """
+        log.debug("Downloading chunk %s %s -> %s...", ticker, start, end)
+        with FETCH_MS.time():
+            return self.processor.get_historical_batch(**self._history_request(ticker, interval, start, end))
+
+    def is_cached(self, ticker: str, interval: str, start: datetime, end: datetime):
+        """
+        True if fetch_range would be served from the response cache (no provider budget needed).
+        """
+        return self.processor.is_cached(**self._history_request(ticker, interval, start, end))
+
+    def _history_request(self, ticker: str, interval: str, start: datetime, end: datetime):
+        """
+        Provider arguments for the half-open range [start, end).
+        """
+        if self.source == 'binance':
+            # Millisecond timestamps; endTime is inclusive on Binance
+            start_ms = int(start.timestamp() * 1000)
+            end_ms = int(end.timestamp() * 1000) - 1
+            return {"symbol": ticker, "interval": interval, "start_str": start_ms, "end_str": end_ms}
+
+        # Tiingo dates are inclusive (YYYY-MM-DD)
+        last_day = end - timedelta(days=1)
+        return {"ticker": ticker, "start_date": start.strftime("%Y-%m-%d"), "end_date": last_day.strftime("%Y-%m-%d")}
+
+    def store(self, ticker: str, interval: str, history):
+        """
+        Writes a downloaded chunk (BarBatch). Returns the number of rows inserted.
+        """
+        return self.db.insert_batch(history)
+
+    def mark_checked(self, ticker: str, interval: str, start: datetime, end: datetime):
+        """
+        Records [start, end) as fully downloaded, so the planner skips what is still missing there.
+        """
+        self.db.mark_checked(ticker, self.source, interval, start, end)
+
+    def fill_stream_gap(self, start: datetime, end: datetime, interval: str):
+        """
+        Backfills the bars that closed in [start, end) while the stream was not
+        connected (after the backfill, or during an outage). The bar still open
+        at `end` is left to the stream.
+        """
+        step = interval_to_timedelta(interval)
+        start, end = floor_time(start, step), floor_time(end, step)
+        if end <= start or self.stop_event.is_set():
+            return
+        with self.gap_lock:
+            print(f"[{datetime.now()}] Stream gap: backfilling {start} -> {end} for {len(self.tickers)} tickers.")
+            planner = BackfillPlanner(self.db, chunk_size=timedelta(days=15))
+            plans = {ticker: planner.plan(ticker, interval, start, end=end, provider=self.source)
+                     for ticker in self.tickers}
+            ConcurrentBackfill(self, stop_event=self.stop_event).run(plans, interval)
+
+    def mark_repaired(self, ticker: str, interval: str, start: datetime, end: datetime):
+        """
+        Records that backfilled rows were written into [start, end).
+        """
+        self.db.mark_repaired(ticker, self.source, interval, start, end)
+
     def run_live_ingestion(self):
         """
         Continuous loop for fetching and inserting realtime data.
+        Binance uses the WebSocket stream unless LIVE_MODE=poll.
         """
+        if self.stop_event.is_set():
+            return
+        if self.source == 'binance' and Config.LIVE_MODE == 'stream':
+            return self.run_stream_ingestion()
+
         print(f"--- Starting Live Ingestion ({self.source}) ---")
-        while True:
-            for ticker in self.tickers:
-                try:
+        self.writer.start()
+        try:
+            self._poll_loop()
+        finally:
+            self.writer.close()
+
+    def _poll_loop(self):
+        while not self.stop_event.is_set():
+            if self.source == 'binance':
+                self._poll_binance()
+            else:
+                self._poll_tiingo()
+
+            log.debug("WriteBuffer: %s", self.writer.metrics())
+
+            # Sleep logic (wakes up early on stop())
+            self.stop_event.wait(10 if self.source == 'binance' else 60)
+
+    def _poll_binance(self):
+        for ticker in self.tickers:
+            try:
+                with QUOTE_MS.time():
                     data = self.processor.get_latest_price(ticker)
-                    if data:
-                        timestamp = datetime.now(timezone.utc) # Default if not provided
-                        price = 0.0
-
-                        if self.source == 'binance':
-                            price = float(data.get('price', 0.0))
-                        else:
-                            # Tiingo
-                            price = data.get('last')
-                            if 'timestamp' in data:
-                                # Parse ISO
-                                timestamp = datetime.fromisoformat(data['timestamp'])
-                        
-                        print(f"[{datetime.now()}] INGEST: {ticker} @ {price}")
-                        self.db.insert_market_data(ticker, float(price), timestamp, source=self.source, interval=Config.KLINE_INTERVAL)
-                except Exception as e:
-                    print(f"Error ingest {ticker}: {e}")
-            
-            # Sleep logic
-            time.sleep(10 if self.source == 'binance' else 60)
+                if data:
+                    timestamp = datetime.now(timezone.utc)
+                    price = float(data.get('price', 0.0))
+                    log.debug("INGEST: %s @ %s", ticker, price)
+                    self.writer.put_tick(ticker, price, timestamp, source=self.source, interval=Config.KLINE_INTERVAL)
+            except Exception as e:
+                print(f"Error ingest {ticker}: {e}")
+
+    def _poll_tiingo(self):
+        """
+        One multi-ticker IEX request for the whole universe per cycle.
+        """
+        with QUOTE_MS.time():
+            quotes = self.processor.get_latest_prices(self.tickers)
+        log.debug("INGEST: %d/%d Tiingo quotes (last %.0f ms).", len(quotes), len(self.tickers), QUOTE_MS.last)
+
+        for ticker, data in quotes.items():
+            try:
+                price = data.get('last') or data.get('tngoLast')
+                if price is None:
+                    continue
+                timestamp = datetime.now(timezone.utc) # Default if not provided
+                if 'timestamp' in data:
+                    # Parse ISO
+                    timestamp = datetime.fromisoformat(data['timestamp'])
+                self.writer.put_tick(ticker, float(price), timestamp, source=self.source, interval=Config.KLINE_INTERVAL)
+            except Exception as e:
+                print(f"Error ingest {ticker}: {e}")
+
+    def run_stream_ingestion(self):
+        """
+        Streams kline/trade events for all tickers over one Binance WebSocket.
+        Closed klines are stored as full OHLCV bars; trades as ticks.
+        """
+        print(f"--- Starting Stream Ingestion ({self.source}) ---")
+        interval = Config.KLINE_INTERVAL
+
+        def on_kline(ticker, bar, event_ms):
+            EXCHANGE_LAG_MS.observe(time.time() * 1000 - event_ms)
+            if not bar['closed']:
+                return
+            log.debug("STREAM: %s bar close %s (lag %.0f ms)", ticker, bar['close'], EXCHANGE_LAG_MS.last)
+            self.writer.put_bar(ticker, bar, source=self.source, interval=interval)
+
+        def on_trade(ticker, price, quantity, trade_ms, event_ms):
+            EXCHANGE_LAG_MS.observe(time.time() * 1000 - event_ms)
+            timestamp = datetime.fromtimestamp(trade_ms / 1000, tz=timezone.utc)
+            self.writer.put_tick(ticker, price, timestamp, source=self.source, interval='tick')
+
+        def on_connect(down_since, connected_at):
+            start = down_since or self.backfilled_until
+            if start is None:
+                return
+            # Off the read thread: the stream keeps delivering while the gap is downloaded
+            threading.Thread(target=self._fill_stream_gap, args=(start, connected_at, interval),
+                             name="stream-gap", daemon=True).start()
+
+        self.stream = BinanceStream(self.tickers, on_kline=on_kline, on_trade=on_trade, interval=interval,
+                                    on_connect=on_connect)
+        if self.stop_event.is_set():
+            return
+        self.writer.start()
+        try:
+            self.stream.run()
+        finally:
+            self.writer.close()
+
+    def _fill_stream_gap(self, start: datetime, end: datetime, interval: str):
+        try:
+            self.fill_stream_gap(start, end, interval)
+        except Exception as e:
+            print(f"[{datetime.now()}] Stream gap backfill failed: {e}")
 
 if __name__ == "__main__":
     # Example usage
@@ -1,81 +1,150 @@
 import os
 import requests
 import json
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from ingestion.response_cache import ResponseCache
+from processors.bar_batch import BarBatch
+from utils.config import Config
 
 class TiingoProcessor:
     """
     Processor to interact with Tiingo API.
+
+    All requests share one keep-alive `requests.Session`, latest prices for a
+    whole universe come from the multi-ticker IEX endpoint, and per-ticker
+    requests (daily history) run concurrently over the same connection pool.
+    `base_url` can point at a local HTTP stub.
     """
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, base_url: str = None, pool_size: int = None,
+                 cache: ResponseCache = None):
         self.api_key = api_key or os.getenv("TIINGO_API_KEY")
-        if not self.api_key:
+        # Historical responses for closed ranges are served from disk when cached
+        self.cache = cache or ResponseCache()
+        if not self.api_key and self.cache.mode != 'replay':
             raise ValueError("TIINGO_API_KEY environment variable is not set.")
-        
-        self.base_url = "https://api.tiingo.com/iex"
-        print(f"[{datetime.now()}] TiingoProcessor Initialized.")
 
-    def get_latest_price(self, ticker: str):
-        """
-        Fetches the latest price for a ticker from Tiingo IEX endpoint.
-        """
-        headers = {
+        self.base_url = (base_url or Config.TIINGO_BASE_URL).rstrip("/")
+        self.pool_size = pool_size or Config.TIINGO_POOL_SIZE
+        self.timeout = Config.TIINGO_TIMEOUT
+
+        self.session = requests.Session()
+        self.session.headers.update({
             'Content-Type': 'application/json',
             'Authorization': f'Token {self.api_key}'
-        }
-        
+        })
+        # Transient server errors are retried on the pooled connection; 429s are reported to the caller
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        print(f"[{datetime.now()}] TiingoProcessor Initialized ({self.base_url}).")
+
+    def close(self):
+        self.session.close()
+
+    def _get(self, path: str, params: dict = None):
+        """
+        GETs a Tiingo endpoint. Returns the decoded JSON, or None on any error.
+        """
         try:
-            url = f"{self.base_url}/{ticker}"
-            response = requests.get(url, headers=headers)
-            
+            response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+
             if response.status_code == 200:
-                data = response.json()
-                if data:
-                    # data is a list of objects, we take the first one
-                    return data[0] 
+                return response.json()
             elif response.status_code == 429:
                 print(f"[{datetime.now()}] API Limit Reached (429). Pausing for a bit...")
                 return None
             else:
-                print(f"Error fetching data: {response.status_code} - {response.text}")
+                print(f"Error fetching {path}: {response.status_code} - {response.text}")
                 return None
-                
+
         except Exception as e:
-            print(f"Exception during Tiingo request: {e}")
+            print(f"Exception during Tiingo request {path}: {e}")
             return None
 
+    def get_latest_price(self, ticker: str):
+        """
+        Fetches the latest price for a ticker from Tiingo IEX endpoint.
+        """
+        data = self._get(f"/iex/{ticker}")
+        if data:
+            # data is a list of objects, we take the first one
+            return data[0]
+        return None
+
+    def get_latest_prices(self, tickers: list):
+        """
+        Fetches the latest IEX quotes for many tickers with the multi-ticker
+        endpoint: one round-trip per TIINGO_BATCH_SIZE tickers, batches in parallel.
+        Returns {ticker: quote} for the tickers Tiingo answered for.
+        """
+        batch_size = Config.TIINGO_BATCH_SIZE
+        batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+        if not batches:
+            return {}
+
+        def fetch(batch):
+            return self._get("/iex/", params={"tickers": ",".join(batch)}) or []
+
+        if len(batches) == 1:
+            responses = [fetch(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.pool_size, len(batches))) as pool:
+                responses = list(pool.map(fetch, batches))
+
+        # Tiingo echoes tickers in its own case; map them back to ours
+        requested = {t.upper(): t for t in tickers}
+        quotes = {}
+        for quote in (q for response in responses for q in response):
+            ticker = requested.get(str(quote.get('ticker', '')).upper())
+            if ticker:
+                quotes[ticker] = quote
+        return quotes
+
     def get_historical_data(self, ticker: str, start_date: str, end_date: str = None):
         """
         Fetches EOD historical data.
         Dates format: YYYY-MM-DD
         """
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Token {self.api_key}'
-        }
+        key = self._cache_key(ticker, start_date, end_date)
+        return self.cache.fetch(key, lambda: self._download_daily(ticker, start_date, end_date))
+
+    def get_historical_batch(self, ticker: str, start_date: str, end_date: str = None):
+        """
+        Fetches EOD history as a columnar BarBatch (interval '1d').
+        """
+        return BarBatch.from_tiingo(ticker, self.get_historical_data(ticker, start_date, end_date))
+
+    def is_cached(self, ticker: str, start_date: str, end_date: str = None):
+        """True if get_historical_data would be answered without a request."""
+        return self.cache.mode == 'replay' or self.cache.contains(self._cache_key(ticker, start_date, end_date))
+
+    def _cache_key(self, ticker: str, start_date: str, end_date: str):
+        """
+        Cache key of a request, or None if the range is still open (no end
+        date, or it includes today's not yet final bar).
+        """
+        if not end_date or end_date >= datetime.now(timezone.utc).strftime("%Y-%m-%d"):
+            return None
+        return ResponseCache.key('tiingo', ticker, '1d', start_date, end_date)
+
+    def _download_daily(self, ticker: str, start_date: str, end_date: str = None):
         # Endpoint for daily data
-        url = f"https://api.tiingo.com/tiingo/daily/{ticker}/prices"
         params = {
             'startDate': start_date,
-            'resampleFreq': 'daily' 
+            'resampleFreq': 'daily'
         }
         if end_date:
             params['endDate'] = end_date
 
-        try:
-            print(f"[{datetime.now()}] Fetching historical data for {ticker} from {start_date}...")
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"[{datetime.now()}] Retrieved {len(data)} historical records.")
-                return data
-            elif response.status_code == 429:
-                 print(f"[{datetime.now()}] API Limit Reached (429).")
-                 return []
-            else:
-                print(f"Error fetching history: {response.status_code} - {response.text}")
-                return []
-        except Exception as e:
-            print(f"Exception during Tiingo history request: {e}")
+        print(f"[{datetime.now()}] Fetching historical data for {ticker} from {start_date}...")
+        data = self._get(f"/tiingo/daily/{ticker}/prices", params=params)
+        if data is None:
             return []
+        print(f"[{datetime.now()}] Retrieved {len(data)} historical records.")
+        return data
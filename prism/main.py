@@ -1,54 +1,222 @@
+import multiprocessing as mp
+import os
+import signal
 import threading
 import time
 import sys
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
 from ingestion.service import IngestionService
 from strategies.trend_following import TrendFollowing
-from engine.runner import StrategyEngine
+from engine.multi_runner import MultiStrategyEngine
+from storage.metrics_writer import MetricsWriter
+from storage.timescale_handler import TimescaleHandler
 
 from utils.config import Config
+from utils.tick_bus import TickBus
 
-def run_ingestion(tickers, source='tiingo'):
-    # Runs the ingestion loop
-    service = IngestionService(tickers, source=source)
-    # Start with backfill (optional, maybe controlled by env var)
+def shard_tickers(tickers, shards, policy='hash'):
+    """
+    Splits the ticker universe into at most `shards` non-empty groups.
+    'hash' keeps a ticker on the same worker across restarts and universe
+    changes (as long as no group ends up empty, since empty groups are
+    dropped); 'round_robin' balances the group sizes.
+    """
+    shards = max(1, min(shards, len(tickers)))
+    groups = [[] for _ in range(shards)]
+    for i, ticker in enumerate(tickers):
+        index = zlib.crc32(ticker.encode()) % shards if policy == 'hash' else i % shards
+        groups[index].append(ticker)
+    return [group for group in groups if group]
+
+def worker_count(value):
+    # 'auto' = one process per core
+    return (os.cpu_count() or 1) if value == 'auto' else int(value)
+
+def start_metrics(process):
+    # Flushes the worker's metrics registry to the 'metrics' hypertable (Grafana)
+    if not Config.METRICS_ENABLED:
+        return None
+    db = TimescaleHandler(
+        host=Config.DB_HOST,
+        port=Config.DB_PORT,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        dbname=Config.DB_NAME
+    )
+    return MetricsWriter(db, process=process).start()
+
+@contextmanager
+def worker(name, stop):
+    """
+    Runs a worker's body until SIGTERM calls `stop`, then lets it finish cleanly.
+    Ctrl+C reaches the whole process group, so only the supervisor handles it.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop())
+    metrics_writer = start_metrics(f"{Config.METRICS_PROCESS}-{name}")
+    try:
+        yield
+    finally:
+        if metrics_writer:
+            metrics_writer.close(timeout=5)
+
+def ingest(service):
     try:
         service.run_backfill(Config.BACKFILL_START_DATE)
     except Exception as e:
         print(f"Backfill missing or failed: {e}")
-        
-    service.run_live_ingestion()
 
-def run_strategy(ticker):
-    # Runs the strategy engine
-    # Give ingestion a moment to start
-    time.sleep(5) 
-    strategy = TrendFollowing(ticker, window=5)
-    engine = StrategyEngine(strategy)
-    engine.run()
+    try:
+        service.run_live_ingestion()
+    finally:
+        # Flushes the write buffer before the process exits
+        service.close()
+
+def share_provider_budget(shares):
+    # Provider budgets are per API key, so each of the `shares` workers gets its part
+    Config.BINANCE_WEIGHT_PER_MINUTE = max(1, Config.BINANCE_WEIGHT_PER_MINUTE // shares)
+    Config.TIINGO_REQUESTS_PER_HOUR = max(1, Config.TIINGO_REQUESTS_PER_HOUR // shares)
+
+def run_ingestion(name, tickers, source, shares=1):
+    share_provider_budget(shares)
+    service = IngestionService(tickers, source=source)
+    with worker(name, service.stop):
+        ingest(service)
+
+def run_node(name, tickers, source, shares=1):
+    """
+    Ingestion and the strategies of the same tickers in one process, joined by
+    a TickBus: strategies see each row before it is written to the database.
+    """
+    share_provider_budget(shares)
+    bus = TickBus()
+    engine = MultiStrategyEngine([TrendFollowing(ticker, window=5) for ticker in tickers], bus=bus)
+    service = IngestionService(tickers, source=source, bus=bus)
+
+    def stop():
+        service.stop()
+        engine.stop()
+
+    engine_thread = threading.Thread(target=engine.run, name="engine", daemon=True)
+    with worker(name, stop):
+        engine_thread.start()
+        try:
+            ingest(service)
+        finally:
+            engine.stop()
+            engine_thread.join(Config.ENGINE_POLL_INTERVAL + 1)
+            engine.db.close()
+
+def run_strategy(name, tickers):
+    engine = MultiStrategyEngine([TrendFollowing(ticker, window=5) for ticker in tickers])
+    with worker(name, engine.stop):
+        try:
+            engine.run()
+        finally:
+            engine.db.close()
+
+class Supervisor:
+    """
+    Runs ingestion and strategy workers as separate processes, so parsing,
+    row building and strategy logic scale with the cores instead of sharing
+    one GIL. Crashed workers are restarted with exponential backoff; SIGINT or
+    SIGTERM stops every worker with SIGTERM and waits for them to flush.
+    """
+    def __init__(self, specs):
+        # specs: [(name, target, args)]
+        self.specs = {name: (target, args) for name, target, args in specs}
+        self.context = mp.get_context("spawn")
+        self.processes = {}
+        self.restarts = {name: 0 for name in self.specs}
+        self.next_start = {name: 0.0 for name in self.specs}
+        self.stopping = False
+
+    def start(self, name):
+        target, args = self.specs[name]
+        process = self.context.Process(target=target, args=(name, *args), name=name)
+        process.start()
+        self.processes[name] = (process, time.monotonic())
+        print(f"[{datetime.now()}] Supervisor: started {name} (pid {process.pid}).")
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+        for name in self.specs:
+            self.start(name)
+
+        while not self.stopping:
+            time.sleep(1)
+            self.check()
+        self.shutdown()
+
+    def request_stop(self, signum, frame):
+        if not self.stopping:
+            print(f"[{datetime.now()}] Supervisor: stopping workers...")
+        self.stopping = True
+
+    def check(self):
+        """
+        Restarts dead workers. The backoff doubles on every crash and resets
+        once a worker has stayed up longer than the maximum backoff.
+        """
+        now = time.monotonic()
+        for name, (process, started) in list(self.processes.items()):
+            if process.is_alive():
+                if self.restarts[name] and now - started > Config.WORKER_RESTART_BACKOFF_MAX:
+                    self.restarts[name] = 0
+                continue
+
+            if self.next_start[name] == 0.0:
+                delay = min(Config.WORKER_RESTART_BACKOFF * 2 ** self.restarts[name], Config.WORKER_RESTART_BACKOFF_MAX)
+                self.next_start[name] = now + delay
+                print(f"[{datetime.now()}] Supervisor: {name} exited with code {process.exitcode}, "
+                      f"restarting in {delay:.1f}s.")
+            elif now >= self.next_start[name]:
+                self.next_start[name] = 0.0
+                self.restarts[name] += 1
+                self.start(name)
+
+    def shutdown(self):
+        for process, _ in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + Config.SHUTDOWN_TIMEOUT
+        for name, (process, _) in self.processes.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                print(f"[{datetime.now()}] Supervisor: {name} did not stop in time, killing it.")
+                process.kill()
+                process.join()
+        print(f"[{datetime.now()}] Supervisor: all workers stopped.")
 
 def main():
     Config.print_config()
-    
-    ticker = Config.TARGET_TICKER
+
+    tickers = Config.TICKERS
     source = Config.DATA_SOURCE
-    
-    # We use threads to simulate the microservices running together in this single container.
-    # In a full production scale, these would be separate containers/deployments.
-    
-    # 1. Ingestion Thread
-    ingest_thread = threading.Thread(target=run_ingestion, args=([ticker], source), daemon=True)
-    ingest_thread.start()
-    
-    # 2. Strategy Engine Thread
-    #strategy_thread = threading.Thread(target=run_strategy, args=(ticker,), daemon=True)
-    #strategy_thread.start()
-    
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("Stopping services...")
-        sys.exit(0)
+
+    specs = []
+    ingest_workers = worker_count(Config.INGEST_WORKERS)
+    ingest_shards = shard_tickers(tickers, ingest_workers, Config.SHARD_POLICY) if ingest_workers else []
+    for i, shard in enumerate(ingest_shards):
+        if Config.TICK_BUS:
+            # Each ingestion worker also runs the strategies of its shard
+            specs.append((f"node-{i}", run_node, (shard, source, len(ingest_shards))))
+        else:
+            specs.append((f"ingest-{i}", run_ingestion, (shard, source, len(ingest_shards))))
+
+    engine_workers = worker_count(Config.ENGINE_WORKERS)
+    if engine_workers and not Config.TICK_BUS:
+        for i, shard in enumerate(shard_tickers(tickers, engine_workers, Config.SHARD_POLICY)):
+            specs.append((f"engine-{i}", run_strategy, (shard,)))
+
+    for name, _, args in specs:
+        print(f"Worker {name}: {', '.join(args[0])}")
+    Supervisor(specs).run()
+    sys.exit(0)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+# A record missing any of these is not a usable bar
+PRICE_FIELDS = BAR_FIELDS[:4]
+
+
+class BarBatch:
+    """
+    Columnar OHLCV bars of one instrument (ticker, provider, interval).
+
+    Timestamps are int64 microseconds since the Unix epoch and prices are
+    float64 arrays, so a page of candles is six arrays instead of one dict
+    per candle. Ingestors build it with vectorized parsing and storage writes
+    it without going back to Python rows.
+    """
+    __slots__ = ("ticker", "provider", "interval", "ts", "open", "high", "low", "close", "volume")
+
+    def __init__(self, ticker: str, provider: str, interval: str, ts, open, high, low, close, volume):
+        self.ticker = ticker
+        self.provider = provider
+        self.interval = interval
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+
+    @classmethod
+    def empty(cls, ticker: str, provider: str, interval: str):
+        return cls(ticker, provider, interval, *([np.empty(0)] * 6))
+
+    @classmethod
+    def from_klines(cls, ticker: str, klines: list, interval: str, provider: str = 'binance'):
+        """
+        Parses raw Binance klines ([open_ms, "open", "high", "low", "close", "volume", ...])
+        in one NumPy conversion.
+        """
+        if not klines:
+            return cls.empty(ticker, provider, interval)
+        # Decimal strings are parsed by NumPy; ms timestamps are exact in float64
+        values = np.array(klines, dtype=object)[:, :6].astype(np.float64)
+        ts = values[:, 0].astype(np.int64) * 1000
+        return cls(ticker, provider, interval, ts, *values[:, 1:].T)
+
+    @classmethod
+    def from_tiingo(cls, ticker: str, records: list, interval: str = '1d', provider: str = 'tiingo'):
+        """
+        Parses Tiingo daily price records ({'date': ISO string, 'open', ...}).
+        Records missing a price are dropped; a missing volume is kept as NaN.
+        """
+        if not records:
+            return cls.empty(ticker, provider, interval)
+        n = len(records)
+        dates = pd.to_datetime([r['date'] for r in records], utc=True, format="ISO8601").tz_convert(None)
+        ts = dates.values.astype("datetime64[us]").view(np.int64)
+        columns = {name: np.fromiter((np.nan if r.get(name) is None else r[name] for r in records),
+                                     dtype=np.float64, count=n)
+                   for name in BAR_FIELDS}
+        complete = ~np.any([np.isnan(columns[name]) for name in PRICE_FIELDS], axis=0)
+        if not complete.all():
+            ts = ts[complete]
+            columns = {name: values[complete] for name, values in columns.items()}
+        return cls(ticker, provider, interval, ts, *(columns[name] for name in BAR_FIELDS))
+
+    def __len__(self):
+        return len(self.ts)
+
+    def __getitem__(self, index: slice):
+        return BarBatch(self.ticker, self.provider, self.interval,
+                        *(getattr(self, name)[index] for name in ("ts",) + BAR_FIELDS))
+
+    def to_records(self):
+        """
+        One dict per bar ('timestamp' in ms), the shape ingestors used to return.
+        """
+        columns = [(self.ts // 1000).tolist()] + [getattr(self, name).tolist() for name in BAR_FIELDS]
+        return [dict(zip(("timestamp",) + BAR_FIELDS, values)) for values in zip(*columns)]
@@ -0,0 +1,165 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from utils.config import Config
+
+
+class SharedPool:
+    """
+    Thread-safe psycopg2 connection pool shared by every TimescaleHandler that
+    points at the same database in this process.
+
+    Checkouts block (instead of failing) when all `maxconn` connections are in
+    use, connections idle for longer than DB_POOL_HEALTHCHECK_IDLE are
+    health-checked before being handed out, and creating the pool retries with
+    exponential backoff while the database is down.
+    """
+    _pools = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, conn_params: dict, minconn: int, maxconn: int):
+        self.conn_params = conn_params
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.pool = None
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.lock = threading.Lock()
+        self.refs = 0
+        self.initialized = False
+        # id(conn) -> monotonic time it was returned to the pool
+        self.idle_since = {}
+        # Continuous aggregates available on this database: {view: bucket}
+        self.rollups = {}
+        # Instrument registry cache: {(ticker, provider, interval): id}, {id: key}, {ticker: [ids]}
+        self.instruments = {}
+        self.instrument_names = {}
+        self.ticker_instruments = {}
+        # {ticker: monotonic time its instrument set was last read}
+        self.loaded_tickers = {}
+
+    @classmethod
+    def acquire(cls, conn_params: dict):
+        """
+        Returns the process-wide pool for these connection parameters, creating it on first use.
+        """
+        key = tuple(sorted(conn_params.items()))
+        with cls._registry_lock:
+            shared = cls._pools.get(key)
+            if shared is None:
+                shared = cls(conn_params, Config.DB_POOL_MIN, Config.DB_POOL_MAX)
+                cls._pools[key] = shared
+            shared.refs += 1
+        return shared
+
+    def release(self):
+        """
+        Drops one reference; the last holder closes every connection.
+        """
+        with SharedPool._registry_lock:
+            self.refs -= 1
+            if self.refs > 0:
+                return
+            SharedPool._pools.pop(tuple(sorted(self.conn_params.items())), None)
+        with self.lock:
+            if self.pool:
+                self.pool.closeall()
+                self.pool = None
+                self.idle_since.clear()
+                print(f"[{datetime.now()}] TimescaleDB connection pool closed.")
+
+    def ensure(self, retries: int = None):
+        """
+        Creates the underlying pool, backing off exponentially between attempts.
+        Returns False if the database stayed unreachable.
+        """
+        retries = Config.DB_CONNECT_RETRIES if retries is None else retries
+        delay = Config.DB_CONNECT_BACKOFF
+        for attempt in range(1, retries + 1):
+            with self.lock:
+                if self.pool:
+                    return True
+                try:
+                    self.pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self.conn_params)
+                    print(f"[{datetime.now()}] TimescaleDB connection pool established "
+                          f"({self.minconn}-{self.maxconn} connections).")
+                    return True
+                except Exception as e:
+                    print(f"[{datetime.now()}] Failed to connect to TimescaleDB "
+                          f"(attempt {attempt}/{retries}): {e}")
+            if attempt < retries:
+                time.sleep(delay)
+                delay = min(delay * 2, Config.DB_CONNECT_BACKOFF_MAX)
+        return False
+
+    def _checkout(self):
+        """
+        Hands out a live connection, replacing dead ones. A connection that
+        fails while being prepared goes back to the pool closed, never leaked.
+        """
+        for _ in range(self.maxconn + 1):
+            conn = self.pool.getconn()
+            try:
+                if not conn.closed:
+                    # Before the probe: SELECT 1 outside autocommit would open a transaction
+                    if not conn.autocommit:
+                        conn.autocommit = True
+                    if self._healthy(conn):
+                        return conn
+            except Exception:
+                pass
+            self._discard(conn)
+        raise psycopg2.OperationalError("no healthy connection available")
+
+    def _discard(self, conn):
+        self.idle_since.pop(id(conn), None)
+        self.pool.putconn(conn, close=True)
+
+    def _healthy(self, conn):
+        """
+        Probes connections that sat idle long enough to have been dropped by
+        the server or a proxy; recently used ones are handed out as they are.
+        """
+        if not Config.DB_POOL_HEALTHCHECK:
+            return True
+        idle_since = self.idle_since.pop(id(conn), None)
+        if idle_since is None or time.monotonic() - idle_since < Config.DB_POOL_HEALTHCHECK_IDLE:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection for the duration of the block.
+        Connections that fail with a connection-level error are discarded.
+        """
+        if not self.ensure():
+            raise psycopg2.OperationalError("TimescaleDB is unreachable")
+
+        self.slots.acquire()
+        conn = None
+        broken = False
+        try:
+            conn = self._checkout()
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if conn is not None:
+                pool = self.pool
+                if pool:
+                    close = broken or bool(conn.closed)
+                    if not close:
+                        self.idle_since[id(conn)] = time.monotonic()
+                    pool.putconn(conn, close=close)
+            self.slots.release()
@@ -0,0 +1,212 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from storage.timescale_handler import TimescaleHandler
+from utils.config import Config
+
+# Column layout of the cache files: ts as int64 microseconds since the Unix epoch
+CACHE_COLUMNS = (
+    ("ts", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+)
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _to_us(ts: datetime) -> int:
+    return (ts - UNIX_EPOCH) // timedelta(microseconds=1)
+
+
+class HistoryCache:
+    """
+    Local columnar cache of `market` history, one directory per ticker/interval.
+
+    Each column is a flat binary file that is only ever appended to, plus a
+    small meta.json holding the row count and the watermark (newest ts).
+    `sync` fetches only rows newer than the watermark; `load` memory-maps the
+    files, so repeated research loads cost milliseconds and no copies.
+
+    Gaps repaired later by the backfill land before the watermark. The backfill
+    logs every range it writes (market_repairs) and meta.json remembers the last
+    repair seen, so `sync` only re-counts the ranges repaired since then. When
+    the database holds more rows there than the cache, the cache is truncated
+    back to the start of the range and re-synced from it. Fewer rows in the
+    database (retention dropped old chunks) never invalidate the cache.
+    """
+    def __init__(self, db: TimescaleHandler = None, directory: str = None):
+        self.db = db
+        self.directory = directory or Config.HISTORY_CACHE_DIR
+
+    def _get_db(self):
+        if self.db is None:
+            self.db = TimescaleHandler(
+                host=Config.DB_HOST,
+                port=Config.DB_PORT,
+                user=Config.DB_USER,
+                password=Config.DB_PASSWORD,
+                dbname=Config.DB_NAME
+            )
+        return self.db
+
+    def _path(self, ticker: str, interval: str):
+        return os.path.join(self.directory, ticker, interval)
+
+    def _read_meta(self, path: str):
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"rows": 0, "watermark_us": None, "repair_id": 0}
+
+    def _write_meta(self, path: str, meta: dict):
+        # Atomic replace: a crash mid-sync leaves the previous (consistent) meta in place
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    def sync(self, ticker: str, interval: str = None, verify: bool = True):
+        """
+        Appends every row newer than the cached watermark. Returns the number of new rows.
+
+        :param verify: Re-check the ranges backfilled since the last sync and
+                       re-sync the cache from the first one it is missing rows of
+        """
+        interval = interval or Config.KLINE_INTERVAL
+        path = self._path(ticker, interval)
+        os.makedirs(path, exist_ok=True)
+        meta = self._read_meta(path)
+        seen = meta.get("repair_id", 0)
+
+        if verify:
+            meta = self._apply_repairs(ticker, interval, path, meta)
+
+        start = None
+        if meta["watermark_us"] is not None:
+            start = UNIX_EPOCH + timedelta(microseconds=meta["watermark_us"] + 1)
+
+        files = {}
+        new_rows = 0
+        last_ts = None
+        try:
+            for name, dtype in CACHE_COLUMNS:
+                files[name] = open(os.path.join(path, f"{name}.bin"), "ab")
+                # Drop any tail written by an interrupted sync before appending
+                files[name].truncate(meta["rows"] * np.dtype(dtype).itemsize)
+
+            # Streamed chunk by chunk, so a first sync of years of bars stays in bounded memory
+            for chunk in self._get_db().iter_range(ticker, start=start, interval=interval):
+                for name, dtype in CACHE_COLUMNS:
+                    values = chunk[name].view(np.int64) if name == "ts" else chunk[name]
+                    files[name].write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+                new_rows += len(chunk)
+                last_ts = chunk["ts"][-1]
+
+            for f in files.values():
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            for f in files.values():
+                f.close()
+
+        if new_rows == 0:
+            if meta.get("repair_id", 0) != seen:
+                self._write_meta(path, meta)
+            return 0
+
+        meta = {"rows": meta["rows"] + new_rows, "watermark_us": int(last_ts.astype(np.int64)),
+                "repair_id": meta.get("repair_id", 0)}
+        self._write_meta(path, meta)
+        print(f"[{datetime.now()}] HistoryCache: {ticker} ({interval}) +{new_rows} rows ({meta['rows']} cached).")
+        return new_rows
+
+    def _apply_repairs(self, ticker: str, interval: str, path: str, meta: dict):
+        """
+        Checks the ranges repaired since meta's repair_id against the cached rows.
+        Returns the meta to sync from: truncated before the first range the
+        cache is missing rows of, with the newest repair id checked.
+        """
+        db = self._get_db()
+        repairs = db.get_repairs(ticker, interval, after=meta.get("repair_id", 0))
+        if not repairs:
+            return meta
+        if meta["watermark_us"] is None:
+            # Nothing cached yet: the first sync reads every repaired row anyway
+            return dict(meta, repair_id=repairs[-1][0])
+
+        rows = meta["rows"]
+        watermark = UNIX_EPOCH + timedelta(microseconds=meta["watermark_us"] + 1)
+        # Rows older than the retention window may already be gone from the DB; the cache keeps them
+        retention = db.retention_window()
+        horizon = datetime.now(timezone.utc) - retention if retention else None
+        ts = np.memmap(os.path.join(path, "ts.bin"), dtype=np.int64, mode="r", shape=(rows,))
+
+        keep, checked = rows, meta.get("repair_id", 0)
+        for repair_id, start, end in repairs:
+            if horizon:
+                start = max(start, horizon)
+            end = min(end, watermark)
+            if start < end:
+                lo, hi = np.searchsorted(ts, [_to_us(start), _to_us(end)])
+                stored = db.count_range(ticker, start, end, interval)
+                if stored is None:
+                    # Retry this range on the next sync
+                    break
+                if stored > hi - lo:
+                    keep = min(keep, int(lo))
+            checked = repair_id
+
+        watermark_us = int(ts[keep - 1]) if keep else None
+        del ts
+        if keep < rows:
+            print(f"[{datetime.now()}] HistoryCache: {ticker} ({interval}) is missing backfilled rows; "
+                  f"re-syncing the last {rows - keep} of {rows} cached rows.")
+        return {"rows": keep, "watermark_us": watermark_us, "repair_id": checked}
+
+    def load(self, ticker: str, interval: str = None, sync: bool = True, as_frame: bool = False):
+        """
+        Memory-maps the cached history (read-only, zero-copy).
+
+        :param sync: Fetch newer rows from TimescaleDB first
+        :param as_frame: Return a pandas DataFrame indexed by ts instead of a dict of arrays
+        """
+        interval = interval or Config.KLINE_INTERVAL
+        if sync:
+            self.sync(ticker, interval)
+
+        path = self._path(ticker, interval)
+        rows = self._read_meta(path)["rows"]
+        bars = {}
+        for name, dtype in CACHE_COLUMNS:
+            if rows:
+                bars[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+            else:
+                bars[name] = np.empty(0, dtype=dtype)
+        bars["ts"] = bars["ts"].view("datetime64[us]")
+
+        if not as_frame:
+            return bars
+        index = pd.DatetimeIndex(bars.pop("ts"), name="ts")
+        return pd.DataFrame(bars, index=index, copy=False)
+
+    def clear(self, ticker: str, interval: str = None):
+        """
+        Drops a cached series (e.g. after older gaps were backfilled), so the
+        next sync rebuilds it from scratch.
+        """
+        path = self._path(ticker, interval or Config.KLINE_INTERVAL)
+        if not os.path.isdir(path):
+            return
+        self._write_meta(path, {"rows": 0, "watermark_us": None, "repair_id": 0})
+        for name, _ in CACHE_COLUMNS:
+            try:
+                os.remove(os.path.join(path, f"{name}.bin"))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,79 @@
+import json
+import select
+import time
+from datetime import datetime
+
+import psycopg2
+
+from utils.config import Config
+
+
+class MarketListener:
+    """
+    Blocks on PostgreSQL LISTEN for tick notifications emitted by the write path.
+
+    LISTEN is bound to a session, so the listener owns a dedicated connection
+    (outside the shared pool) and re-subscribes after reconnecting.
+    """
+    def __init__(self, conn_params: dict, channel: str):
+        self.conn_params = conn_params
+        self.channel = channel
+        self.conn = None
+
+    def connect(self):
+        try:
+            if self.conn:
+                self.conn.close()
+            self.conn = psycopg2.connect(**self.conn_params)
+            self.conn.autocommit = True
+            with self.conn.cursor() as cur:
+                cur.execute(f'LISTEN "{self.channel}"')
+            print(f"[{datetime.now()}] Listening on channel '{self.channel}'.")
+        except Exception as e:
+            print(f"[{datetime.now()}] Failed to LISTEN on '{self.channel}': {e}")
+            self.conn = None
+        return self.conn is not None
+
+    def close(self):
+        if self.conn:
+            try:
+                self.conn.close()
+            finally:
+                self.conn = None
+
+    def wait(self, timeout: float, ticker: str = None):
+        """
+        Waits up to `timeout` seconds for notifications (for `ticker`, if given).
+        Returns the decoded payloads, or an empty list on timeout so callers
+        can fall back to polling.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+
+            if not self.conn and not self.connect():
+                time.sleep(min(remaining, Config.DB_CONNECT_BACKOFF))
+                continue
+
+            try:
+                if select.select([self.conn], [], [], remaining) == ([], [], []):
+                    return []
+                self.conn.poll()
+            except Exception as e:
+                print(f"[{datetime.now()}] Listener connection lost: {e}")
+                self.close()
+                continue
+
+            events = []
+            while self.conn.notifies:
+                notify = self.conn.notifies.pop(0)
+                try:
+                    payload = json.loads(notify.payload)
+                except ValueError:
+                    continue
+                if ticker is None or payload.get('ticker') == ticker:
+                    events.append(payload)
+            if events:
+                return events
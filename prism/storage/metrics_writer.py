@@ -0,0 +1,67 @@
+import threading
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+
+from utils.config import Config
+from utils.metrics import REGISTRY
+
+
+class MetricsWriter:
+    """
+    Background thread that snapshots the metrics registry every `interval`
+    seconds and writes it to the `metrics` hypertable in one INSERT.
+
+    Hot paths only touch in-memory counters and histograms; a flush failure
+    (database down) loses that interval's snapshot and never blocks them.
+    """
+    def __init__(self, db, interval: float = None, process: str = None, registry=None):
+        self.db = db
+        self.interval = interval or Config.METRICS_FLUSH_INTERVAL
+        self.process = process or Config.METRICS_PROCESS
+        self.registry = registry or REGISTRY
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self.thread.start()
+        return self
+
+    def close(self, timeout: float = None):
+        """
+        Stops the thread after a last flush.
+        """
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """
+        Writes one row per metric with data. Returns the number of rows written.
+        """
+        ts = datetime.now(timezone.utc)
+        rows = [(ts, self.process, name, kind, s["value"], s.get("count"), s.get("p50"), s.get("p95"),
+                 s.get("p99"), s.get("max"))
+                for name, kind, s in self.registry.collect()]
+        if not rows:
+            return 0
+
+        try:
+            with self.db.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO metrics (ts, process, name, kind, value, count, p50, p95, p99, max)
+                    VALUES %s
+                """, rows)
+            return len(rows)
+        except Exception as e:
+            print(f"[{datetime.now()}] MetricsWriter: could not write {len(rows)} metrics: {e}")
+            return 0
@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from utils import metrics
+from utils.config import Config
+
+
+class SignalWriter:
+    """
+    Background batched writer for strategy outputs (Signal, RiskCheck, Order
+    and any record with `table`, `columns` and `row()`).
+
+    The engine thread only enqueues; a writer thread flushes every `max_rows`
+    records or `max_delay` seconds. Each flush is one transaction with one
+    multi-row INSERT per table, so a batch is stored entirely or not at all.
+    A single queue and a single writer keep every strategy's records in the
+    order they were emitted; a failed batch is retried before the next one.
+    close() flushes everything already enqueued. The tables are created by
+    platform/timescaledb/init/schema.sql.
+    """
+    def __init__(self, db, max_rows: int = None, max_delay: float = None, capacity: int = None,
+                 retries: int = None):
+        self.db = db
+        self.max_rows = max_rows or Config.SIGNAL_WRITER_MAX_ROWS
+        self.max_delay = max_delay or Config.SIGNAL_WRITER_MAX_DELAY
+        self.retries = Config.SIGNAL_WRITER_RETRIES if retries is None else retries
+        # Bounded: if the database is down for long, producers block instead of growing memory
+        self.queue = queue.Queue(maxsize=capacity or Config.SIGNAL_WRITER_CAPACITY)
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.flush_ms = metrics.histogram("signal_writer.flush_ms")
+        self.records_written = metrics.counter("signal_writer.records_written")
+        self.records_dropped = metrics.counter("signal_writer.records_dropped")
+        metrics.gauge("signal_writer.queue_depth", fn=self.queue.qsize)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="signal-writer", daemon=True)
+            self.thread.start()
+        return self
+
+    def put(self, record, timeout: float = None):
+        """
+        Enqueues a record. Blocks only while the queue is full.
+        """
+        self.queue.put(record, timeout=timeout)
+
+    def close(self, timeout: float = None):
+        """
+        Stops the writer after flushing everything already enqueued.
+        """
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def _run(self):
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            try:
+                first = self.queue.get(timeout=self.max_delay)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch: list):
+        started = time.perf_counter()
+        delay = Config.DB_CONNECT_BACKOFF
+        for attempt in range(1, self.retries + 2):
+            try:
+                self._write(batch)
+                self.records_written.inc(len(batch))
+                break
+            except Exception as e:
+                print(f"[{datetime.now()}] SignalWriter: batch of {len(batch)} records failed "
+                      f"(attempt {attempt}/{self.retries + 1}): {e}")
+                if attempt > self.retries:
+                    self.records_dropped.inc(len(batch))
+                    break
+                time.sleep(delay)
+                delay = min(delay * 2, Config.DB_CONNECT_BACKOFF_MAX)
+        self.flush_ms.observe((time.perf_counter() - started) * 1000)
+
+    def _write(self, batch: list):
+        """
+        Inserts a batch in one transaction: records are grouped per table
+        (keeping their order) and each table gets one multi-row INSERT.
+        """
+        tables = {}
+        for record in batch:
+            if record.table not in tables:
+                tables[record.table] = (record.columns, [])
+            tables[record.table][1].append(record.row())
+
+        # Pooled connections run in autocommit; the batch is made atomic explicitly
+        with self.db.cursor() as cur:
+            cur.execute("BEGIN")
+            try:
+                for table, (columns, rows) in tables.items():
+                    query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+                        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns)))
+                    execute_values(cur, query.as_string(cur), rows, page_size=len(rows))
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
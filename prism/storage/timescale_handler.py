@@ -1,9 +1,99 @@
-import psycopg2
-from psycopg2 import sql
+import io
+import json
+import struct
+import uuid
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
 from psycopg2.extras import execute_values
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import time
 
+from ingestion.backfill_planner import interval_to_timedelta, floor_time
+from storage.connection_pool import SharedPool
+from storage.listener import MarketListener
+from utils import metrics
+from utils.config import Config
+from utils.logger import get_logger
+
+log = get_logger("storage")
+ROWS_INSERTED = metrics.counter("db.rows_inserted")
+INSERT_MS = metrics.histogram("db.insert_ms")
+
+# Channel on which the write path announces new market rows (LISTEN/NOTIFY)
+MARKET_CHANNEL = "market_tick"
+# Channel on which orders/fills triggers announce order status changes and fills (RiskEngine)
+ORDER_CHANNEL = "order_events"
+
+# Triggers behind ORDER_CHANNEL (also in schema.sql): one JSON payload per inserted row
+ORDER_EVENTS_SQL = [
+    f"""
+    CREATE OR REPLACE FUNCTION notify_order_event() RETURNS trigger AS $$
+    BEGIN
+        IF TG_TABLE_NAME = 'fills' THEN
+            PERFORM pg_notify('{ORDER_CHANNEL}', json_build_object(
+                'type', 'fill', 'order_id', NEW.order_id, 'ticker', NEW.ticker,
+                'side', NEW.side, 'quantity', NEW.quantity)::text);
+        ELSE
+            PERFORM pg_notify('{ORDER_CHANNEL}', json_build_object(
+                'type', 'order', 'id', NEW.id, 'status', NEW.status)::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    "DROP TRIGGER IF EXISTS orders_notify ON orders",
+    "CREATE TRIGGER orders_notify AFTER INSERT ON orders FOR EACH ROW EXECUTE FUNCTION notify_order_event()",
+    "DROP TRIGGER IF EXISTS fills_notify ON fills",
+    "CREATE TRIGGER fills_notify AFTER INSERT ON fills FOR EACH ROW EXECUTE FUNCTION notify_order_event()",
+]
+
+# Stored layout of `market`; instrument_id references instruments (ticker, provider, interval)
+MARKET_COLUMNS = ("ts", "instrument_id", "open", "high", "low", "close", "volume")
+
+# Chunks yielded by iter_range: one record per bar, ts in microseconds
+BAR_DTYPE = np.dtype([("ts", "datetime64[us]"), ("open", np.float64), ("high", np.float64),
+                      ("low", np.float64), ("close", np.float64), ("volume", np.float64)])
+_BAR_WIRE_DTYPE = np.dtype([("ts", np.int64)] + [(name, np.float64) for name in BAR_DTYPE.names[1:]])
+
+# PostgreSQL epoch used by the binary COPY format (timestamps are microseconds since 2000-01-01 UTC)
+PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+PG_EPOCH_US = 946684800 * 1_000_000
+
+# One binary COPY tuple of `market` as a fixed-width record: field count, then
+# (length, value) per column. Lets a whole BarBatch be encoded with NumPy.
+PGCOPY_BAR_DTYPE = np.dtype(
+    [("fields", ">i2"), ("ts_len", ">i4"), ("ts", ">i8"), ("id_len", ">i4"), ("instrument_id", ">i4")]
+    + [item for name in MARKET_COLUMNS[2:] for item in ((f"{name}_len", ">i4"), (name, ">f8"))]
+)
+
+# Continuous aggregates over the raw bars: (view, bucket, refresh start_offset, schedule_interval)
+ROLLUPS = (
+    ("market_5m", timedelta(minutes=5), timedelta(days=1), timedelta(minutes=5)),
+    ("market_1h", timedelta(hours=1), timedelta(days=7), timedelta(minutes=30)),
+    ("market_1d", timedelta(days=1), timedelta(days=30), timedelta(hours=1)),
+)
+
+# Storage policy kinds: (job proc_name, interval key in the job config)
+POLICY_JOBS = {
+    "compression": ("policy_compression", "compress_after"),
+    "retention": ("policy_retention", "drop_after"),
+}
+
+# OHLCV rollup of `market`, one series per instrument
+ROLLUP_VIEW_SQL = """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+    WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+    SELECT time_bucket(%s, ts) AS ts, instrument_id,
+           first(open, ts) AS open, max(high) AS high, min(low) AS low,
+           last(close, ts) AS close, sum(volume) AS volume
+    FROM market
+    GROUP BY time_bucket(%s, ts), instrument_id
+    WITH NO DATA
+"""
+
 class TimescaleHandler:
     def __init__(self, host: str, port: int, user: str, password: str, dbname: str):
         self.conn_params = {
@@ -13,230 +103,1110 @@ class TimescaleHandler:
             "password": password,
             "dbname": dbname
         }
-        self.conn = None
+        # Connections come from a pool shared with every other handler in this process
+        self.pool = SharedPool.acquire(self.conn_params)
         print(f"[{datetime.now()}] TimescaleHandler Initialized ({host}:{port})")
-        
+
         self.connect()
-        self.init_db()
+        if not self.pool.initialized:
+            self.init_db()
 
     def connect(self):
-        """Initializes the database connection."""
-        try:
-            if self.conn:
-                self.conn.close()
-            
-            self.conn = psycopg2.connect(**self.conn_params)
-            self.conn.autocommit = True
-            print(f"[{datetime.now()}] TimescaleDB Connection established.")
-        except Exception as e:
-            print(f"[{datetime.now()}] Failed to connect to TimescaleDB: {e}")
-            self.conn = None
+        """Ensures the shared connection pool is up (retries with exponential backoff)."""
+        return self.pool.ensure()
 
     def close(self):
-        """Closes the database connection."""
-        if self.conn:
+        """Releases this handler's reference to the shared pool."""
+        if self.pool:
             try:
-                self.conn.close()
-                print(f"[{datetime.now()}] TimescaleDB Connection closed.")
+                self.pool.release()
             except Exception as e:
-                print(f"[{datetime.now()}] Error closing TimescaleDB connection: {e}")
+                print(f"[{datetime.now()}] Error closing TimescaleDB connection pool: {e}")
             finally:
-                self.conn = None
+                self.pool = None
+
+    @contextmanager
+    def cursor(self):
+        """Checks out a pooled connection and yields a cursor on it."""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
 
     def init_db(self):
         """Creates the necessary tables and hypertable."""
-        if not self.conn:
-            return
-
         queries = [
             """
-            CREATE TABLE IF NOT EXISTS market (
-                ts TIMESTAMPTZ NOT NULL,
+            CREATE TABLE IF NOT EXISTS instruments (
+                id SERIAL PRIMARY KEY,
                 ticker TEXT NOT NULL,
                 provider TEXT NOT NULL,
                 interval TEXT NOT NULL,
+                UNIQUE (ticker, provider, interval)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS market (
+                ts TIMESTAMPTZ NOT NULL,
+                instrument_id INTEGER NOT NULL,
                 open DOUBLE PRECISION,
                 high DOUBLE PRECISION,
                 low DOUBLE PRECISION,
                 close DOUBLE PRECISION,
-                volume DOUBLE PRECISION
+                volume DOUBLE PRECISION,
+                adjusted DOUBLE PRECISION
             );
             """,
             """
             SELECT create_hypertable('market', 'ts', if_not_exists => TRUE);
+            """,
+            # Adjusted close, kept from the legacy layout (NULL for bars written by the ingestors)
+            """
+            ALTER TABLE market ADD COLUMN IF NOT EXISTS adjusted DOUBLE PRECISION;
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_market_instrument ON market (instrument_id, ts DESC);
+            """,
+            """
+            CREATE OR REPLACE VIEW market_view AS
+            SELECT m.ts, i.ticker, i.provider, i.interval, m.open, m.high, m.low, m.close, m.volume, m.adjusted
+            FROM market m
+            JOIN instruments i ON i.id = m.instrument_id;
+            """,
+            # Internal metrics flushed by MetricsWriter (histograms fill count/p50/p95/p99/max)
+            """
+            CREATE TABLE IF NOT EXISTS metrics (
+                ts TIMESTAMPTZ NOT NULL,
+                process TEXT NOT NULL,
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                value DOUBLE PRECISION,
+                count BIGINT,
+                p50 DOUBLE PRECISION,
+                p95 DOUBLE PRECISION,
+                p99 DOUBLE PRECISION,
+                max DOUBLE PRECISION
+            );
+            """,
+            """
+            SELECT create_hypertable('metrics', 'ts', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_metrics_name ON metrics (name, ts DESC);
+            """,
+            # Ranges already downloaded from a provider: missing bars inside them do not exist upstream
+            """
+            CREATE TABLE IF NOT EXISTS backfill_checked (
+                instrument_id INTEGER NOT NULL,
+                start_ts TIMESTAMPTZ NOT NULL,
+                end_ts TIMESTAMPTZ NOT NULL,
+                PRIMARY KEY (instrument_id, start_ts)
+            );
+            """,
+            # Ranges backfilled behind the live edge, in write order: caches re-check only these
+            """
+            CREATE TABLE IF NOT EXISTS market_repairs (
+                id BIGSERIAL PRIMARY KEY,
+                instrument_id INTEGER NOT NULL,
+                start_ts TIMESTAMPTZ NOT NULL,
+                end_ts TIMESTAMPTZ NOT NULL
+            );
             """
         ]
 
         try:
-            with self.conn.cursor() as cur:
+            with self.cursor() as cur:
+                legacy = self._detach_legacy_market(cur)
                 for q in queries:
                     cur.execute(q)
+                if legacy:
+                    self._migrate_legacy_market(cur)
+                # orders/fills come from schema.sql; databases created before the triggers get them here
+                cur.execute("SELECT to_regclass('orders') IS NOT NULL AND to_regclass('fills') IS NOT NULL")
+                if cur.fetchone()[0]:
+                    for q in ORDER_EVENTS_SQL:
+                        cur.execute(q)
+            self.pool.initialized = True
             print(f"[{datetime.now()}] Database initialized (Table 'market' ready).")
         except Exception as e:
             print(f"[{datetime.now()}] Error initializing database: {e}")
+            return
+
+        self.init_rollups()
+        self.init_storage_policies()
+
+    def _detach_legacy_market(self, cur):
+        """
+        Renames a `market` table still using the TEXT ticker/provider/interval
+        layout to market_legacy, so the instrument-based table can take its place.
+        Returns True when there is legacy data left to migrate.
+        """
+        cur.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'market' AND column_name = 'ticker'
+        """)
+        if cur.fetchone():
+            print(f"[{datetime.now()}] Legacy 'market' layout found; migrating to instrument ids...")
+            # Rollups and policies reference the old table and are recreated afterwards
+            for view, *_ in reversed(ROLLUPS):
+                cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view}")
+            cur.execute("DROP VIEW IF EXISTS market_view")
+            cur.execute("SELECT remove_compression_policy('market', if_exists => TRUE)")
+            cur.execute("SELECT remove_retention_policy('market', if_exists => TRUE)")
+            cur.execute("ALTER TABLE market RENAME TO market_legacy")
+
+        cur.execute("SELECT to_regclass('market_legacy') IS NOT NULL")
+        return cur.fetchone()[0]
+
+    def _migrate_legacy_market(self, cur):
+        """
+        Copies market_legacy into the new layout and drops it, in one transaction
+        so an interrupted migration is simply retried by the next init_db.
+        The adjusted close is carried over when the legacy table has it (schema.sql did).
+        """
+        started = time.perf_counter()
+        cur.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'market_legacy' AND column_name = 'adjusted'
+        """)
+        adjusted = "l.adjusted" if cur.fetchone() else "NULL"
+        cur.execute("BEGIN")
+        try:
+            cur.execute("""
+                INSERT INTO instruments (ticker, provider, interval)
+                SELECT DISTINCT ticker, coalesce(provider, ''), coalesce(interval, '')
+                FROM market_legacy
+                ON CONFLICT (ticker, provider, interval) DO NOTHING
+            """)
+            cur.execute(f"""
+                INSERT INTO market (ts, instrument_id, open, high, low, close, volume, adjusted)
+                SELECT l.ts, i.id, l.open, l.high, l.low, l.close, l.volume, {adjusted}
+                FROM market_legacy l
+                JOIN instruments i
+                  ON i.ticker = l.ticker
+                 AND i.provider = coalesce(l.provider, '')
+                 AND i.interval = coalesce(l.interval, '')
+            """)
+            moved = cur.rowcount
+            cur.execute("DROP TABLE market_legacy")
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        print(f"[{datetime.now()}] Migrated {moved} legacy market rows in {time.perf_counter() - started:.1f}s.")
+
+    def instrument_id(self, ticker: str, provider: str, interval: str):
+        """
+        Returns the id of (ticker, provider, interval), registering it on first use.
+        Ids are cached for the life of the process.
+        """
+        key = (ticker, provider, interval)
+        instrument = self.pool.instruments.get(key)
+        if instrument is not None:
+            return instrument
+
+        with self.cursor() as cur:
+            # DO UPDATE (a no-op) makes RETURNING yield the id of an existing row too
+            cur.execute("""
+                INSERT INTO instruments (ticker, provider, interval)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (ticker, provider, interval) DO UPDATE SET ticker = EXCLUDED.ticker
+                RETURNING id
+            """, key)
+            instrument = cur.fetchone()[0]
+        self._cache_instrument(instrument, key)
+        return instrument
+
+    def instrument_ids(self, ticker: str, interval: str = None):
+        """
+        Ids of a ticker's instruments (any provider), optionally for one interval.
+        Tick series are only included when asked for explicitly.
+        """
+        return self.instrument_ids_many([ticker], interval)[ticker]
+
+    def instrument_ids_many(self, tickers: list, interval: str = None):
+        """
+        {ticker: instrument ids} for many tickers (see instrument_ids).
+
+        Tickers not read in the last INSTRUMENT_CACHE_TTL seconds are loaded
+        with one query, so instruments registered later by another process (a
+        new provider, interval or tick series) are picked up. Tickers without
+        any instrument are cached the same way instead of being queried again
+        on every call.
+        """
+        now = time.monotonic()
+        loaded = self.pool.loaded_tickers
+        stale = [t for t in dict.fromkeys(tickers)
+                 if t not in loaded or now - loaded[t] > Config.INSTRUMENT_CACHE_TTL]
+        if stale:
+            try:
+                with self.cursor() as cur:
+                    cur.execute("SELECT id, ticker, provider, interval FROM instruments WHERE ticker = ANY(%s)",
+                                (stale,))
+                    found = cur.fetchall()
+                for instrument, *key in found:
+                    self._cache_instrument(instrument, tuple(key))
+                for ticker in stale:
+                    loaded[ticker] = now
+            except Exception as e:
+                print(f"[{datetime.now()}] Error loading instruments for {len(stale)} tickers: {e}")
+
+        names = self.pool.instrument_names
+        results = {}
+        for ticker in tickers:
+            ids = self.pool.ticker_instruments.get(ticker, ())
+            if interval:
+                results[ticker] = [i for i in ids if names[i][2] == interval]
+            else:
+                results[ticker] = [i for i in ids if names[i][2] != 'tick']
+        return results
+
+    def instrument_name(self, instrument: int):
+        """
+        (ticker, provider, interval) of an instrument id. An id this process has
+        not seen yet is looked up, and its ticker's set is refreshed on next use.
+        """
+        key = self.pool.instrument_names.get(instrument)
+        if key is None:
+            with self.cursor() as cur:
+                cur.execute("SELECT ticker, provider, interval FROM instruments WHERE id = %s", (instrument,))
+                key = tuple(cur.fetchone())
+            self._cache_instrument(instrument, key)
+            self.pool.loaded_tickers.pop(key[0], None)
+        return key
+
+    def _cache_instrument(self, instrument: int, key: tuple):
+        with self.pool.lock:
+            self.pool.instruments[key] = instrument
+            self.pool.instrument_names[instrument] = key
+            ids = self.pool.ticker_instruments.setdefault(key[0], [])
+            if instrument not in ids:
+                ids.append(instrument)
+
+    def init_rollups(self):
+        """
+        Creates the 5m/1h/1d continuous aggregates and their refresh policies.
+        A newly created rollup is materialized over the whole history once.
+        """
+        for view, bucket, start_offset, schedule in ROLLUPS:
+            try:
+                with self.cursor() as cur:
+                    cur.execute(
+                        "SELECT 1 FROM timescaledb_information.continuous_aggregates WHERE view_name = %s",
+                        (view,)
+                    )
+                    created = cur.fetchone() is None
+                    if created:
+                        cur.execute(ROLLUP_VIEW_SQL.format(view=view), (bucket, bucket))
+                        cur.execute("CALL refresh_continuous_aggregate(%s, NULL, NULL)", (view,))
+                    cur.execute("""
+                        SELECT add_continuous_aggregate_policy(%s,
+                            start_offset => %s, end_offset => %s,
+                            schedule_interval => %s, if_not_exists => TRUE)
+                    """, (view, start_offset, bucket, schedule))
+                self.pool.rollups[view] = bucket
+                if created:
+                    print(f"[{datetime.now()}] Rollup '{view}' created and materialized.")
+            except Exception as e:
+                print(f"[{datetime.now()}] Error creating rollup '{view}': {e}")
+
+    def init_storage_policies(self):
+        """
+        Applies native compression (segmented by instrument, ordered by ts)
+        to chunks older than MARKET_COMPRESS_AFTER_DAYS, the optional raw data
+        retention and the metrics retention. All follow the config: disabling
+        one removes its policy and changing its interval replaces it.
+        """
+        try:
+            with self.cursor() as cur:
+                compress_after = None
+                if Config.MARKET_COMPRESSION:
+                    cur.execute("""
+                        SELECT compression_enabled FROM timescaledb_information.hypertables
+                        WHERE hypertable_name = 'market'
+                    """)
+                    row = cur.fetchone()
+                    if row and not row[0]:
+                        cur.execute("""
+                            ALTER TABLE market SET (
+                                timescaledb.compress,
+                                timescaledb.compress_segmentby = 'instrument_id',
+                                timescaledb.compress_orderby = 'ts DESC'
+                            )
+                        """)
+                    compress_after = timedelta(days=Config.MARKET_COMPRESS_AFTER_DAYS)
+                self._sync_policy(cur, 'market', 'compression', compress_after)
+
+                self._sync_policy(cur, 'market', 'retention', self.retention_window())
+
+                metrics_retention = timedelta(days=Config.METRICS_RETENTION_DAYS) \
+                    if Config.METRICS_RETENTION_DAYS > 0 else None
+                self._sync_policy(cur, 'metrics', 'retention', metrics_retention)
+        except Exception as e:
+            print(f"[{datetime.now()}] Error applying storage policies: {e}")
+
+    def _sync_policy(self, cur, table: str, kind: str, after):
+        """
+        Makes a table's 'compression' or 'retention' policy match `after`
+        (a timedelta, or None for no policy). add_*_policy(if_not_exists) keeps
+        an existing policy as it is, so a changed interval is applied by
+        removing the policy and adding it again.
+        """
+        proc, key = POLICY_JOBS[kind]
+        cur.execute(f"""
+            SELECT (config->>'{key}')::interval = %s
+            FROM timescaledb_information.jobs
+            WHERE proc_name = %s AND hypertable_name = %s
+        """, (after, proc, table))
+        row = cur.fetchone()
+        if row and row[0]:
+            return
+        if row:
+            cur.execute(f"SELECT remove_{kind}_policy(%s, if_exists => TRUE)", (table,))
+        if after is not None:
+            cur.execute(f"SELECT add_{kind}_policy(%s, {key} => %s)", (table, after))
+            print(f"[{datetime.now()}] {kind.capitalize()} policy on '{table}' set to {after.days} days.")
 
-    def insert_market_data(self, ticker: str, price: float, timestamp: datetime, source: str, interval: str = '1m'):
+    def retention_window(self):
         """
-        Inserts a single market data point.
+        Raw data retention as a timedelta, or None when disabled. Retention is
+        only honoured once every rollup exists and must outlive their refresh
+        windows, otherwise raw bars would be dropped before being aggregated.
         """
-        if not self.conn:
-            self.connect()
-            if not self.conn:
+        if Config.MARKET_RETENTION_DAYS <= 0:
+            return None
+        retention = timedelta(days=Config.MARKET_RETENTION_DAYS)
+        if len(self.pool.rollups) < len(ROLLUPS):
+            print(f"[{datetime.now()}] Retention skipped: rollups are not available.")
+            return None
+        longest = max(start_offset for _, _, start_offset, _ in ROLLUPS)
+        if retention <= longest:
+            print(f"[{datetime.now()}] Retention skipped: {retention.days} days is shorter "
+                  f"than the rollup refresh window ({longest.days} days).")
+            return None
+        return retention
+
+    def refresh_rollups(self, start: datetime, end: datetime):
+        """
+        Re-materializes [start, end) in every rollup, e.g. after a historical
+        backfill landed outside the refresh policies' window.
+        """
+        retention = self.retention_window()
+        if retention:
+            # Refreshing over dropped raw chunks would erase the rollups there (one bucket of margin)
+            start = max(start, datetime.now(timezone.utc) - retention + timedelta(days=1))
+            if start >= end:
                 return
 
+        for view, bucket in self.pool.rollups.items():
+            # The window must cover whole buckets
+            window_start = floor_time(start, bucket)
+            window_end = floor_time(end, bucket) + bucket
+            try:
+                with self.cursor() as cur:
+                    cur.execute("CALL refresh_continuous_aggregate(%s, %s, %s)", (view, window_start, window_end))
+            except Exception as e:
+                print(f"[{datetime.now()}] Error refreshing rollup '{view}': {e}")
+
+    def get_missing_ranges(self, ticker: str, interval: str, start: datetime, end: datetime, step, tolerance=None):
+        """
+        Finds holes in a series on the server side.
+        Returns half-open [gap_start, gap_end) ranges between `start` and `end`,
+        including the head (before the first row) and tail (after the last row).
+        A bar stored under any of the ticker's instruments (any provider) for
+        this interval counts as present.
+
+        :param step: Expected spacing between rows (timedelta)
+        :param tolerance: Spacing above which a hole is reported (defaults to `step`)
+        :return: List of (gap_start, gap_end) tuples, or None if the query failed
+        """
+        tolerance = tolerance or step
+        ids = self.instrument_ids(ticker, interval)
+        if not ids:
+            return [(start, end)]
+        params = {"ids": ids, "start": start, "end": end, "step": step, "tolerance": tolerance}
+
+        try:
+            with self.cursor() as cur:
+                cur.execute("""
+                    SELECT min(ts), max(ts)
+                    FROM market
+                    WHERE instrument_id = ANY(%(ids)s)
+                      AND ts >= %(start)s AND ts < %(end)s
+                """, params)
+                first_ts, last_ts = cur.fetchone()
+                if first_ts is None:
+                    return [(start, end)]
+
+                # Interior holes: consecutive rows further apart than the tolerance
+                cur.execute("""
+                    SELECT prev_ts + %(step)s AS gap_start, ts AS gap_end
+                    FROM (
+                        SELECT ts, lag(ts) OVER (ORDER BY ts) AS prev_ts
+                        FROM (
+                            SELECT DISTINCT ts
+                            FROM market
+                            WHERE instrument_id = ANY(%(ids)s)
+                              AND ts >= %(start)s AND ts < %(end)s
+                        ) d
+                    ) s
+                    WHERE ts - prev_ts > %(tolerance)s
+                    ORDER BY ts
+                """, params)
+                interior = cur.fetchall()
+        except Exception as e:
+            print(f"[{datetime.now()}] Error querying missing ranges for {ticker}: {e}")
+            return None
+
+        gaps = []
+        if first_ts - start >= tolerance:
+            gaps.append((start, first_ts))
+        gaps.extend((gap_start, gap_end) for gap_start, gap_end in interior)
+        if end - (last_ts + step) >= tolerance:
+            gaps.append((last_ts + step, end))
+        return gaps
+
+    def get_checked_ranges(self, ticker: str, provider: str, interval: str, start: datetime, end: datetime):
+        """
+        Ranges of (ticker, provider, interval) overlapping [start, end) that were
+        already downloaded (see mark_checked). Returns None if the query failed.
+        """
+        instrument = self.pool.instruments.get((ticker, provider, interval))
+        try:
+            if instrument is None:
+                instrument = self.instrument_id(ticker, provider, interval)
+            with self.cursor() as cur:
+                cur.execute("""
+                    SELECT start_ts, end_ts FROM backfill_checked
+                    WHERE instrument_id = %s AND end_ts > %s AND start_ts < %s
+                    ORDER BY start_ts
+                """, (instrument, start, end))
+                return cur.fetchall()
+        except Exception as e:
+            print(f"[{datetime.now()}] Error querying checked ranges for {ticker}: {e}")
+            return None
+
+    def mark_checked(self, ticker: str, provider: str, interval: str, start: datetime, end: datetime):
+        """
+        Records that the provider was asked for [start, end) and everything it
+        returned was stored, so bars still missing there (before a listing date,
+        exchange outages) are not requested again.
+        """
         try:
-            with self.conn.cursor() as cur:
-                query = sql.SQL("""
-                    INSERT INTO market (ts, ticker, provider, interval, close, open, high, low)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """)
-                cur.execute(query, (timestamp, ticker, source, interval, price, price, price, price))
+            instrument = self.instrument_id(ticker, provider, interval)
+            with self.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO backfill_checked (instrument_id, start_ts, end_ts)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (instrument_id, start_ts) DO UPDATE
+                    SET end_ts = greatest(backfill_checked.end_ts, EXCLUDED.end_ts)
+                """, (instrument, start, end))
         except Exception as e:
-            print(f"[{datetime.now()}] Error inserting data: {e}. Reconnecting...")
-            self.connect()
+            print(f"[{datetime.now()}] Error recording checked range for {ticker}: {e}")
 
-    def get_latest_timestamp(self, ticker: str):
+    def mark_repaired(self, ticker: str, provider: str, interval: str, start: datetime, end: datetime):
         """
-        Queries DB to find the last recorded timestamp for a symbol.
+        Records that backfilled rows were written into [start, end), so local
+        caches of the series re-check that range only (see get_repairs).
         """
-        if not self.conn:
-            self.connect()
-            if not self.conn:
-                return None
+        try:
+            instrument = self.instrument_id(ticker, provider, interval)
+            with self.cursor() as cur:
+                cur.execute("INSERT INTO market_repairs (instrument_id, start_ts, end_ts) VALUES (%s, %s, %s)",
+                            (instrument, start, end))
+        except Exception as e:
+            print(f"[{datetime.now()}] Error recording repaired range for {ticker}: {e}")
 
+    def get_repairs(self, ticker: str, interval: str = None, after: int = 0):
+        """
+        Ranges repaired in a ticker's series since repair id `after`, as
+        (id, start, end) in write order. Returns None if the query failed.
+        """
+        ids = self.instrument_ids(ticker, interval)
+        if not ids:
+            return []
         try:
-            with self.conn.cursor() as cur:
-                cur.execute("SELECT max(ts) FROM market WHERE ticker = %s", (ticker,))
-                result = cur.fetchone()
-                if result and result[0]:
-                    return result[0]
-                else:
-                    return None
+            with self.cursor() as cur:
+                cur.execute("""
+                    SELECT id, start_ts, end_ts FROM market_repairs
+                    WHERE instrument_id = ANY(%s) AND id > %s
+                    ORDER BY id
+                """, (ids, after))
+                return cur.fetchall()
         except Exception as e:
-            print(f"[{datetime.now()}] Error querying latest timestamp: {e}")
-            # If table doesn't exist, it might throw, but init_db should have handled it.
-            # If we lost connection, reconnection logic is needed next time.
+            print(f"[{datetime.now()}] Error querying repaired ranges for {ticker}: {e}")
             return None
-    
-    def insert_bulk_data(self, ticker: str, data_list: list, source: str, interval: str = '1m'):
+
+    def insert_bulk_data(self, ticker: str, data_list: list, source: str, interval: str = '1m',
+                         method: str = None, batch_size: int = None):
         """
-        Inserts bulk data using execute_values for performance.
+        Inserts bulk data. Uses the COPY protocol by default, falling back to
+        execute_values for any batch that keeps failing.
+
+        :param method: 'copy' or 'values' (defaults to Config.BULK_INSERT_METHOD)
+        :param batch_size: Rows per batch (defaults to Config.BULK_BATCH_SIZE)
+        :return: Number of rows written
         """
         if not data_list:
-            return
-        
-        if not self.conn:
-            self.connect()
-            if not self.conn:
-                return
+            return 0
 
         # Prepare list of tuples
         rows = []
         for row in data_list:
             try:
-                # Timestamp parsing
-                ts_val = row.get('date') if 'date' in row else row.get('timestamp')
-                if isinstance(ts_val, (int, float)):
-                    # Assuming ms for Binance
-                    ts = datetime.fromtimestamp(ts_val / 1000, tz=timezone.utc)
-                else:
-                    # ISO string
-                    ts = datetime.fromisoformat(str(ts_val).replace('Z', '+00:00'))
-
-                # Prices
-                if 'open' in row:
-                    open_p = row['open']
-                    high_p = row['high']
-                    low_p = row['low']
-                    close_p = row['close']
-                    vol = row.get('volume', 0.0)
-                else:
-                    p = float(row.get('close') or row.get('last') or 0.0)
-                    open_p = high_p = low_p = close_p = p
-                    vol = 0.0
-
-                rows.append((ts, ticker, source, interval, open_p, high_p, low_p, close_p, vol))
-
+                rows.append(build_market_row(ticker, row, source, interval))
             except Exception as e:
                 print(f"Skipping row: {e}")
                 continue
 
+        return self.write_rows(rows, method=method, batch_size=batch_size, label=ticker)
+
+    def write_rows(self, rows: list, method: str = None, batch_size: int = None, label: str = None):
+        """
+        Writes market tuples as built by build_market_row in batches, translating
+        (ticker, provider, interval) to instrument ids on the way.
+        Each batch is its own transaction, so a failure only retries that batch.
+        Batch latency and rows written feed the db.insert_ms / db.rows_inserted metrics.
+        """
+        if not rows:
+            return 0
+
+        method = (method or Config.BULK_INSERT_METHOD).lower()
+        batch_size = batch_size or Config.BULK_BATCH_SIZE
+
+        if not self.connect():
+            return 0
+
+        started = time.perf_counter()
         try:
-            with self.conn.cursor() as cur:
-                execute_values(
-                    cur,
-                    """
-                    INSERT INTO market (ts, ticker, provider, interval, open, high, low, close, volume)
-                    VALUES %s
-                    """,
-                    rows
-                )
-            print(f"[{datetime.now()}] Successfully inserted {len(rows)} rows for {ticker}.")
+            stored = self._to_stored_rows(rows)
         except Exception as e:
-            print(f"[{datetime.now()}] Bulk insert failed: {e}")
-            self.connect()
+            print(f"[{datetime.now()}] Could not resolve instruments for {label or 'market'}: {e}")
+            return 0
 
-    def get_history(self, ticker: str, limit: int = 100):
+        written = 0
+        for i in range(0, len(stored), batch_size):
+            batch = stored[i:i + batch_size]
+            with INSERT_MS.time():
+                if method == 'copy' and self._copy_with_retry(batch):
+                    written += len(batch)
+                    continue
+
+                # Fallback (or explicit 'values' method)
+                try:
+                    self._insert_values(batch)
+                    written += len(batch)
+                except Exception as e:
+                    print(f"[{datetime.now()}] Bulk insert failed for batch of {len(batch)} rows: {e}")
+        ROWS_INSERTED.inc(written)
+
+        if written and Config.MARKET_NOTIFY:
+            self.notify_ticks(rows)
+
+        elapsed = time.perf_counter() - started
+        log.debug("Successfully inserted %d/%d rows for %s via %s in %.3fs (%.0f rows/s).",
+                  written, len(rows), label or 'market', method, elapsed,
+                  written / elapsed if elapsed > 0 else float('inf'))
+        return written
+
+    def insert_batch(self, batch, method: str = None, batch_size: int = None):
         """
-        Selects recent history.
+        Inserts a BarBatch. With COPY each batch is encoded by NumPy into one
+        binary payload, with no per-row Python objects; the execute_values
+        fallback materializes rows only for a failing batch.
+
+        :return: Number of rows written
         """
-        if not self.conn:
-             self.connect()
-             if not self.conn: return []
+        if not len(batch):
+            return 0
+
+        method = (method or Config.BULK_INSERT_METHOD).lower()
+        batch_size = batch_size or Config.BULK_BATCH_SIZE
 
+        if not self.connect():
+            return 0
+
+        started = time.perf_counter()
         try:
-            with self.conn.cursor() as cur:
-                # Return dictionary-like objects
-                # We can use RealDictCursor globally or just map it here.
-                # Let's map manually to keep it simple or use dictionary cursor if easy.
-                # Standard cursor returns tuples.
-                
-                cur.execute("""
-                    SELECT ts, ticker, provider, interval, open, high, low, close, volume 
-                    FROM market 
-                    WHERE ticker = %s 
-                    ORDER BY ts DESC 
-                    LIMIT %s
-                """, (ticker, limit))
-                
-                cols = [desc[0] for desc in cur.description]
-                results = []
-                for row in cur.fetchall():
-                    results.append(dict(zip(cols, row)))
-                
-                # Reverse to have chronological order if needed (runner expects DESC for limit, but often processes chronological?)
-                # Runner.get_history reversed it. Let's see runner logic.
-                # Runner: "dataset is ordered DESC... so we should reverse it for warm-up"
-                # So we return DESC here as well (latest first).
-                
-                return results
-                
+            instrument = self.instrument_id(batch.ticker, batch.provider, batch.interval)
+        except Exception as e:
+            print(f"[{datetime.now()}] Could not resolve instrument for {batch.ticker}: {e}")
+            return 0
+
+        written = 0
+        for i in range(0, len(batch), batch_size):
+            part = batch[i:i + batch_size]
+            with INSERT_MS.time():
+                if method == 'copy' and self._copy_with_retry(
+                        part, lambda: self._copy_buffer(io.BytesIO(_encode_binary_batch(part, instrument)), 'binary')):
+                    written += len(part)
+                    continue
+
+                # Fallback (or explicit 'values' method)
+                try:
+                    timestamps = [PG_EPOCH + timedelta(microseconds=int(us) - PG_EPOCH_US) for us in part.ts]
+                    self._insert_values(list(zip(timestamps, [instrument] * len(part), part.open.tolist(),
+                                                 part.high.tolist(), part.low.tolist(), part.close.tolist(),
+                                                 part.volume.tolist())))
+                    written += len(part)
+                except Exception as e:
+                    print(f"[{datetime.now()}] Bulk insert failed for batch of {len(part)} rows: {e}")
+        ROWS_INSERTED.inc(written)
+
+        if written and Config.MARKET_NOTIFY:
+            last = PG_EPOCH + timedelta(microseconds=int(batch.ts.max()) - PG_EPOCH_US)
+            self.notify_ticks([(last, batch.ticker)])
+
+        elapsed = time.perf_counter() - started
+        log.debug("Successfully inserted %d/%d rows for %s via %s in %.3fs (%.0f rows/s).",
+                  written, len(batch), batch.ticker, method, elapsed,
+                  written / elapsed if elapsed > 0 else float('inf'))
+        return written
+
+    def _to_stored_rows(self, rows: list):
+        """
+        Maps (ts, ticker, provider, interval, o, h, l, c, v) to MARKET_COLUMNS order.
+        """
+        ids = {}
+        stored = []
+        for ts, ticker, provider, interval, *values in rows:
+            key = (ticker, provider, interval)
+            instrument = ids.get(key)
+            if instrument is None:
+                instrument = ids[key] = self.instrument_id(*key)
+            stored.append((ts, instrument, *values))
+        return stored
+
+    def notify_ticks(self, rows: list):
+        """
+        Emits one NOTIFY per ticker on MARKET_CHANNEL with its newest timestamp,
+        so listening engines wake up as soon as the rows are committed.
+        """
+        latest = {}
+        for row in rows:
+            ts, ticker = row[0], row[1]
+            if ticker not in latest or ts > latest[ticker]:
+                latest[ticker] = ts
+
+        sent = time.time()
+        payloads = [json.dumps({"ticker": ticker, "ts": ts.isoformat(), "sent": sent})
+                    for ticker, ts in latest.items()]
+        try:
+            with self.cursor() as cur:
+                cur.execute("SELECT pg_notify(%s, p) FROM unnest(%s::text[]) AS p", (MARKET_CHANNEL, payloads))
+        except Exception as e:
+            print(f"[{datetime.now()}] Error sending tick notifications: {e}")
+
+    def listen(self, channel: str = None):
+        """
+        Returns a MarketListener on its own connection (LISTEN is session-bound).
+        """
+        listener = MarketListener(self.conn_params, channel or MARKET_CHANNEL)
+        listener.connect()
+        return listener
+
+    def _copy_with_retry(self, batch, copy=None):
+        """
+        Streams one batch through COPY, retrying on a fresh pooled connection on failure.
+        Returns False once Config.COPY_MAX_RETRIES attempts are exhausted.
+
+        :param copy: Callable performing the COPY (defaults to _copy_rows on `batch`)
+        """
+        copy = copy or (lambda: self._copy_rows(batch, Config.COPY_FORMAT))
+        for attempt in range(1, Config.COPY_MAX_RETRIES + 1):
+            try:
+                copy()
+                return True
+            except Exception as e:
+                print(f"[{datetime.now()}] COPY attempt {attempt}/{Config.COPY_MAX_RETRIES} failed: {e}")
+                time.sleep(0.1 * attempt)
+        print(f"[{datetime.now()}] COPY gave up on batch of {len(batch)} rows. Falling back to execute_values.")
+        return False
+
+    def _copy_rows(self, rows: list, fmt: str = 'text'):
+        """
+        Loads rows with `COPY market FROM STDIN` using an in-memory buffer.
+        """
+        if fmt == 'binary':
+            buf = io.BytesIO()
+            buf.write(PGCOPY_HEADER)
+            for row in rows:
+                buf.write(_encode_binary_row(row))
+            buf.write(PGCOPY_TRAILER)
+        else:
+            buf = io.StringIO()
+            for row in rows:
+                buf.write("\t".join(_encode_text_value(v) for v in row))
+                buf.write("\n")
+
+        buf.seek(0)
+        self._copy_buffer(buf, fmt)
+
+    def _copy_buffer(self, buf, fmt: str = 'text'):
+        """
+        Runs `COPY market FROM STDIN` over an already encoded buffer.
+        """
+        columns = ", ".join(MARKET_COLUMNS)
+        if fmt == 'binary':
+            query = f"COPY market ({columns}) FROM STDIN WITH (FORMAT binary)"
+        else:
+            query = f"COPY market ({columns}) FROM STDIN"
+        with self.cursor() as cur:
+            cur.copy_expert(query, buf)
+
+    def _insert_values(self, rows: list):
+        """
+        Inserts rows with execute_values (the original bulk path).
+        """
+        with self.cursor() as cur:
+            execute_values(
+                cur,
+                """
+                INSERT INTO market (ts, instrument_id, open, high, low, close, volume)
+                VALUES %s
+                """,
+                rows,
+                page_size=len(rows)
+            )
+
+    def get_history(self, ticker: str, limit: int = 100, resolution=None, interval: str = None):
+        """
+        Selects the most recent `limit` rows, in chronological order.
+
+        :param resolution: Optional bar size ('15m', '4h', '1d' or a timedelta); bars are
+                           aggregated from the coarsest rollup that divides it
+        """
+        query, params = self._bars_query(ticker, interval, resolution)
+        if query is None:
+            return []
+
+        try:
+            with self.cursor() as cur:
+                # Newest rows first for the LIMIT, flipped back on the server
+                cur.execute(f"""
+                    SELECT * FROM (
+                        SELECT ts, instrument_id, open, high, low, close, volume
+                        FROM ({query}) b
+                        ORDER BY ts DESC
+                        LIMIT %s
+                    ) h
+                    ORDER BY ts
+                """, params + [limit])
+                rows = cur.fetchall()
         except Exception as e:
             print(f"[{datetime.now()}] Error querying history: {e}")
             return []
 
+        label = resolution if isinstance(resolution, str) else None
+        return [self._market_record(row, label) for row in rows]
+
     def get_latest(self, ticker: str):
         """
         Polls for the absolute latest record.
         """
-        if not self.conn:
-             self.connect()
-             if not self.conn: return None
+        ids = self.instrument_ids(ticker)
+        if not ids:
+            return None
 
         try:
-            with self.conn.cursor() as cur:
+            with self.cursor() as cur:
                 cur.execute("""
-                    SELECT ts, ticker, provider, interval, open, high, low, close, volume 
-                    FROM market 
-                    WHERE ticker = %s 
-                    ORDER BY ts DESC 
+                    SELECT ts, instrument_id, open, high, low, close, volume
+                    FROM market
+                    WHERE instrument_id = ANY(%s)
+                    ORDER BY ts DESC
                     LIMIT 1
-                """, (ticker,))
-                
+                """, (ids,))
                 row = cur.fetchone()
-                if row:
-                    cols = [desc[0] for desc in cur.description]
-                    return dict(zip(cols, row))
-                return None
+                return self._market_record(row) if row else None
         except Exception as e:
             return None
+
+    def _market_record(self, row, interval_label: str = None):
+        """
+        Turns a (ts, instrument_id, o, h, l, c, v) row into the dict shape
+        consumers expect (ts, ticker, provider, interval, open, ..., volume).
+        """
+        ts, instrument, open_p, high_p, low_p, close_p, vol = row
+        ticker, provider, interval = self.instrument_name(instrument)
+        return {"ts": ts, "ticker": ticker, "provider": provider, "interval": interval_label or interval,
+                "open": open_p, "high": high_p, "low": low_p, "close": close_p, "volume": vol}
+
+    def get_range(self, ticker: str, start: datetime = None, end: datetime = None, interval: str = None,
+                  resolution=None):
+        """
+        Selects a ticker's rows in [start, end) as NumPy arrays (chronological).
+        Returns {'ts': datetime64[us], 'open', 'high', 'low', 'close', 'volume': float64}.
+
+        :param resolution: Optional bar size; see get_history
+        """
+        try:
+            chunks = list(self.iter_range(ticker, start, end, interval=interval, resolution=resolution))
+        except Exception as e:
+            print(f"[{datetime.now()}] Error querying range for {ticker}: {e}")
+            chunks = []
+
+        if not chunks:
+            return _rows_to_arrays([])
+        return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in BAR_DTYPE.names}
+
+    def count_range(self, ticker: str, start: datetime = None, end: datetime = None, interval: str = None):
+        """
+        Counts a ticker's rows in [start, end) (the rows iter_range would
+        yield). Returns None on error.
+        """
+        query, params = self._bars_query(ticker, interval, None, start, end)
+        if query is None:
+            return 0
+        try:
+            with self.cursor() as cur:
+                cur.execute(f"SELECT count(*) FROM ({query}) b", params)
+                return cur.fetchone()[0]
+        except Exception as e:
+            print(f"[{datetime.now()}] Error counting range for {ticker}: {e}")
+            return None
+
+    def iter_range(self, ticker: str, start: datetime = None, end: datetime = None, interval: str = None,
+                   resolution=None, itersize: int = None, as_frame: bool = False):
+        """
+        Streams a ticker's rows in [start, end) in chronological order through a
+        named (server-side) cursor, so memory stays bounded by `itersize`
+        whatever the size of the range.
+
+        Yields NumPy structured arrays of BAR_DTYPE, or DataFrames indexed by ts
+        with `as_frame`. The pooled connection is held until the generator is
+        exhausted or closed.
+        """
+        query, params = self._bars_query(ticker, interval, resolution, start, end)
+        if query is None:
+            return
+        itersize = itersize or Config.HISTORY_ITERSIZE
+
+        with self.pool.connection() as conn:
+            # Named cursors only live inside a transaction
+            conn.autocommit = False
+            try:
+                with conn.cursor(name=f"range_{uuid.uuid4().hex}") as cur:
+                    cur.itersize = itersize
+                    cur.execute(f"""
+                        SELECT (extract(epoch FROM ts) * 1000000)::bigint, open, high, low, close, volume
+                        FROM ({query}) b
+                        ORDER BY ts
+                    """, params)
+                    while True:
+                        rows = cur.fetchmany(itersize)
+                        if not rows:
+                            break
+                        chunk = np.array(rows, dtype=_BAR_WIRE_DTYPE).view(BAR_DTYPE)
+                        yield pd.DataFrame(chunk).set_index("ts") if as_frame else chunk
+            finally:
+                if not conn.closed:
+                    conn.rollback()
+                    conn.autocommit = True
+
+    def _bars_query(self, ticker: str, interval: str = None, resolution=None, start: datetime = None,
+                    end: datetime = None):
+        """
+        Builds the bar subquery behind get_history/get_range.
+
+        Without a resolution the raw hypertable is read as-is. With one, bars are
+        re-bucketed from the coarsest rollup whose bucket divides the resolution
+        (market_1d for '1w', market_1h for '4h', ...), or from `market` when no
+        rollup fits, so long horizons read a fraction of the raw rows.
+        Returns (None, None) when the ticker has no stored instrument.
+        """
+        ids = self.instrument_ids(ticker, interval)
+        if not ids:
+            return None, None
+
+        clauses = ["instrument_id = ANY(%s)"]
+        where = [ids]
+        if start:
+            clauses.append("ts >= %s")
+            where.append(start)
+        if end:
+            clauses.append("ts < %s")
+            where.append(end)
+
+        step = None
+        if resolution is not None:
+            step = interval_to_timedelta(resolution) if isinstance(resolution, str) else resolution
+            if interval and interval != 'tick' and step == interval_to_timedelta(interval):
+                step = None
+
+        if step is None:
+            return (f"SELECT ts, instrument_id, open, high, low, close, volume "
+                    f"FROM market WHERE {' AND '.join(clauses)}", where)
+
+        source = "market"
+        for view, bucket in sorted(self.pool.rollups.items(), key=lambda item: item[1], reverse=True):
+            if step % bucket == timedelta(0):
+                source = view
+                break
+
+        # One series per ticker even if it is stored under several instruments
+        return f"""
+            SELECT time_bucket(%s, ts) AS ts, min(instrument_id) AS instrument_id,
+                   first(open, ts) AS open, max(high) AS high, min(low) AS low,
+                   last(close, ts) AS close, sum(volume) AS volume
+            FROM {source}
+            WHERE {' AND '.join(clauses)}
+            GROUP BY time_bucket(%s, ts)
+        """, [step] + where + [step]
+
+    def get_history_many(self, tickers: list, limit: int = 100):
+        """
+        Selects the last `limit` rows of every ticker in a single query.
+        Returns {ticker: [rows in chronological order]}.
+        """
+        results = {ticker: [] for ticker in tickers}
+        ids = [i for ticker_ids in self.instrument_ids_many(tickers).values() for i in ticker_ids]
+        if not ids:
+            return results
+
+        try:
+            with self.cursor() as cur:
+                # LATERAL keeps each per-instrument lookup on the (instrument_id, ts DESC) index
+                cur.execute("""
+                    SELECT h.ts, h.instrument_id, h.open, h.high, h.low, h.close, h.volume
+                    FROM unnest(%s::int[]) AS t(instrument_id)
+                    CROSS JOIN LATERAL (
+                        SELECT * FROM market m
+                        WHERE m.instrument_id = t.instrument_id
+                        ORDER BY m.ts DESC
+                        LIMIT %s
+                    ) h
+                    ORDER BY h.ts
+                """, (ids, limit))
+                rows = cur.fetchall()
+        except Exception as e:
+            print(f"[{datetime.now()}] Error querying history for {len(tickers)} tickers: {e}")
+            return results
+
+        for row in rows:
+            record = self._market_record(row)
+            results[record['ticker']].append(record)
+        # A ticker stored under several instruments may have more than `limit` rows
+        return {ticker: records[-limit:] for ticker, records in results.items()}
+
+    def get_bars_since(self, watermarks: dict, limit: int = 10000):
+        """
+        Fetches every row newer than each ticker's watermark in a single query.
+
+        :param watermarks: {ticker: last seen ts}
+        :return: Rows (dicts) in chronological order, at most `limit`
+        """
+        if not watermarks:
+            return []
+
+        ids, since = [], []
+        for ticker, instruments in self.instrument_ids_many(list(watermarks)).items():
+            ids.extend(instruments)
+            since.extend([watermarks[ticker]] * len(instruments))
+        if not ids:
+            return []
+
+        try:
+            with self.cursor() as cur:
+                # The lower bound on m.ts lets TimescaleDB exclude older chunks up front
+                cur.execute("""
+                    SELECT m.ts, m.instrument_id, m.open, m.high, m.low, m.close, m.volume
+                    FROM market m
+                    JOIN unnest(%s::int[], %s::timestamptz[]) AS w(instrument_id, since)
+                      ON m.instrument_id = w.instrument_id AND m.ts > w.since
+                    WHERE m.ts > %s
+                    ORDER BY m.ts
+                    LIMIT %s
+                """, (ids, since, min(since), limit))
+                rows = cur.fetchall()
+        except Exception as e:
+            print(f"[{datetime.now()}] Error querying new bars: {e}")
+            return []
+
+        return [self._market_record(row) for row in rows]
+
+
+def build_market_row(ticker: str, row: dict, source: str, interval: str):
+    """
+    Builds a (ts, ticker, provider, interval, open, high, low, close, volume)
+    tuple from a provider record; write_rows resolves the instrument id.
+    Accepts Binance klines ('timestamp' in ms), Tiingo bars ('date' ISO string)
+    and price-only ticks ('close' or 'last').
+    """
+    # Timestamp parsing
+    ts_val = row.get('date') if 'date' in row else row.get('timestamp')
+    if isinstance(ts_val, datetime):
+        ts = ts_val
+    elif isinstance(ts_val, (int, float)):
+        # Assuming ms for Binance
+        ts = datetime.fromtimestamp(ts_val / 1000, tz=timezone.utc)
+    else:
+        # ISO string
+        ts = datetime.fromisoformat(str(ts_val).replace('Z', '+00:00'))
+
+    # Prices
+    if 'open' in row:
+        open_p = row['open']
+        high_p = row['high']
+        low_p = row['low']
+        close_p = row['close']
+        vol = row.get('volume', 0.0)
+    else:
+        p = float(row.get('close') or row.get('last') or 0.0)
+        open_p = high_p = low_p = close_p = p
+        vol = 0.0
+
+    return (ts, ticker, source, interval, open_p, high_p, low_p, close_p, vol)
+
+
+def _rows_to_arrays(rows: list):
+    """Converts (ts_us, open, high, low, close, volume) tuples to columnar NumPy arrays."""
+    columns = list(zip(*rows)) if rows else [()] * 6
+    arrays = {"ts": np.asarray(columns[0], dtype=np.int64).astype("datetime64[us]")}
+    for name, values in zip(("open", "high", "low", "close", "volume"), columns[1:]):
+        arrays[name] = np.asarray(values, dtype=np.float64)
+    return arrays
+
+
+def _encode_text_value(value):
+    """Formats a value for COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        return (value.replace("\\", "\\\\").replace("\t", "\\t")
+                     .replace("\n", "\\n").replace("\r", "\\r"))
+    return repr(float(value))
+
+
+def _encode_binary_batch(batch, instrument: int):
+    """Encodes a whole BarBatch for COPY binary format in one pass."""
+    records = np.empty(len(batch), dtype=PGCOPY_BAR_DTYPE)
+    records["fields"] = len(MARKET_COLUMNS)
+    records["ts_len"] = 8
+    records["ts"] = batch.ts - PG_EPOCH_US
+    records["id_len"] = 4
+    records["instrument_id"] = instrument
+    for name in MARKET_COLUMNS[2:]:
+        records[f"{name}_len"] = 8
+        records[name] = getattr(batch, name)
+    return PGCOPY_HEADER + records.tobytes() + PGCOPY_TRAILER
+
+
+def _encode_binary_row(row):
+    """Encodes one stored market tuple (MARKET_COLUMNS order) for COPY binary format."""
+    ts, instrument, *values = row
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    delta = ts - PG_EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+    parts = [struct.pack("!hiqii", len(MARKET_COLUMNS), 8, micros, 4, instrument)]
+    for value in values:
+        if value is None:
+            parts.append(struct.pack("!i", -1))
+        else:
+            parts.append(struct.pack("!id", 8, float(value)))
+    return b"".join(parts)
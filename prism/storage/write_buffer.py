@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+from storage.timescale_handler import build_market_row
+from utils import metrics
+from utils.config import Config
+
+
+class WriteBuffer:
+    """
+    Background micro-batching writer for live market rows.
+
+    Producers enqueue rows into a bounded queue and return immediately; a
+    writer thread flushes them to TimescaleDB whenever `max_rows` rows are
+    pending or `max_delay` seconds have passed since the oldest pending row.
+    A full queue blocks producers (backpressure) instead of growing memory.
+
+    With a TickBus, put() publishes on the bus and the buffer is just its
+    persistence subscriber (policy BUS_PERSIST_POLICY, 'block' by default: a
+    full buffer holds the publisher for at most BUS_BLOCK_TIMEOUT per row, then
+    the row is dropped and counted in bus.persist.dropped).
+    """
+    def __init__(self, db, max_rows: int = None, max_delay: float = None, capacity: int = None, bus=None):
+        self.db = db
+        self.max_rows = max_rows or Config.WRITE_BUFFER_MAX_ROWS
+        self.max_delay = max_delay or Config.WRITE_BUFFER_MAX_DELAY
+        capacity = capacity or Config.WRITE_BUFFER_CAPACITY
+        if bus is not None:
+            self.queue = bus.subscribe("persist", capacity=capacity, policy=Config.BUS_PERSIST_POLICY)
+            self.publish = bus.publish
+        else:
+            self.queue = queue.Queue(maxsize=capacity)
+            self.publish = self.queue.put
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        # Exported metrics; queue depth is only sampled when the registry is collected
+        self.flush_ms = metrics.histogram("write_buffer.flush_ms")
+        self.rows_flushed = metrics.counter("write_buffer.rows_flushed")
+        metrics.gauge("write_buffer.queue_depth", fn=self.queue.qsize)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+            self.thread.start()
+        return self
+
+    def put(self, row: tuple, timeout: float = None):
+        """
+        Enqueues a market tuple (as built by build_market_row). Blocks while the
+        queue is full; raises queue.Full once an explicit `timeout` expires.
+        """
+        self.publish(row, timeout=timeout)
+
+    def put_tick(self, ticker: str, price: float, timestamp: datetime, source: str, interval: str = '1m'):
+        self.put((timestamp, ticker, source, interval, price, price, price, price, None))
+
+    def put_bar(self, ticker: str, bar: dict, source: str, interval: str = '1m'):
+        self.put(build_market_row(ticker, bar, source, interval))
+
+    def close(self, timeout: float = None):
+        """
+        Stops the writer after flushing everything already enqueued.
+        """
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def metrics(self):
+        """Summary of the registry metrics above (lifetime totals)."""
+        return {
+            "queue_depth": self.queue.qsize(),
+            "rows_flushed": self.rows_flushed.value,
+            "flushes": self.flush_ms.count,
+            "last_flush_ms": self.flush_ms.last,
+            "max_flush_ms": self.flush_ms.max,
+            "avg_flush_ms": self.flush_ms.mean(),
+        }
+
+    def _run(self):
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            try:
+                first = self.queue.get(timeout=self.max_delay)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch: list):
+        started = time.perf_counter()
+        try:
+            self.rows_flushed.inc(self.db.write_rows(batch, label="live buffer"))
+        except Exception as e:
+            print(f"[{datetime.now()}] WriteBuffer: flush of {len(batch)} rows failed: {e}")
+        self.flush_ms.observe((time.perf_counter() - started) * 1000)
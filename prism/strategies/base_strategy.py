@@ -1,9 +1,28 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
+from strategies.signals import Signal, SIDES
 
 class Strategy(ABC):
     def __init__(self, symbol: str):
         self.symbol = symbol
+        # Target position after the last tick: 1 long, -1 short, 0 flat
+        self.position = 0
+        # Name stored with every signal (`signals.model`)
+        self.model = self.__class__.__name__
+        # Receives emitted Signals (set by the engine, e.g. SignalWriter.put); None = not persisted
+        self.sink = None
+        self.last_signal = None
+
+    def emit(self, timestamp, position: int, price: float = None, score: float = None,
+             target: float = None, stop: float = None):
+        """
+        Emits a Signal for a new target position. Cheap when no sink is attached.
+        """
+        signal = Signal(timestamp, self.model, self.symbol, SIDES[position], score, target, stop, price)
+        self.last_signal = signal
+        if self.sink is not None:
+            self.sink(signal)
+        return signal
     
     @abstractmethod
     def on_start(self, historical_data):
@@ -19,3 +38,12 @@ class Strategy(ABC):
         Called on every new market tick.
         """
         pass
+
+    def on_bars(self, bars):
+        """
+        Optional vectorized hook used by the backtester.
+        bars: dict of NumPy arrays ('ts', 'open', 'high', 'low', 'close', 'volume').
+        Return an array with the target position at the close of every bar,
+        or None to have the backtester replay on_tick bar by bar instead.
+        """
+        return None
@@ -0,0 +1,88 @@
+"""
+Structured records emitted by the trading path, one class per table.
+
+Each record knows its target table and its row in that table's column order,
+so SignalWriter can batch any mix of them without knowing the classes.
+"""
+from datetime import datetime
+
+# Position -> side as stored in `signals` / `orders`
+SIDES = {1: "LONG", -1: "SHORT", 0: "FLAT"}
+
+
+class Signal:
+    """
+    A strategy's target position for a ticker (table `signals`).
+    """
+    __slots__ = ("ts", "model", "ticker", "side", "score", "target", "stop", "price")
+    table = "signals"
+    columns = ("ts", "model", "ticker", "side", "score", "target", "stop")
+
+    def __init__(self, ts: datetime, model: str, ticker: str, side: str, score: float = None,
+                 target: float = None, stop: float = None, price: float = None):
+        self.ts = ts
+        self.model = model
+        self.ticker = ticker
+        self.side = side
+        self.score = score
+        self.target = target
+        self.stop = stop
+        # Price that triggered the signal (not stored; used by risk and order sizing)
+        self.price = price
+
+    @property
+    def position(self):
+        return {"LONG": 1, "SHORT": -1}.get(self.side, 0)
+
+    def row(self):
+        return (self.ts, self.model, self.ticker, self.side, self.score, self.target, self.stop)
+
+    def __repr__(self):
+        return f"Signal({self.ts}, {self.model}, {self.ticker}, {self.side}, price={self.price})"
+
+
+class RiskCheck:
+    """
+    Outcome of one risk check on a signal or order (table `risk`).
+    """
+    __slots__ = ("ts", "model", "ticker", "check_name", "result", "exposure", "reason")
+    table = "risk"
+    columns = ("ts", "model", "ticker", "check_name", "result", "exposure", "reason")
+
+    def __init__(self, ts: datetime, model: str, ticker: str, check_name: str, result: str,
+                 exposure: float = None, reason: str = None):
+        self.ts = ts
+        self.model = model
+        self.ticker = ticker
+        self.check_name = check_name
+        self.result = result
+        self.exposure = exposure
+        self.reason = reason
+
+    def row(self):
+        return (self.ts, self.model, self.ticker, self.check_name, self.result, self.exposure, self.reason)
+
+
+class Order:
+    """
+    An order intent and its status (table `orders`).
+    """
+    __slots__ = ("ts", "id", "ticker", "side", "order_type", "quantity", "price_limit", "status", "strategy")
+    table = "orders"
+    columns = ("ts", "id", "ticker", "side", "order_type", "quantity", "price_limit", "status", "strategy")
+
+    def __init__(self, ts: datetime, id: str, ticker: str, side: str, quantity: float, order_type: str = "MKT",
+                 price_limit: float = None, status: str = "NEW", strategy: str = None):
+        self.ts = ts
+        self.id = id
+        self.ticker = ticker
+        self.side = side
+        self.order_type = order_type
+        self.quantity = quantity
+        self.price_limit = price_limit
+        self.status = status
+        self.strategy = strategy
+
+    def row(self):
+        return (self.ts, self.id, self.ticker, self.side, self.order_type, self.quantity, self.price_limit,
+                self.status, self.strategy)
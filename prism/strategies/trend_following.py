@@ -1,4 +1,9 @@
+import numpy as np
+from algorithms.indicators import SMA
 from strategies.base_strategy import Strategy
+from utils.logger import get_logger
+
+log = get_logger("strategy")
 
 class TrendFollowing(Strategy):
     """
@@ -8,7 +13,8 @@ class TrendFollowing(Strategy):
     def __init__(self, symbol: str, window: int = 5):
         super().__init__(symbol)
         self.window = window
-        self.history = [] # Keep track of last N prices
+        self.sma = SMA(window) # O(1) rolling mean over the last N prices
+        self.model = f"{self.__class__.__name__}({window})"
         print(f"Strategy {self.__class__.__name__} initialized for {symbol}")
 
     def on_start(self, historical_data):
@@ -17,33 +23,43 @@ class TrendFollowing(Strategy):
         """
         # historical_data is expected to be a list of dicts or similar
         print(f"Warming up with {len(historical_data)} records...")
+        prices = []
         for row in historical_data:
             # Assuming row has 'price' (and we might ignore timestamp for simple logic)
-            # Adapt based on actual data structure from QuestDB
             price = row.get('price') or row.get('close')
             if price:
-                self.history.append(float(price))
-                if len(self.history) > self.window:
-                    self.history.pop(0)
+                prices.append(float(price))
+        self.sma.update_many(prices)
 
     def on_tick(self, price, timestamp):
         """
         Main logic.
         """
-        self.history.append(price)
-        if len(self.history) > self.window:
-            self.history.pop(0)
-        
-        if len(self.history) < self.window:
+        sma = self.sma.update(price)
+        if sma is None:
             return # Not enough data
         
-        # Calculate Simple Moving Average
-        sma = sum(self.history) / len(self.history)
-        
+        previous = self.position
         signal = "HOLD"
+        self.position = 0
         if price > sma:
             signal = "BUY (Bullish)"
+            self.position = 1
         elif price < sma:
             signal = "SELL (Bearish)"
-            
-        print(f"STRATEGY: Price {price} | SMA({self.window}): {sma:.2f} | Signal: {signal}")
+            self.position = -1
+
+        # Debug only: replays and parameter sweeps run on_tick over whole histories;
+        # position changes are recorded as Signals anyway
+        log.debug("STRATEGY: Price %s | SMA(%d): %.2f | Signal: %s", price, self.window, sma, signal)
+        if self.position != previous:
+            self.emit(timestamp, self.position, price=price)
+
+    def on_bars(self, bars):
+        """
+        Vectorized equivalent of on_tick over a whole history.
+        """
+        close = bars['close']
+        # Fresh indicator: the backtest must not disturb the live state
+        sma = SMA(self.window).update_many(close)
+        return np.nan_to_num(np.sign(close - sma))
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+from ingestion.backfill_planner import BackfillPlanner, floor_time, interval_to_timedelta, is_settled
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def day(n):
+    return T0 + timedelta(days=n)
+
+
+class FakeDB:
+    """Serves fixed gaps and checked ranges, recording the provider it was asked about."""
+    def __init__(self, gaps, checked=None):
+        self.gaps = gaps
+        self.checked = checked or []
+        self.checked_calls = []
+
+    def get_missing_ranges(self, ticker, interval, start, end, step, tolerance=None):
+        return self.gaps
+
+    def get_checked_ranges(self, ticker, provider, interval, start, end):
+        self.checked_calls.append(provider)
+        return self.checked
+
+
+def test_interval_to_timedelta():
+    assert interval_to_timedelta("1m") == timedelta(minutes=1)
+    assert interval_to_timedelta("4h") == timedelta(hours=4)
+    assert interval_to_timedelta("1w") == timedelta(weeks=1)
+
+
+def test_floor_time_aligns_to_epoch():
+    ts = datetime(2024, 1, 1, 10, 7, 31, tzinfo=timezone.utc)
+    assert floor_time(ts, timedelta(minutes=5)) == datetime(2024, 1, 1, 10, 5, tzinfo=timezone.utc)
+
+
+def test_merge_coalesces_overlapping_and_touching_ranges():
+    merged = BackfillPlanner._merge([(day(5), day(6)), (day(0), day(2)), (day(2), day(3)), (day(1), day(2))])
+    assert merged == [(day(0), day(3)), (day(5), day(6))]
+
+
+def test_subtract_cuts_head_middle_and_tail():
+    ranges = [(day(0), day(10)), (day(20), day(30))]
+    removed = [(day(-5), day(2)), (day(4), day(5)), (day(8), day(22))]
+    assert BackfillPlanner._subtract(ranges, removed) == [
+        (day(2), day(4)), (day(5), day(8)), (day(22), day(30))]
+
+
+def test_plan_splits_gaps_into_chunks():
+    planner = BackfillPlanner(FakeDB([(day(0), day(40)), (day(50), day(51))]), chunk_size=timedelta(days=15))
+    assert planner.plan("BTCUSDT", "1d", day(0), day(60)) == [
+        (day(0), day(15)), (day(15), day(30)), (day(30), day(40)), (day(50), day(51))]
+
+
+def test_plan_skips_checked_ranges_for_the_provider():
+    # Head before the listing date and an outage were already downloaded and came back empty
+    db = FakeDB([(day(0), day(30)), (day(40), day(45))], checked=[(day(0), day(20)), (day(40), day(45))])
+    planner = BackfillPlanner(db, chunk_size=timedelta(days=15))
+    assert planner.plan("BTCUSDT", "1d", day(0), day(60), provider="binance") == [(day(20), day(30))]
+    assert db.checked_calls == ["binance"]
+
+
+def test_plan_without_provider_ignores_checked_ranges():
+    db = FakeDB([(day(0), day(10))], checked=[(day(0), day(10))])
+    assert BackfillPlanner(db).plan("BTCUSDT", "1d", day(0), day(60)) == [(day(0), day(10))]
+    assert db.checked_calls == []
+
+
+def test_plan_skips_ticker_when_gap_query_fails():
+    assert BackfillPlanner(FakeDB(None)).plan("BTCUSDT", "1d", day(0), day(60)) == []
+
+
+def test_plan_with_empty_window():
+    assert BackfillPlanner(FakeDB([])).plan("BTCUSDT", "1d", day(5), day(5)) == []
+
+
+def test_is_settled():
+    now = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+    assert is_settled(now - timedelta(hours=2), now)
+    assert not is_settled(now - timedelta(minutes=10), now)
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ingestion.backfill_runner import ConcurrentBackfill
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class Unlimited:
+    def acquire(self, weight=1.0):
+        pass
+
+
+class FakeService:
+    source = "tiingo"
+
+    def __init__(self, fail=(), empty=()):
+        self.fail = set(fail)
+        self.empty = set(empty)
+        self.stored = []
+        self.checked = []
+        self.repaired = []
+
+    def is_cached(self, ticker, interval, start, end):
+        return False
+
+    def fetch_range(self, ticker, interval, start, end):
+        if ticker in self.fail:
+            raise ValueError("provider error")
+        return [] if ticker in self.empty else [(ticker, start)] * 3
+
+    def store(self, ticker, interval, history):
+        self.stored.append((ticker, len(history)))
+        return len(history)
+
+    def mark_checked(self, ticker, interval, start, end):
+        self.checked.append((ticker, start, end))
+
+    def mark_repaired(self, ticker, interval, start, end):
+        self.repaired.append((ticker, start, end))
+
+
+def chunks(n):
+    return [(T0 + timedelta(days=i), T0 + timedelta(days=i + 1)) for i in range(n)]
+
+
+def run(service, plans, **kwargs):
+    backfill = ConcurrentBackfill(service, workers=4, queue_size=2, limiter=Unlimited(), **kwargs)
+    return backfill, backfill.run(plans, "1d")
+
+
+def test_writes_every_chunk_and_reports_progress():
+    service = FakeService()
+    _, progress = run(service, {"AAA": chunks(5), "BBB": chunks(3)})
+    assert progress["AAA"].chunks_done == 5 and progress["AAA"].rows == 15
+    assert progress["BBB"].chunks_done == 3 and progress["BBB"].rows == 9
+    assert len(service.stored) == 8
+
+
+def test_failed_fetches_are_counted_and_not_marked_checked():
+    service = FakeService(fail={"BAD"})
+    _, progress = run(service, {"BAD": chunks(2), "AAA": chunks(2)})
+    assert progress["BAD"].errors == 2 and progress["BAD"].rows == 0
+    assert {ticker for ticker, _, _ in service.checked} == {"AAA"}
+
+
+def test_empty_closed_chunks_are_marked_checked():
+    service = FakeService(empty={"NEW"})
+    run(service, {"NEW": chunks(2), "AAA": chunks(1)})
+    assert len(service.checked) == 3
+    # Only chunks that wrote rows are logged for HistoryCache
+    assert [ticker for ticker, _, _ in service.repaired] == ["AAA"]
+
+
+def test_recent_chunks_are_not_marked_checked():
+    service = FakeService()
+    now = datetime.now(timezone.utc)
+    run(service, {"AAA": [(now - timedelta(minutes=5), now)]})
+    assert service.checked == []
+
+
+def test_fetch_worker_exception_is_reported():
+    service = FakeService()
+    backfill = ConcurrentBackfill(service, workers=2, limiter=Unlimited())
+    fetch = backfill._fetch
+
+    def buggy(*args):
+        fetch(*args)
+        raise RuntimeError("worker bug")
+
+    backfill._fetch = buggy
+    progress = backfill.run({"AAA": chunks(2)}, "1d")
+    assert progress["AAA"].errors == 2 and progress["AAA"].rows == 6
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_writer_raises_instead_of_hanging():
+    service = FakeService()
+    backfill = ConcurrentBackfill(service, workers=4, queue_size=1, limiter=Unlimited())
+
+    def die(*args):
+        raise SystemExit("writer gone")
+
+    backfill._write = die
+    with pytest.raises(RuntimeError, match="writer stopped"):
+        backfill.run({"AAA": chunks(10)}, "1d")
+
+
+def test_nothing_to_download():
+    assert run(FakeService(), {"AAA": []})[1] == {}
@@ -0,0 +1,65 @@
+import numpy as np
+
+from processors.bar_batch import BarBatch
+
+# 2024-01-01T00:00:00Z
+T0_MS = 1704067200000
+
+
+def kline(i, close):
+    open_ms = T0_MS + i * 60_000
+    return [open_ms, "100.10", "101.5", "99.25", close, "12.000", open_ms + 59_999, "1234.5", 42, "6.0", "600.0", "0"]
+
+
+def test_from_klines_parses_columns():
+    batch = BarBatch.from_klines("BTCUSDT", [kline(0, "100.5"), kline(1, "0.00000123")], "1m")
+
+    assert (batch.ticker, batch.provider, batch.interval) == ("BTCUSDT", "binance", "1m")
+    assert batch.ts.dtype == np.int64
+    np.testing.assert_array_equal(batch.ts, [T0_MS * 1000, (T0_MS + 60_000) * 1000])
+    np.testing.assert_array_equal(batch.open, [100.10, 100.10])
+    np.testing.assert_array_equal(batch.close, [100.5, 0.00000123])
+    np.testing.assert_array_equal(batch.volume, [12.0, 12.0])
+
+
+def test_from_klines_empty():
+    batch = BarBatch.from_klines("BTCUSDT", [], "1m")
+    assert len(batch) == 0 and batch.ts.dtype == np.int64
+
+
+def test_slices_and_records_round_trip():
+    batch = BarBatch.from_klines("BTCUSDT", [kline(i, str(100 + i)) for i in range(5)], "1m")
+    part = batch[1:3]
+    assert len(part) == 2 and part.ticker == "BTCUSDT"
+    assert part.to_records() == [
+        {"timestamp": T0_MS + 60_000, "open": 100.1, "high": 101.5, "low": 99.25, "close": 101.0, "volume": 12.0},
+        {"timestamp": T0_MS + 120_000, "open": 100.1, "high": 101.5, "low": 99.25, "close": 102.0, "volume": 12.0},
+    ]
+
+
+def test_from_tiingo_parses_dates_as_utc_microseconds():
+    records = [
+        {"date": "2024-01-02T00:00:00.000Z", "open": 10, "high": 12, "low": 9, "close": 11, "volume": 1000},
+        {"date": "2024-01-03T00:00:00+00:00", "open": 11, "high": 13, "low": 10, "close": 12.5, "volume": 0},
+    ]
+    batch = BarBatch.from_tiingo("AAPL", records)
+
+    assert (batch.provider, batch.interval) == ("tiingo", "1d")
+    np.testing.assert_array_equal(batch.ts, [(T0_MS + 86_400_000) * 1000, (T0_MS + 2 * 86_400_000) * 1000])
+    np.testing.assert_array_equal(batch.close, [11.0, 12.5])
+    np.testing.assert_array_equal(batch.volume, [1000.0, 0.0])
+
+
+def test_from_tiingo_drops_records_missing_a_price():
+    records = [
+        {"date": "2024-01-02", "open": 10, "high": 12, "low": 9, "close": 11, "volume": 1000},
+        {"date": "2024-01-03", "open": None, "high": 13, "low": 10, "close": 12, "volume": 5},
+        {"date": "2024-01-04", "high": 13, "low": 10, "close": 12, "volume": 5},
+        {"date": "2024-01-05", "open": 0.0, "high": 1, "low": 0.0, "close": 0.5},
+    ]
+    batch = BarBatch.from_tiingo("AAPL", records)
+
+    assert len(batch) == 2
+    np.testing.assert_array_equal(batch.open, [10.0, 0.0])  # a real zero price is kept
+    assert batch.volume[0] == 1000.0 and np.isnan(batch.volume[1])
+    np.testing.assert_array_equal(batch.ts // 86_400_000_000, [19724, 19727])
@@ -0,0 +1,287 @@
+import base64
+import hashlib
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ingestion import binance_stream
+from ingestion.binance_stream import BinanceStream
+from ingestion.service import IngestionService
+from utils.config import Config
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+class FakeWebSocketServer:
+    """
+    Minimal RFC 6455 server on localhost: records every frame a client sends
+    and lets the test push text/ping frames or drop the connection.
+    """
+    def __init__(self):
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.url = f"ws://127.0.0.1:{self.sock.getsockname()[1]}/stream"
+        self.frames = queue.Queue()  # (connection number, opcode, payload)
+        self.clients = []
+        self.closed = False
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while not self.closed:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.clients.append(conn)
+            threading.Thread(target=self._serve, args=(conn, len(self.clients)), daemon=True).start()
+
+    def _serve(self, conn, number):
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                request += conn.recv(4096)
+            key = next(line.split(":", 1)[1].strip() for line in request.decode().split("\r\n")
+                       if line.lower().startswith("sec-websocket-key"))
+            accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+            conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+            while True:
+                opcode, payload = self._read_frame(conn)
+                self.frames.put((number, opcode, payload))
+                if opcode == OP_CLOSE:
+                    self._send(conn, OP_CLOSE, payload)
+                    return
+        except (OSError, ConnectionError, StopIteration):
+            pass
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _read_exact(conn, n):
+        data = b""
+        while len(data) < n:
+            chunk = conn.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("client went away")
+            data += chunk
+        return data
+
+    def _read_frame(self, conn):
+        first, second = self._read_exact(conn, 2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self._read_exact(conn, 2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self._read_exact(conn, 8))[0]
+        mask = self._read_exact(conn, 4) if second & 0x80 else b"\0\0\0\0"
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._read_exact(conn, length)))
+        return first & 0x0F, payload
+
+    @staticmethod
+    def _send(conn, opcode, payload: bytes):
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        else:
+            header += bytes([126]) + struct.pack(">H", len(payload))
+        conn.sendall(header + payload)
+
+    def send(self, message: dict):
+        self._send(self.clients[-1], OP_TEXT, json.dumps(message).encode())
+
+    def ping(self, payload: bytes):
+        self._send(self.clients[-1], OP_PING, payload)
+
+    def drop(self):
+        """Closes the current connection without a close handshake."""
+        self.clients[-1].shutdown(socket.SHUT_RDWR)
+
+    def next_frame(self, opcode, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            number, op, payload = self.frames.get(timeout=max(deadline - time.monotonic(), 0.01))
+            if op == opcode:
+                return number, payload
+
+    def wait_clients(self, n, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.clients) < n:
+            assert time.monotonic() < deadline, f"expected {n} connections, got {len(self.clients)}"
+            time.sleep(0.01)
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+        for conn in self.clients:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+
+@pytest.fixture
+def server():
+    server = FakeWebSocketServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def run_stream():
+    """Runs a BinanceStream in a background thread and stops it at teardown."""
+    started = []
+
+    def run(stream):
+        thread = threading.Thread(target=stream.run, daemon=True)
+        thread.start()
+        started.append((stream, thread))
+        return stream
+
+    yield run
+    for stream, thread in started:
+        stream.stop()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+
+
+def kline_event(symbol="BTCUSDT", closed=True):
+    return {"stream": f"{symbol.lower()}@kline_1m", "data": {
+        "e": "kline", "E": 1704067260000, "s": symbol,
+        "k": {"t": 1704067200000, "T": 1704067259999, "o": "100.0", "h": "101.0", "l": "99.0", "c": "100.5",
+              "v": "12.5", "x": closed},
+    }}
+
+
+def test_subscribes_in_paced_batches(server, run_stream, monkeypatch):
+    monkeypatch.setattr(binance_stream, "SUBSCRIBE_BATCH", 2)
+    monkeypatch.setattr(binance_stream, "SUBSCRIBE_PAUSE", 0)
+    tickers = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+    run_stream(BinanceStream(tickers, interval="1m", streams=["kline"], url=server.url))
+
+    requests = [json.loads(server.next_frame(OP_TEXT)[1]) for _ in range(3)]
+    assert [r["method"] for r in requests] == ["SUBSCRIBE"] * 3
+    assert [r["id"] for r in requests] == [1, 2, 3]
+    assert [r["params"] for r in requests] == [
+        ["aaa@kline_1m", "bbb@kline_1m"], ["ccc@kline_1m", "ddd@kline_1m"], ["eee@kline_1m"]]
+
+
+def test_dispatches_klines_and_trades(server, run_stream):
+    klines, trades = queue.Queue(), queue.Queue()
+    run_stream(BinanceStream(["BTCUSDT"], interval="1m", url=server.url,
+                             on_kline=lambda *args: klines.put(args), on_trade=lambda *args: trades.put(args)))
+    server.next_frame(OP_TEXT)
+
+    server.send(kline_event())
+    server.send({"data": {"e": "trade", "E": 1704067260001, "s": "BTCUSDT", "p": "100.25", "q": "0.5",
+                          "T": 1704067260000}})
+    ticker, bar, event_ms = klines.get(timeout=5)
+    assert (ticker, event_ms) == ("BTCUSDT", 1704067260000)
+    assert bar["close"] == 100.5 and bar["volume"] == 12.5 and bar["closed"]
+    assert trades.get(timeout=5) == ("BTCUSDT", 100.25, 0.5, 1704067260000, 1704067260001)
+
+
+def test_answers_server_ping(server, run_stream):
+    run_stream(BinanceStream(["BTCUSDT"], url=server.url, heartbeat=5))
+    server.next_frame(OP_TEXT)
+
+    server.ping(b"keepalive")
+    assert server.next_frame(OP_PONG)[1] == b"keepalive"
+
+
+def test_pings_when_idle_and_reconnects_without_pong(server, run_stream, monkeypatch):
+    monkeypatch.setattr(binance_stream, "RECONNECT_BACKOFF", 0.05)
+    # The fake server never answers pings, so the second silent window drops the connection
+    stream = run_stream(BinanceStream(["BTCUSDT"], url=server.url, heartbeat=0.2))
+
+    assert server.next_frame(OP_PING)[0] == 1
+    server.wait_clients(2)
+    assert server.next_frame(OP_TEXT)[0] == 2  # resubscribed on the new connection
+    assert stream.reconnects >= 1
+
+
+def test_reconnects_with_exponential_backoff(run_stream, monkeypatch):
+    monkeypatch.setattr(binance_stream, "RECONNECT_BACKOFF", 0.05)
+    monkeypatch.setattr(Config, "BINANCE_WS_MAX_BACKOFF", 0.2)
+    # A bound socket that never listens: every connection attempt is refused
+    refusing = socket.socket()
+    refusing.bind(("127.0.0.1", 0))
+    waits = []
+    stream = BinanceStream(["BTCUSDT"], url=f"ws://127.0.0.1:{refusing.getsockname()[1]}/stream", heartbeat=5)
+    original_wait = stream.stop_event.wait
+    stream.stop_event.wait = lambda timeout=None: waits.append(timeout) or original_wait(timeout)
+
+    run_stream(stream)
+    deadline = time.monotonic() + 5
+    while len(waits) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    refusing.close()
+    assert waits[:5] == [0.05, 0.1, 0.2, 0.2, 0.2]
+
+
+def test_reports_outage_window_on_reconnect(server, run_stream, monkeypatch):
+    monkeypatch.setattr(binance_stream, "RECONNECT_BACKOFF", 0.05)
+    connects = queue.Queue()
+    run_stream(BinanceStream(["BTCUSDT"], url=server.url, heartbeat=5,
+                             on_connect=lambda down_since, connected_at: connects.put((down_since, connected_at))))
+
+    down_since, first = connects.get(timeout=5)
+    assert down_since is None
+    server.next_frame(OP_TEXT)
+    server.drop()
+
+    down_since, second = connects.get(timeout=5)
+    assert first < down_since <= second
+    assert server.next_frame(OP_TEXT)[0] == 2
+
+
+class GapService(IngestionService):
+    """IngestionService without a database: the planner sees the whole window as missing."""
+    def __init__(self, tickers):
+        self.tickers = tickers
+        self.source = "binance"
+        self.db = self
+        self.stop_event = threading.Event()
+        self.gap_lock = threading.Lock()
+        self.stored = []
+
+    def get_missing_ranges(self, ticker, interval, start, end, step, tolerance):
+        return [(start, end)]
+
+    def get_checked_ranges(self, ticker, provider, interval, start, end):
+        return []
+
+    def is_cached(self, ticker, interval, start, end):
+        return True
+
+    def fetch_range(self, ticker, interval, start, end):
+        return [(ticker, start, end)]
+
+    def store(self, ticker, interval, history):
+        self.stored.extend(history)
+        return len(history)
+
+
+def test_fill_stream_gap_stops_at_the_open_bar():
+    service = GapService(["BTCUSDT", "ETHUSDT"])
+    start = datetime(2024, 1, 1, 0, 0, 30, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 1, 0, 5, 10, tzinfo=timezone.utc)
+
+    service.fill_stream_gap(start, end, "1m")
+
+    # The bar that was closing when the connection dropped is included; the
+    # bar open at reconnect is left to the stream
+    window = (start.replace(second=0), end.replace(second=0))
+    assert sorted(service.stored) == [("BTCUSDT", *window), ("ETHUSDT", *window)]
+
+
+def test_fill_stream_gap_skips_windows_inside_one_bar():
+    service = GapService(["BTCUSDT"])
+    start = datetime(2024, 1, 1, 0, 0, 5, tzinfo=timezone.utc)
+    service.fill_stream_gap(start, start + timedelta(seconds=20), "1m")
+    assert service.stored == []
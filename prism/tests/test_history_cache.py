@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from storage.history_cache import HistoryCache
+from storage.timescale_handler import BAR_DTYPE
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+MINUTE = timedelta(minutes=1)
+
+
+def minutes(*offsets):
+    return [T0 + i * MINUTE for i in offsets]
+
+
+class FakeDB:
+    def __init__(self, timestamps):
+        self.timestamps = sorted(timestamps)
+        self.repairs = []
+        self.retention = None
+        self.counted = []
+
+    def repair(self, start, end, timestamps):
+        self.timestamps = sorted(set(self.timestamps) | set(timestamps))
+        self.repairs.append((len(self.repairs) + 1, start, end))
+
+    def get_repairs(self, ticker, interval=None, after=0):
+        return [r for r in self.repairs if r[0] > after]
+
+    def retention_window(self):
+        return self.retention
+
+    def count_range(self, ticker, start=None, end=None, interval=None):
+        self.counted.append((start, end))
+        return sum(1 for ts in self.timestamps if start <= ts < end)
+
+    def iter_range(self, ticker, start=None, interval=None):
+        rows = [ts for ts in self.timestamps if start is None or ts >= start]
+        if rows:
+            chunk = np.zeros(len(rows), dtype=BAR_DTYPE)
+            chunk["ts"] = [np.datetime64(ts.replace(tzinfo=None), "us") for ts in rows]
+            chunk["close"] = [(ts - T0) / MINUTE for ts in rows]
+            yield chunk
+
+
+@pytest.fixture
+def cache(tmp_path):
+    def make(db):
+        return HistoryCache(db=db, directory=str(tmp_path))
+    return make
+
+
+def cached_minutes(cache):
+    return [int(v) for v in cache.load("BTCUSDT", "1m", sync=False)["close"]]
+
+
+def test_loads_without_counting_when_nothing_was_repaired(cache):
+    db = FakeDB(minutes(0, 1, 2))
+    history = cache(db)
+    assert history.sync("BTCUSDT", "1m") == 3
+    db.timestamps += minutes(3)
+    assert history.sync("BTCUSDT", "1m") == 1
+    assert history.sync("BTCUSDT", "1m") == 0
+    assert db.counted == []
+    assert cached_minutes(history) == [0, 1, 2, 3]
+
+
+def test_backfilled_gap_resyncs_from_the_repaired_range(cache):
+    db = FakeDB(minutes(0, 1, 4, 5, 6))
+    history = cache(db)
+    history.sync("BTCUSDT", "1m")
+
+    db.repair(T0 + 2 * MINUTE, T0 + 4 * MINUTE, minutes(2, 3))
+    assert history.sync("BTCUSDT", "1m") == 5  # minutes 2..6 re-read, 0..1 kept
+    assert cached_minutes(history) == [0, 1, 2, 3, 4, 5, 6]
+    assert db.counted == [(T0 + 2 * MINUTE, T0 + 4 * MINUTE)]
+
+    # The repair is only checked once
+    history.sync("BTCUSDT", "1m")
+    assert len(db.counted) == 1
+
+
+def test_repairs_already_cached_or_after_the_watermark_keep_the_cache(cache):
+    db = FakeDB(minutes(0, 1, 2))
+    db.repair(T0, T0 + 3 * MINUTE, [])
+    history = cache(db)
+    history.sync("BTCUSDT", "1m")
+    assert db.counted == []  # first sync reads the repaired rows anyway
+
+    db.repair(T0 + MINUTE, T0 + 2 * MINUTE, [])
+    db.repair(T0 + 10 * MINUTE, T0 + 12 * MINUTE, minutes(10, 11))
+    assert history.sync("BTCUSDT", "1m") == 2
+    assert db.counted == [(T0 + MINUTE, T0 + 2 * MINUTE)]
+    assert cached_minutes(history) == [0, 1, 2, 10, 11]
+
+
+def test_retention_never_invalidates_the_cache(cache, monkeypatch):
+    now = datetime.now(timezone.utc)
+    old = [now - timedelta(days=10) + i * MINUTE for i in range(3)]
+    recent = [now - timedelta(days=1) + i * MINUTE for i in range(3)]
+    db = FakeDB(old + recent)
+    history = cache(db)
+    history.sync("BTCUSDT", "1m")
+
+    # Retention drops the old rows, then a repair overlapping them lands
+    db.retention = timedelta(days=5)
+    db.timestamps = list(recent)
+    db.repair(old[0], recent[-1] + MINUTE, [])
+
+    assert history.sync("BTCUSDT", "1m") == 0
+    assert len(history.load("BTCUSDT", "1m", sync=False)["ts"]) == 6
+    # Only the part of the repair inside the retention window is counted
+    (start, end), = db.counted
+    assert start > old[-1] and end == recent[-1] + timedelta(microseconds=1)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from algorithms.indicators import ATR, EMA, SMA, RollingMax, RollingMin, RollingVariance
+
+
+@pytest.fixture
+def prices():
+    # Trending random walk far from zero: hard case for running sums
+    rng = np.random.default_rng(7)
+    return 50_000 + np.cumsum(rng.normal(0, 5, 3000)) + np.linspace(0, 20_000, 3000)
+
+
+def split_updates(indicator, xs):
+    """Feeds xs through a mix of update_many and update calls."""
+    out = [indicator.update_many(xs[:700])]
+    out.append([np.nan if v is None else v for v in (indicator.update(x) for x in xs[700:710])])
+    out.append(indicator.update_many(xs[710:]))
+    return np.concatenate(out)
+
+
+@pytest.mark.parametrize("window", [1, 5, 50])
+def test_sma_matches_pandas(prices, window):
+    expected = pd.Series(prices).rolling(window).mean().to_numpy()
+    np.testing.assert_allclose(split_updates(SMA(window), prices), expected, rtol=1e-10)
+
+
+@pytest.mark.parametrize("span", [1, 2, 10, 200])
+def test_ema_matches_pandas(prices, span):
+    expected = pd.Series(prices).ewm(span=span, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(split_updates(EMA(span=span), prices), expected, rtol=1e-10)
+
+
+def test_ema_alpha_one_returns_input(prices):
+    ema = EMA(alpha=1.0)
+    out = ema.update_many(prices)
+    np.testing.assert_array_equal(out, prices)
+    assert ema.value == prices[-1]
+    expected = pd.Series(prices).ewm(alpha=1.0, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(out, expected)
+
+
+@pytest.mark.parametrize("window,ddof", [(2, 1), (20, 1), (20, 0), (300, 1)])
+def test_rolling_variance_matches_pandas(prices, window, ddof):
+    out = split_updates(RollingVariance(window, ddof=ddof), prices)
+    # pandas keeps running sums too; its own error is ~1e-5 here
+    expected = pd.Series(prices).rolling(window).var(ddof=ddof).to_numpy()
+    np.testing.assert_allclose(out, expected, rtol=1e-6, atol=1e-4)
+
+    exact = np.array([prices[i - window + 1:i + 1].var(ddof=ddof) for i in range(window - 1, len(prices))])
+    batch = RollingVariance(window, ddof=ddof).update_many(prices)
+    np.testing.assert_allclose(batch[window - 1:], exact, rtol=1e-9, atol=1e-6)
+
+
+def test_rolling_variance_of_constant_series_is_zero():
+    out = RollingVariance(10).update_many(np.full(100, 123456.789))
+    assert np.all(out[9:] == 0.0)
+
+
+@pytest.mark.parametrize("window", [1, 3, 64])
+def test_rolling_extremes_match_pandas(prices, window):
+    series = pd.Series(prices)
+    np.testing.assert_array_equal(split_updates(RollingMax(window), prices), series.rolling(window).max())
+    np.testing.assert_array_equal(split_updates(RollingMin(window), prices), series.rolling(window).min())
+
+
+def test_atr_window_one_is_true_range(prices):
+    highs, lows, closes = prices + 10, prices - 10, prices
+    out = ATR(window=1).update_many(highs, lows, closes)
+    prev = np.concatenate(([np.nan], closes[:-1]))
+    true_range = np.fmax(highs - lows, np.fmax(np.abs(highs - prev), np.abs(lows - prev)))
+    np.testing.assert_allclose(out, true_range)
+
+
+def test_atr_matches_wilder_smoothing(prices):
+    highs, lows, closes = prices + 10, prices - 12, prices
+    window = 14
+    prev = pd.Series(closes).shift()
+    true_range = pd.concat([pd.Series(highs - lows), (highs - prev).abs(), (lows - prev).abs()], axis=1).max(axis=1)
+    seeded = true_range.copy()
+    seeded[:window - 1] = np.nan
+    seeded[window - 1] = true_range[:window].mean()
+    seeded[window:] = true_range[window:]
+    expected = seeded.ewm(alpha=1 / window, adjust=False, ignore_na=True).mean().to_numpy().copy()
+    expected[:window - 1] = np.nan
+
+    atr = ATR(window)
+    out = np.concatenate([atr.update_many(highs[:1000], lows[:1000], closes[:1000]),
+                          atr.update_many(highs[1000:], lows[1000:], closes[1000:])])
+    np.testing.assert_allclose(out, expected, rtol=1e-9)
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+from storage import timescale_handler
+from storage.connection_pool import SharedPool
+from storage.timescale_handler import TimescaleHandler
+from utils.config import Config
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+INSTRUMENTS = [
+    (1, "BTCUSDT", "binance", "1m"),
+    (2, "BTCUSDT", "binance", "tick"),
+    (3, "ETHUSDT", "binance", "1m"),
+]
+
+
+class FakeCursor:
+    def __init__(self, queries):
+        self.queries = queries
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.queries.append((" ".join(query.split()), params))
+        if "FROM instruments" in query:
+            self.rows = [row for row in INSTRUMENTS if row[1] in params[0]]
+        else:
+            ids, since = params[0], params[1]
+            self.rows = [(T0, instrument, 1.0, 2.0, 0.5, 1.5, 10.0) for instrument, ts in zip(ids, since) if ts < T0]
+
+    def fetchall(self):
+        return self.rows
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(timescale_handler.time, "monotonic", clock.monotonic)
+    return clock
+
+
+@pytest.fixture
+def db():
+    handler = TimescaleHandler.__new__(TimescaleHandler)
+    handler.pool = SharedPool({}, 1, 1)
+    handler.queries = []
+
+    @contextmanager
+    def cursor():
+        yield FakeCursor(handler.queries)
+
+    handler.cursor = cursor
+    return handler
+
+
+def instrument_queries(db):
+    return [params for query, params in db.queries if "FROM instruments" in query]
+
+
+def test_resolves_all_tickers_in_one_query(db, clock):
+    watermarks = {"BTCUSDT": datetime(2023, 12, 31, tzinfo=timezone.utc), "ETHUSDT": T0, "NEWCOIN": T0}
+
+    bars = db.get_bars_since(watermarks)
+
+    assert instrument_queries(db) == [(["BTCUSDT", "ETHUSDT", "NEWCOIN"],)]
+    market_query = db.queries[-1][1]
+    assert market_query[0] == [1, 3]  # tick series excluded, NEWCOIN has no instrument
+    assert [(bar["ticker"], bar["interval"]) for bar in bars] == [("BTCUSDT", "1m")]
+
+
+def test_unknown_tickers_are_cached_for_the_ttl(db, clock, monkeypatch):
+    monkeypatch.setattr(Config, "INSTRUMENT_CACHE_TTL", 60)
+    watermarks = {"BTCUSDT": T0, "NEWCOIN": T0}
+
+    db.get_bars_since(watermarks)
+    clock.now += 30
+    db.get_bars_since(watermarks)
+    assert len(instrument_queries(db)) == 1
+
+    clock.now += 31
+    db.get_bars_since(watermarks)
+    assert instrument_queries(db)[-1] == (["BTCUSDT", "NEWCOIN"],)
+
+
+def test_only_stale_tickers_are_reloaded(db, clock, monkeypatch):
+    monkeypatch.setattr(Config, "INSTRUMENT_CACHE_TTL", 60)
+    db.instrument_ids("BTCUSDT")
+    clock.now += 61
+    db.instrument_ids("ETHUSDT")
+
+    assert db.instrument_ids_many(["BTCUSDT", "ETHUSDT"]) == {"BTCUSDT": [1], "ETHUSDT": [3]}
+    assert instrument_queries(db) == [(["BTCUSDT"],), (["ETHUSDT"],), (["BTCUSDT"],)]
+    assert db.instrument_ids("BTCUSDT", "tick") == [2]
@@ -0,0 +1,34 @@
+from storage.timescale_handler import TimescaleHandler
+
+
+class FakeCursor:
+    def __init__(self, legacy_columns):
+        self.legacy_columns = legacy_columns
+        self.queries = []
+        self.rowcount = 0
+        self.row = None
+
+    def execute(self, query, params=None):
+        query = " ".join(query.split())
+        self.queries.append(query)
+        if "information_schema.columns" in query:
+            self.row = (1,) if "'adjusted'" in query and "adjusted" in self.legacy_columns else None
+
+    def fetchone(self):
+        return self.row
+
+
+def migrate(legacy_columns):
+    cur = FakeCursor(legacy_columns)
+    TimescaleHandler.__new__(TimescaleHandler)._migrate_legacy_market(cur)
+    return next(q for q in cur.queries if q.startswith("INSERT INTO market "))
+
+
+def test_migration_keeps_the_adjusted_close():
+    query = migrate({"ticker", "provider", "interval", "adjusted"})
+    assert "volume, adjusted)" in query
+    assert "l.volume, l.adjusted FROM market_legacy" in query
+
+
+def test_migration_without_adjusted_column_writes_null():
+    assert "l.volume, NULL FROM market_legacy" in migrate({"ticker", "provider", "interval"})
@@ -0,0 +1,63 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from storage.write_buffer import WriteBuffer
+from strategies.trend_following import TrendFollowing
+from utils import metrics
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeDB:
+    def __init__(self):
+        self.rows = []
+
+    def write_rows(self, rows, label=None):
+        self.rows.extend(rows)
+        return len(rows)
+
+
+def test_write_buffer_reports_from_the_registry():
+    db = FakeDB()
+    flushed = metrics.counter("write_buffer.rows_flushed").value
+    flushes = metrics.histogram("write_buffer.flush_ms").count
+
+    writer = WriteBuffer(db, max_rows=2, max_delay=0.05).start()
+    for i in range(5):
+        writer.put_tick("BTCUSDT", 100.0 + i, T0 + timedelta(seconds=i), source="binance")
+    writer.close()
+
+    assert len(db.rows) == 5
+    summary = writer.metrics()
+    assert summary["rows_flushed"] - flushed == 5
+    assert summary["flushes"] - flushes >= 3
+    assert summary["rows_flushed"] == metrics.counter("write_buffer.rows_flushed").value
+    assert summary["queue_depth"] == 0
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_trend_following_does_not_log_position_changes_at_info():
+    strategy = TrendFollowing("BTCUSDT", window=2)
+    signals = []
+    strategy.sink = signals.append
+    # The prism loggers do not propagate to the root logger (caplog)
+    logger = logging.getLogger("prism.strategy")
+    handler = ListHandler()
+    handler.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    try:
+        for i, price in enumerate([100, 101, 102, 99, 98, 103, 104, 97]):
+            strategy.on_tick(price, T0 + timedelta(minutes=i))
+    finally:
+        logger.removeHandler(handler)
+
+    assert len(signals) >= 3
+    assert [r for r in handler.records if r.levelno >= logging.INFO] == []
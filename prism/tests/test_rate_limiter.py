@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    """Replaces time.monotonic/time.sleep in the limiter: sleeping advances the clock."""
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limiter.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_full_bucket_does_not_wait(clock):
+    limiter = RateLimiter(10, 60)
+    for _ in range(10):
+        limiter.acquire()
+    assert clock.slept == []
+
+
+def test_empty_bucket_waits_for_refill(clock):
+    limiter = RateLimiter(60, 60)  # 1 unit per second
+    limiter.acquire(60)
+    limiter.acquire(3)
+    assert sum(clock.slept) == pytest.approx(3.0)
+
+
+def test_refill_is_capped_at_capacity(clock):
+    limiter = RateLimiter(10, 10)
+    limiter.acquire(10)
+    clock.now += 1000
+    limiter.acquire(10)
+    limiter.acquire(1)
+    assert sum(clock.slept) == pytest.approx(1.0)
+
+
+def test_heavier_than_capacity_is_clamped(clock):
+    limiter = RateLimiter(5, 5)
+    limiter.acquire(50)
+    assert clock.slept == []
+    assert limiter.tokens == pytest.approx(0.0)
+
+
+def test_shared_between_threads():
+    limiter = RateLimiter(1000, 1)
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(100)]) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert limiter.tokens <= 1000 - 500 + limiter.rate * 1.0
+
+
+def test_for_provider_budgets():
+    assert RateLimiter.for_provider("binance").period == 60.0
+    assert RateLimiter.for_provider("tiingo").period == 3600.0
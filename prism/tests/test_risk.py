@@ -0,0 +1,127 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from engine.risk import RiskEngine
+from strategies.signals import Signal
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def signal(side, price=100.0, model="trend", ticker="BTCUSDT"):
+    return Signal(T0, model, ticker, side, price=price)
+
+
+def engine(**limits):
+    params = dict(order_notional=1000, max_notional=0, max_position=0, max_order_rate=0)
+    params.update(limits)
+    return RiskEngine(**params)
+
+
+def test_sizes_the_order_that_reaches_the_target_position():
+    risk = engine()
+    order, check = risk.check_signal(signal("LONG"))
+    assert (order.side, order.quantity, order.strategy) == ("BUY", 10.0, "trend")
+    assert check.result == "PASS"
+    assert risk.exposure["BTCUSDT"] == 10.0
+
+    # The open order already covers the target: nothing to trade
+    assert risk.check_signal(signal("LONG")) == (None, None)
+
+    order, _ = risk.check_signal(signal("SHORT"))
+    assert (order.side, order.quantity) == ("SELL", 20.0)
+
+
+def test_rejects_a_signal_without_a_price():
+    order, check = engine().check_signal(signal("LONG", price=None))
+    assert order is None and (check.check_name, check.result) == ("price", "REJECT")
+
+
+def test_position_limit_only_stops_orders_that_increase_it():
+    risk = engine(max_position=5)
+    order, check = risk.check_signal(signal("LONG"))
+    assert order is None and check.check_name == "max_position"
+
+    # A position above the limit (e.g. rebuilt from fills) can still be closed
+    risk.positions[("trend", "BTCUSDT")] = 10.0
+    risk.exposure["BTCUSDT"] = 10.0
+    order, check = risk.check_signal(signal("FLAT"))
+    assert (order.side, order.quantity, check.result) == ("SELL", 10.0, "PASS")
+
+
+def test_notional_limit_is_shared_across_strategies():
+    risk = engine(max_notional=1500)
+    assert risk.check_signal(signal("LONG", model="a"))[0] is not None
+    order, check = risk.check_signal(signal("LONG", model="b"))
+    assert order is None and check.check_name == "max_notional"
+    assert check.exposure == pytest.approx(2000.0)
+
+    # Reducing the combined exposure passes
+    assert risk.check_signal(signal("SHORT", model="b"))[1].result == "PASS"
+
+
+def test_order_rate_is_per_strategy_and_ticker():
+    risk = engine(max_order_rate=2)
+    assert risk.check_signal(signal("LONG"))[0] is not None
+    assert risk.check_signal(signal("SHORT"))[0] is not None
+    order, check = risk.check_signal(signal("LONG"))
+    assert order is None and check.check_name == "order_rate"
+    assert risk.check_signal(signal("LONG", ticker="ETHUSDT"))[0] is not None
+
+
+def test_fill_and_status_events_move_pending_into_positions():
+    risk = engine()
+    order, _ = risk.check_signal(signal("LONG"))
+    key = ("trend", "BTCUSDT")
+
+    risk.on_event({"type": "fill", "order_id": order.id, "ticker": "BTCUSDT", "side": "BUY", "quantity": 4})
+    assert (risk.positions[key], risk.pending[key], risk.exposure["BTCUSDT"]) == (4.0, 6.0, 10.0)
+
+    risk.on_event({"type": "order", "id": order.id, "status": "PARTIAL"})
+    assert risk.pending[key] == 6.0
+    risk.on_event({"type": "order", "id": order.id, "status": "CANCELED"})
+    assert (risk.positions[key], risk.pending[key], risk.exposure["BTCUSDT"]) == (4.0, 0.0, 4.0)
+
+    # The next signal only tops up what was not filled
+    order, _ = risk.check_signal(signal("LONG"))
+    assert order.quantity == pytest.approx(6.0)
+
+    # Fills of orders placed elsewhere count under strategy ''; malformed events are ignored
+    risk.on_event({"type": "fill", "order_id": "manual", "ticker": "BTCUSDT", "side": "SELL", "quantity": 1})
+    risk.on_event({"type": "fill", "order_id": "manual"})
+    assert risk.positions[("", "BTCUSDT")] == -1.0
+
+
+class FakeListener:
+    """Replays (connection, events) batches, then stops the engine."""
+    def __init__(self, batches, stop_event):
+        self.batches = list(batches)
+        self.stop_event = stop_event
+        self.conn = "conn-1"
+
+    def wait(self, timeout, ticker=None):
+        if not self.batches:
+            self.stop_event.set()
+            return []
+        self.conn, events = self.batches.pop(0)
+        return events
+
+
+def test_follow_applies_events_and_rebuilds_after_a_reconnect():
+    risk = engine()
+    order, _ = risk.check_signal(signal("LONG"))
+    key = ("trend", "BTCUSDT")
+    fill = {"type": "fill", "order_id": order.id, "ticker": "BTCUSDT", "side": "BUY", "quantity": 4}
+    rebuilds = []
+    risk.rebuild = lambda: rebuilds.append(risk.positions[key])
+
+    risk.listener = FakeListener([
+        ("conn-1", [fill]),
+        (None, []),          # connection lost
+        ("conn-2", [fill]),  # reconnected: already part of the rebuild, not applied again
+        ("conn-2", [fill]),
+    ], risk.stop_event)
+    risk._follow()
+
+    assert rebuilds == [4.0]
+    assert risk.positions[key] == 8.0
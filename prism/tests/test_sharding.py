@@ -0,0 +1,40 @@
+from main import shard_tickers, worker_count
+
+TICKERS = [f"T{i:03d}USDT" for i in range(50)]
+
+
+def assignment(groups):
+    return {ticker: i for i, group in enumerate(groups) for ticker in group}
+
+
+def test_every_ticker_lands_in_exactly_one_group():
+    for policy in ("hash", "round_robin"):
+        groups = shard_tickers(TICKERS, 4, policy)
+        assert len(groups) == 4 and all(groups)
+        assert sorted(t for group in groups for t in group) == sorted(TICKERS)
+
+
+def test_round_robin_balances_group_sizes():
+    sizes = [len(group) for group in shard_tickers(TICKERS, 4, "round_robin")]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_hash_keeps_tickers_in_place_when_the_universe_changes():
+    before = assignment(shard_tickers(TICKERS, 4, "hash"))
+    after = assignment(shard_tickers(["NEWUSDT"] + TICKERS[5:] + ["ZZZUSDT"], 4, "hash"))
+    assert all(after[t] == before[t] for t in TICKERS[5:])
+    # Same result on every restart (no per-process hash seed)
+    assert assignment(shard_tickers(list(reversed(TICKERS)), 4, "hash")) == before
+
+
+def test_never_more_groups_than_tickers():
+    assert shard_tickers(["A", "B"], 8, "round_robin") == [["A"], ["B"]]
+    assert 1 <= len(shard_tickers(["A", "B"], 8, "hash")) <= 2
+    assert shard_tickers(TICKERS[:3], 0) == [TICKERS[:3]]
+
+
+def test_worker_count(monkeypatch):
+    monkeypatch.setattr("main.os.cpu_count", lambda: 6)
+    assert worker_count("auto") == 6
+    assert worker_count("3") == 3
+    assert worker_count("0") == 0
@@ -0,0 +1,88 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from utils.config import Config
+from utils.tick_bus import Subscription, TickBus
+
+
+def row(ticker, i):
+    return (i, ticker, float(i))
+
+
+def test_drop_oldest_keeps_the_newest_rows():
+    sub = Subscription("t_oldest", capacity=3, policy="drop_oldest")
+    before = sub.dropped.value
+    for i in range(5):
+        assert sub.offer(i) is True
+    assert sub.drain() == [2, 3, 4]
+    assert sub.dropped.value - before == 2
+
+
+def test_drop_newest_rejects_incoming_rows():
+    sub = Subscription("t_newest", capacity=3, policy="drop_newest")
+    before = sub.dropped.value
+    assert [sub.offer(i) for i in range(5)] == [True, True, True, False, False]
+    assert sub.drain() == [0, 1, 2]
+    assert sub.dropped.value - before == 2
+
+
+def test_block_with_explicit_timeout_raises_full():
+    sub = Subscription("t_block_full", capacity=2, policy="block")
+    before = sub.dropped.value
+    sub.put(0)
+    sub.put(1)
+    with pytest.raises(queue.Full):
+        sub.put(2, timeout=0.01)
+    assert sub.drain() == [0, 1]
+    assert sub.dropped.value == before
+
+
+def test_block_without_timeout_waits_at_most_the_configured_bound(monkeypatch):
+    monkeypatch.setattr(Config, "BUS_BLOCK_TIMEOUT", 0.05)
+    sub = Subscription("t_block_drop", capacity=2, policy="block")
+    before = sub.dropped.value
+    sub.offer(0)
+    sub.offer(1)
+
+    started = time.monotonic()
+    assert sub.offer(2) is False
+    assert time.monotonic() - started < 1.0
+    assert sub.dropped.value - before == 1
+    assert sub.qsize() == 2
+
+
+def test_block_resumes_when_the_subscriber_drains():
+    sub = Subscription("t_block_resume", capacity=1, policy="block")
+    sub.offer(0)
+    done = threading.Event()
+
+    def publish():
+        sub.put(1, timeout=5)
+        done.set()
+
+    thread = threading.Thread(target=publish)
+    thread.start()
+    assert not done.wait(0.05)
+    assert sub.drain() == [0]
+    assert done.wait(5)
+    thread.join()
+    assert sub.drain() == [1]
+
+
+def test_publish_routes_by_ticker_and_to_catch_all_subscribers():
+    bus = TickBus()
+    btc = bus.subscribe("t_btc", tickers=["BTCUSDT"])
+    every = bus.subscribe("t_all")
+    bus.publish(row("BTCUSDT", 0))
+    bus.publish(row("ETHUSDT", 1))
+
+    assert btc.drain() == [row("BTCUSDT", 0)]
+    assert every.drain() == [row("BTCUSDT", 0), row("ETHUSDT", 1)]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        Subscription("t_bad", policy="spill")
@@ -14,6 +14,9 @@ class Config:
     # El ticker o activo principal que vamos a operar/analizar
     TARGET_TICKER = os.getenv("TARGET_TICKER", "BTCUSDT")
     
+    # Universo de tickers (separados por coma); por defecto solo TARGET_TICKER
+    TICKERS = [t.strip() for t in os.getenv("TICKERS", TARGET_TICKER).split(",") if t.strip()]
+
     # 2. Data Source
     # Fuente de datos: 'binance' o 'tiingo'
     DATA_SOURCE = os.getenv("DATA_SOURCE", "binance").lower()
@@ -26,6 +29,17 @@ class Config:
     # Intervalo de velas para Binance (1m, 1h, 1d, etc.)
     # Recomendado 1m para máxima granularidad histórica
     KLINE_INTERVAL = os.getenv("KLINE_INTERVAL", "1m")
+
+    # Modo de ingesta en vivo para Binance: 'stream' (WebSocket) o 'poll' (REST cada 10s)
+    LIVE_MODE = os.getenv("LIVE_MODE", "stream").lower()
+    # Endpoint de streams combinados (se puede apuntar a un servidor falso local)
+    BINANCE_WS_URL = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443/stream")
+    # Streams a suscribir por ticker: 'kline', 'trade' o ambos separados por coma
+    BINANCE_WS_STREAMS = [s.strip() for s in os.getenv("BINANCE_WS_STREAMS", "kline").split(",") if s.strip()]
+    # Segundos sin mensajes antes de enviar un ping (y reconectar si tampoco hay respuesta)
+    BINANCE_WS_HEARTBEAT = float(os.getenv("BINANCE_WS_HEARTBEAT", 30))
+    # Espera maxima entre reconexiones (backoff exponencial)
+    BINANCE_WS_MAX_BACKOFF = float(os.getenv("BINANCE_WS_MAX_BACKOFF", 60))
     
     # 5. API Keys (Ya existentes)
     TIINGO_API_KEY = os.getenv("TIINGO_API_KEY")
@@ -38,12 +52,148 @@ class Config:
     DB_USER = os.getenv("DB_USER", "postgres")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
     DB_NAME = os.getenv("DB_NAME", "spectrum")
+    # Pool de conexiones compartido por todos los componentes del proceso
+    DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+    DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+    # Comprobar la conexion (SELECT 1) antes de entregarla si lleva inactiva mas de N segundos
+    DB_POOL_HEALTHCHECK = os.getenv("DB_POOL_HEALTHCHECK", "true").lower() == "true"
+    DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", 30))
+    # Reconexion con backoff exponencial
+    DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", 5))
+    DB_CONNECT_BACKOFF = float(os.getenv("DB_CONNECT_BACKOFF", 0.5))
+    DB_CONNECT_BACKOFF_MAX = float(os.getenv("DB_CONNECT_BACKOFF_MAX", 30))
+    # Segundos antes de releer los instrumentos de un ticker (otros procesos pueden registrar nuevos)
+    INSTRUMENT_CACHE_TTL = float(os.getenv("INSTRUMENT_CACHE_TTL", 60))
+
+    # Motor de estrategias: 'notify' (LISTEN/NOTIFY, con sondeo de respaldo) o 'poll'
+    ENGINE_MODE = os.getenv("ENGINE_MODE", "notify").lower()
+    # Segundos entre sondeos (o espera maxima de una notificacion)
+    ENGINE_POLL_INTERVAL = float(os.getenv("ENGINE_POLL_INTERVAL", 5))
+    # Cada cuantos ticks se imprime el resumen de latencia
+    ENGINE_LATENCY_REPORT_EVERY = int(os.getenv("ENGINE_LATENCY_REPORT_EVERY", 100))
+    # Antiguedad maxima (segundos) de una fila para despacharla a las estrategias
+    ENGINE_MAX_TICK_AGE = int(os.getenv("ENGINE_MAX_TICK_AGE", 3600))
+    # Maximo de barras leidas por ciclo en el motor multi-simbolo
+    ENGINE_MAX_BARS_PER_CYCLE = int(os.getenv("ENGINE_MAX_BARS_PER_CYCLE", 10000))
+    # Emitir NOTIFY en cada escritura de 'market'
+    MARKET_NOTIFY = os.getenv("MARKET_NOTIFY", "true").lower() == "true"
+
+    # Backtesting: comision por operacion (puntos basicos) y capital inicial
+    BACKTEST_FEE_BPS = float(os.getenv("BACKTEST_FEE_BPS", 10))
+    BACKTEST_INITIAL_CAPITAL = float(os.getenv("BACKTEST_INITIAL_CAPITAL", 10000))
+
+    # Barridos de parametros: procesos (0 = todos los nucleos) y directorio de memoria compartida
+    SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", 0))
+    SWEEP_SHM_DIR = os.getenv("SWEEP_SHM_DIR", "/dev/shm")
+
+    # Compresion nativa de 'market': activar y dias antes de comprimir un chunk
+    MARKET_COMPRESSION = os.getenv("MARKET_COMPRESSION", "true").lower() == "true"
+    MARKET_COMPRESS_AFTER_DAYS = int(os.getenv("MARKET_COMPRESS_AFTER_DAYS", 7))
+    # Retencion de datos crudos en dias (0 = sin retencion); los rollups conservan el historico
+    MARKET_RETENTION_DAYS = int(os.getenv("MARKET_RETENTION_DAYS", 0))
+
+    # Filas por lote al leer rangos con cursores del lado del servidor
+    HISTORY_ITERSIZE = int(os.getenv("HISTORY_ITERSIZE", 50000))
+
+    # Cache local columnar de historicos (memmap por ticker/intervalo)
+    HISTORY_CACHE_DIR = os.getenv("HISTORY_CACHE_DIR", os.path.expanduser("~/.cache/prism/history"))
+
+    # 6. Bulk Insert Tuning
+    # Metodo de insercion masiva: 'copy' (COPY FROM STDIN) o 'values' (execute_values)
+    BULK_INSERT_METHOD = os.getenv("BULK_INSERT_METHOD", "copy").lower()
+    # Formato COPY: 'text' o 'binary'
+    COPY_FORMAT = os.getenv("COPY_FORMAT", "text").lower()
+    # Filas por lote (cada lote es una transaccion independiente)
+    BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 5000))
+    # Reintentos por lote antes de caer a execute_values
+    COPY_MAX_RETRIES = int(os.getenv("COPY_MAX_RETRIES", 3))
+
+    # Buffer de escritura en vivo: se vacia al llegar a N filas o tras X segundos
+    WRITE_BUFFER_MAX_ROWS = int(os.getenv("WRITE_BUFFER_MAX_ROWS", 500))
+    WRITE_BUFFER_MAX_DELAY = float(os.getenv("WRITE_BUFFER_MAX_DELAY", 0.2))
+    # Capacidad maxima de la cola (si se llena, los productores esperan)
+    WRITE_BUFFER_CAPACITY = int(os.getenv("WRITE_BUFFER_CAPACITY", 10000))
+
+    # 7. Concurrent Backfill
+    # Hilos de descarga en paralelo (comparten un unico limitador de peticiones)
+    BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", 8))
+    # Chunks descargados pendientes de escribir en la BD (cola acotada)
+    BACKFILL_QUEUE_SIZE = int(os.getenv("BACKFILL_QUEUE_SIZE", 16))
+    # Presupuesto de peso por minuto para Binance (limite oficial 6000, dejamos margen)
+    BINANCE_WEIGHT_PER_MINUTE = int(os.getenv("BINANCE_WEIGHT_PER_MINUTE", 4800))
+    # Peticiones por hora para Tiingo
+    TIINGO_REQUESTS_PER_HOUR = int(os.getenv("TIINGO_REQUESTS_PER_HOUR", 500))
+
+    # Cliente Tiingo: URL base (permite un stub local), conexiones keep-alive,
+    # tickers por peticion multi-ticker IEX y timeout en segundos
+    TIINGO_BASE_URL = os.getenv("TIINGO_BASE_URL", "https://api.tiingo.com")
+    TIINGO_POOL_SIZE = int(os.getenv("TIINGO_POOL_SIZE", 10))
+    TIINGO_BATCH_SIZE = int(os.getenv("TIINGO_BATCH_SIZE", 100))
+    TIINGO_TIMEOUT = float(os.getenv("TIINGO_TIMEOUT", 10))
+
+    # Cache de respuestas historicas de proveedores: 'on', 'off' o 'replay' (solo cache, sin red)
+    PROVIDER_CACHE_MODE = os.getenv("PROVIDER_CACHE_MODE", "on").lower()
+    PROVIDER_CACHE_DIR = os.getenv("PROVIDER_CACHE_DIR", os.path.expanduser("~/.cache/prism/responses"))
+    PROVIDER_CACHE_MAX_MB = int(os.getenv("PROVIDER_CACHE_MAX_MB", 1024))
+
+    # Supervisor (main.py): procesos de ingesta y de estrategias ('auto' = uno por nucleo, 0 = ninguno)
+    INGEST_WORKERS = os.getenv("INGEST_WORKERS", "1").lower()
+    ENGINE_WORKERS = os.getenv("ENGINE_WORKERS", "0").lower()
+    # Reparto de tickers entre procesos: 'hash' (estable entre reinicios) o 'round_robin' (equilibrado)
+    SHARD_POLICY = os.getenv("SHARD_POLICY", "hash").lower()
+    # Espera antes de relanzar un proceso caido (backoff exponencial hasta el maximo)
+    WORKER_RESTART_BACKOFF = float(os.getenv("WORKER_RESTART_BACKOFF", 1))
+    WORKER_RESTART_BACKOFF_MAX = float(os.getenv("WORKER_RESTART_BACKOFF_MAX", 60))
+    # Segundos que se espera a que los procesos vacien sus buffers al apagar
+    SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", 30))
+
+    # Bus de ticks en memoria: cada worker de ingesta aloja tambien las estrategias de sus tickers
+    # y estas reciben las filas antes de escribirlas en la BD (ENGINE_WORKERS se ignora)
+    TICK_BUS = os.getenv("TICK_BUS", "false").lower() == "true"
+    # Capacidad del buffer circular de cada suscriptor y politica al llenarse:
+    # 'drop_oldest', 'drop_newest' o 'block' (estrategias / persistencia)
+    BUS_CAPACITY = int(os.getenv("BUS_CAPACITY", 10000))
+    BUS_POLICY = os.getenv("BUS_POLICY", "drop_oldest").lower()
+    # Persistencia (WRITE_BUFFER_CAPACITY filas): 'block' no pierde filas mientras la BD siga el ritmo
+    BUS_PERSIST_POLICY = os.getenv("BUS_PERSIST_POLICY", "block").lower()
+    # Espera maxima (s) de 'block' por fila; despues la fila se descarta y se cuenta en bus.<nombre>.dropped
+    BUS_BLOCK_TIMEOUT = float(os.getenv("BUS_BLOCK_TIMEOUT", 1.0))
+
+    # Escritura en lote de senales/riesgo/ordenes fuera del hilo del motor
+    SIGNAL_WRITER_ENABLED = os.getenv("SIGNAL_WRITER_ENABLED", "true").lower() == "true"
+    SIGNAL_WRITER_MAX_ROWS = int(os.getenv("SIGNAL_WRITER_MAX_ROWS", 500))
+    SIGNAL_WRITER_MAX_DELAY = float(os.getenv("SIGNAL_WRITER_MAX_DELAY", 0.5))
+    SIGNAL_WRITER_CAPACITY = int(os.getenv("SIGNAL_WRITER_CAPACITY", 10000))
+    # Reintentos de un lote fallido antes de descartarlo
+    SIGNAL_WRITER_RETRIES = int(os.getenv("SIGNAL_WRITER_RETRIES", 3))
+
+    # Riesgo pre-trade en memoria: cada senal se convierte en una orden y se valida contra los limites
+    RISK_ENABLED = os.getenv("RISK_ENABLED", "false").lower() == "true"
+    # Nocional objetivo por unidad de posicion (1 = largo completo)
+    RISK_ORDER_NOTIONAL = float(os.getenv("RISK_ORDER_NOTIONAL", 1000))
+    # Limites (0 = desactivado): nocional por ticker, cantidad por estrategia/ticker, ordenes por minuto y estrategia
+    RISK_MAX_NOTIONAL = float(os.getenv("RISK_MAX_NOTIONAL", 10000))
+    RISK_MAX_POSITION = float(os.getenv("RISK_MAX_POSITION", 0))
+    RISK_MAX_ORDERS_PER_MINUTE = int(os.getenv("RISK_MAX_ORDERS_PER_MINUTE", 30))
+
+    # Nivel de log: 'debug' muestra cada tick/barra, 'info' solo eventos y resumenes
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "info").lower()
+
+    # Metricas internas: se vuelcan cada N segundos a la hypertable 'metrics' (Grafana)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 10))
+    # Etiqueta del proceso en la tabla de metricas y dias de retencion
+    METRICS_PROCESS = os.getenv("METRICS_PROCESS", "prism")
+    METRICS_RETENTION_DAYS = int(os.getenv("METRICS_RETENTION_DAYS", 14))
 
     @classmethod
     def print_config(cls):
         print("------------- Prism Configuration -------------")
         print(f"Target Ticker:     {cls.TARGET_TICKER}")
+        print(f"Tickers:           {','.join(cls.TICKERS)}")
+        print(f"Workers:           ingest={cls.INGEST_WORKERS} engine={cls.ENGINE_WORKERS} ({cls.SHARD_POLICY})")
         print(f"Data Source:       {cls.DATA_SOURCE}")
         print(f"Backfill Start:    {cls.BACKFILL_START_DATE}")
         print(f"Database Host:     {cls.DB_HOST}:{cls.DB_PORT}")
+        print(f"Bulk Insert:       {cls.BULK_INSERT_METHOD} ({cls.COPY_FORMAT}, batch {cls.BULK_BATCH_SIZE})")
         print("-----------------------------------------------")
@@ -0,0 +1,25 @@
+import logging
+import sys
+
+from utils.config import Config
+
+_configured = False
+
+
+def get_logger(name: str):
+    """
+    Returns a level-gated logger printing in the same "[timestamp] message"
+    format as the rest of Prism. Use %-style arguments on hot paths
+    (log.debug("tick %s @ %s", ticker, price)): the message is only formatted
+    when LOG_LEVEL lets it through.
+    """
+    global _configured
+    if not _configured:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("[%(asctime)s.%(msecs)03d] %(message)s", "%Y-%m-%d %H:%M:%S"))
+        root = logging.getLogger("prism")
+        root.addHandler(handler)
+        root.setLevel(Config.LOG_LEVEL.upper())
+        root.propagate = False
+        _configured = True
+    return logging.getLogger(f"prism.{name}")
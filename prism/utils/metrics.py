@@ -0,0 +1,178 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Latency histogram bucket upper bounds in milliseconds (roughly x2 steps, 50us .. 10min)
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                      1_000, 2_500, 5_000, 10_000, 30_000, 60_000, 300_000, 600_000)
+
+
+class Counter:
+    """
+    Monotonic count (rows inserted, requests made, ...).
+    """
+    kind = "counter"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {"value": float(self.value)}
+
+
+class Gauge:
+    """
+    Point-in-time value. If `fn` is given it is sampled on every snapshot
+    (e.g. a queue's qsize), so the hot path does not pay for updates.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, fn=None):
+        self.name = name
+        self.value = 0.0
+        self.fn = fn
+
+    def set(self, value: float):
+        self.value = value
+
+    def snapshot(self):
+        if self.fn is not None:
+            try:
+                self.value = float(self.fn())
+            except Exception:
+                pass
+        return {"value": float(self.value)}
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram, in milliseconds.
+
+    observe() is one bisect and a few additions under a lock. Snapshots report
+    count / mean / p50 / p95 / p99 / max of the observations made since the
+    previous snapshot (quantiles are interpolated within buckets), so each
+    exported row describes one flush interval.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, buckets: tuple = LATENCY_BUCKETS_MS):
+        self.name = name
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self._reset()
+        # Lifetime totals, for summaries printed by the engines
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def _reset(self):
+        self.window_counts = [0] * (len(self.buckets) + 1)
+        self.window_sum = 0.0
+        self.window_max = 0.0
+
+    def observe(self, ms: float):
+        with self.lock:
+            self.window_counts[bisect_left(self.buckets, ms)] += 1
+            self.window_sum += ms
+            if ms > self.window_max:
+                self.window_max = ms
+            self.count += 1
+            self.total += ms
+            self.last = ms
+            if ms > self.max:
+                self.max = ms
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - started) * 1000)
+
+    def snapshot(self):
+        with self.lock:
+            counts, total, peak = self.window_counts, self.window_sum, self.window_max
+            self._reset()
+        n = sum(counts)
+        if not n:
+            return None
+        return {"value": total / n, "count": n, "p50": self._quantile(counts, n, 0.50),
+                "p95": self._quantile(counts, n, 0.95), "p99": self._quantile(counts, n, 0.99), "max": peak}
+
+    def _quantile(self, counts: list, n: int, q: float):
+        rank = q * n
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def __str__(self):
+        return (f"{self.name}: n={self.count} last={self.last:.1f}ms "
+                f"mean={self.mean():.1f}ms max={self.max:.1f}ms")
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of named metrics. Metrics are created on first use, so
+    modules declare them at import time without any setup.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name: str, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, **kwargs)
+            elif not isinstance(metric, cls):
+                raise TypeError(f"Metric {name} is already a {metric.kind}")
+            return metric
+
+    def counter(self, name: str):
+        return self._get(Counter, name)
+
+    def gauge(self, name: str, fn=None):
+        gauge = self._get(Gauge, name)
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name: str):
+        return self._get(Histogram, name)
+
+    def collect(self):
+        """
+        Returns [(name, kind, snapshot)] for every metric with data.
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        collected = []
+        for metric in metrics:
+            snapshot = metric.snapshot()
+            if snapshot is not None:
+                collected.append((metric.name, metric.kind, snapshot))
+        return collected
+
+
+REGISTRY = MetricsRegistry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
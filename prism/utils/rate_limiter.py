@@ -0,0 +1,48 @@
+import threading
+import time
+
+from utils.config import Config
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every worker that talks to one provider.
+    `capacity` units of weight are refilled evenly over `period` seconds.
+    """
+    def __init__(self, capacity: float, period: float, name: str = "provider"):
+        self.capacity = float(capacity)
+        self.period = float(period)
+        self.name = name
+        self.rate = self.capacity / self.period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, weight: float = 1.0):
+        """
+        Blocks until `weight` units are available, then consumes them.
+        Requests heavier than the whole bucket are clamped to its capacity.
+        """
+        weight = min(float(weight), self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait = (weight - self.tokens) / self.rate
+            time.sleep(wait)
+
+    @classmethod
+    def for_provider(cls, source: str):
+        """
+        Builds the shared budget for a provider from Config.
+        """
+        if source == 'binance':
+            return cls(Config.BINANCE_WEIGHT_PER_MINUTE, 60.0, name='binance')
+        return cls(Config.TIINGO_REQUESTS_PER_HOUR, 3600.0, name=source)
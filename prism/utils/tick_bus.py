@@ -0,0 +1,156 @@
+import queue
+import threading
+from collections import deque
+
+from utils import metrics
+from utils.config import Config
+
+BUS_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class Subscription:
+    """
+    Bounded ring buffer of one subscriber.
+
+    When the ring is full the policy decides: 'drop_oldest' keeps the newest
+    rows (strategies care about the latest price), 'drop_newest' discards the
+    incoming row, 'block' makes the publisher wait for room. The wait is
+    bounded by BUS_BLOCK_TIMEOUT: after it the row is dropped, so a stalled
+    subscriber delays the publisher (and every other subscriber) by at most
+    that long per row instead of forever.
+
+    Every dropped row is counted in the bus.<name>.dropped metric. Callers that
+    pass an explicit timeout get queue.Full instead, like queue.Queue.put.
+
+    Appends and pops rely on deque being thread-safe, so the drop policies take
+    no lock; only 'block' uses a condition. Exposes the queue.Queue subset used
+    by WriteBuffer (put / get / qsize / empty), so persistence can consume a
+    subscription directly.
+    """
+    def __init__(self, name: str, capacity: int = None, policy: str = None, tickers=None):
+        self.name = name
+        self.capacity = capacity or Config.BUS_CAPACITY
+        self.policy = (policy or Config.BUS_POLICY).lower()
+        if self.policy not in BUS_POLICIES:
+            raise ValueError(f"Unsupported bus policy: {self.policy}")
+        self.tickers = set(tickers) if tickers else None
+
+        self.items = deque()
+        self.not_empty = threading.Event()
+        self.not_full = threading.Condition()
+        self.block_timeout = Config.BUS_BLOCK_TIMEOUT
+        self.dropped = metrics.counter(f"bus.{name}.dropped")
+        metrics.gauge(f"bus.{name}.depth", fn=self.qsize)
+
+    def offer(self, row, timeout: float = None):
+        """
+        Adds a row according to the policy. Returns False if it was dropped.
+        With 'block', raises queue.Full if the ring is still full after an
+        explicit `timeout`; without one the wait is BUS_BLOCK_TIMEOUT, then the row is dropped.
+        """
+        if len(self.items) >= self.capacity:
+            if self.policy == "drop_newest":
+                self.dropped.inc()
+                return False
+            if self.policy == "drop_oldest":
+                try:
+                    self.items.popleft()
+                    self.dropped.inc()
+                except IndexError:
+                    pass
+            else:
+                with self.not_full:
+                    room = self.not_full.wait_for(lambda: len(self.items) < self.capacity,
+                                                  self.block_timeout if timeout is None else timeout)
+                if not room:
+                    if timeout is not None:
+                        raise queue.Full
+                    self.dropped.inc()
+                    return False
+
+        self.items.append(row)
+        # Setting an Event takes a lock; skip it while the consumer has not caught up yet
+        if not self.not_empty.is_set():
+            self.not_empty.set()
+        return True
+
+    def put(self, row, timeout: float = None):
+        self.offer(row, timeout)
+
+    def drain(self, max_items: int = None, timeout: float = None):
+        """
+        Returns up to `max_items` rows in arrival order, waiting up to
+        `timeout` seconds for the first one (an empty list on timeout).
+        """
+        if not self.items:
+            # Clear before re-checking: a row appended in between sets the event again
+            self.not_empty.clear()
+            if not self.items and not self.not_empty.wait(timeout):
+                return []
+
+        rows = []
+        try:
+            while max_items is None or len(rows) < max_items:
+                rows.append(self.items.popleft())
+        except IndexError:
+            pass
+
+        if self.policy == "block" and rows:
+            with self.not_full:
+                self.not_full.notify_all()
+        return rows
+
+    def get(self, timeout: float = None):
+        rows = self.drain(1, timeout)
+        if not rows:
+            raise queue.Empty
+        return rows[0]
+
+    def qsize(self):
+        return len(self.items)
+
+    def empty(self):
+        return not self.items
+
+
+class TickBus:
+    """
+    In-process publish/subscribe bus for normalized market rows (the tuples
+    built by build_market_row). Ingestion publishes every live row once;
+    strategy engines and the DB writer each read from their own bounded
+    Subscription, so a slow subscriber never holds back the others (unless it
+    asked for the 'block' policy).
+
+    Subscribing replaces the routing lists instead of mutating them, so
+    publish() reads them without a lock.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wildcard = ()
+        self.routes = {}
+
+    def subscribe(self, name: str, tickers=None, capacity: int = None, policy: str = None):
+        """
+        Returns a Subscription receiving the rows of `tickers` (all if None).
+        Per-ticker subscribers (engines) are served before catch-all ones (persistence).
+        """
+        subscription = Subscription(name, capacity, policy, tickers)
+        with self.lock:
+            if subscription.tickers is None:
+                self.wildcard = self.wildcard + (subscription,)
+            else:
+                routes = dict(self.routes)
+                for ticker in subscription.tickers:
+                    routes[ticker] = routes.get(ticker, ()) + (subscription,)
+                self.routes = routes
+        return subscription
+
+    def publish(self, row, timeout: float = None):
+        """
+        Delivers a market tuple (ts, ticker, ...) to every matching subscriber.
+        `timeout` bounds the wait on waiting subscribers (queue.Full after it).
+        """
+        for subscription in self.routes.get(row[1], ()):
+            subscription.offer(row, timeout)
+        for subscription in self.wildcard:
+            subscription.offer(row, timeout)